@@ -1,9 +1,25 @@
 # archive_simple.py - IMPROVED VERSION
 import os
+import json
+import zlib
+import hashlib
 import zipfile
 import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Snapshot store: Archives/store/chunks/<h[:2]>/<h> holds each zlib-compressed chunk
+# once, Archives/store/snapshots/*.json maps every archived file to its chunk hashes.
+# Chunks are fixed-size, so an edit that shifts bytes (an insert near the start of a big
+# file) re-stores every chunk after it; appends and in-place edits only store what changed.
+CHUNK_SIZE = 1 << 20
+MAX_INFLIGHT_CHUNKS = 64
+KEEP_SNAPSHOTS = 10
+# Unreferenced chunks younger than this are kept: a snapshot still running may have just
+# written or reused them (reuse refreshes the chunk's mtime) before its manifest exists
+CHUNK_GRACE_S = 24 * 3600
+
 def find_workspace_root():
     """Automatically find which workspace we're in"""
     possible_roots = [
@@ -25,8 +41,109 @@ def find_workspace_root():
     
     return current_dir
 
-def archive_workspace():
-    """Simple one-click archive of current workspace"""
+def _is_archived(name):
+    return ('__pycache__' not in name and '.pyc' not in name and 'Archives' not in name
+            and name != 'transfer_hashes.json')
+
+def _walk_workspace(root):
+    """Yield (path, stat) for every file to archive, pruning skipped directories"""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if not _is_archived(entry.name):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield Path(entry.path), entry.stat()
+
+def _store_dir(archives_dir):
+    store = archives_dir / "store"
+    (store / "chunks").mkdir(parents=True, exist_ok=True)
+    (store / "snapshots").mkdir(exist_ok=True)
+    return store
+
+def _chunk_path(store, digest):
+    return store / "chunks" / digest[:2] / digest
+
+def _known_chunks(store):
+    return {p.name for p in (store / "chunks").glob("*/*") if not p.name.endswith(".tmp")}
+
+def _list_snapshots(store):
+    return sorted((store / "snapshots").glob("*.json"), key=os.path.getmtime, reverse=True)
+
+def _write_chunk(store, digest, data):
+    """Compress and store one chunk (zlib releases the GIL, so this runs in parallel)"""
+    path = _chunk_path(store, digest)
+    path.parent.mkdir(exist_ok=True)
+    packed = zlib.compress(data, 6)
+    tmp = path.with_name(digest + ".tmp")
+    tmp.write_bytes(packed)
+    os.replace(tmp, path)
+    return len(packed)
+
+def _touch_chunk(store, digest):
+    """Mark a reused chunk as recently used, so a concurrent cleanup leaves it alone"""
+    try:
+        os.utime(_chunk_path(store, digest))
+    except FileNotFoundError:
+        pass
+
+def archive_workspace(workers=None):
+    """Incremental snapshot: unchanged files reuse the last manifest, new chunks are stored once"""
+    workspace_root = find_workspace_root()
+    print(f"📁 Detected workspace: {workspace_root}")
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    store = _store_dir(workspace_root.parent / "Archives")
+    previous = _list_snapshots(store)
+    prev_files = json.loads(previous[0].read_text(encoding="utf-8"))["files"] if previous else {}
+    known = _known_chunks(store)
+
+    files = {}
+    stats = {"files": 0, "unchanged": 0, "bytes": 0, "new_chunks": 0, "new_bytes": 0}
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        pending = deque()
+        for file_path, st in _walk_workspace(workspace_root):
+            rel = file_path.relative_to(workspace_root.parent).as_posix()
+            stats["files"] += 1
+            stats["bytes"] += st.st_size
+            old = prev_files.get(rel)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                files[rel] = old
+                stats["unchanged"] += 1
+                continue
+            chunks = []
+            with open(file_path, "rb") as f:
+                for data in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+                    chunks.append(digest)
+                    if digest in known:
+                        _touch_chunk(store, digest)
+                        continue
+                    known.add(digest)
+                    stats["new_chunks"] += 1
+                    pending.append(pool.submit(_write_chunk, store, digest, data))
+                    if len(pending) >= MAX_INFLIGHT_CHUNKS:
+                        stats["new_bytes"] += pending.popleft().result()
+            files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "chunks": chunks}
+        for fut in pending:
+            stats["new_bytes"] += fut.result()
+
+    snapshot_path = store / "snapshots" / f"Universal_WSsnap_{timestamp}.json"
+    tmp = snapshot_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"created": timestamp, "workspace": str(workspace_root),
+                               "stats": stats, "files": files}), encoding="utf-8")
+    os.replace(tmp, snapshot_path)
+
+    print(f"✅ Workspace snapshot: {snapshot_path}")
+    print(f"   {stats['files']} files ({stats['unchanged']} unchanged) | "
+          f"{stats['new_chunks']} new chunks, {stats['new_bytes'] / 1024 / 1024:.1f} MB stored")
+    return snapshot_path
+
+def export_zip_archive():
+    """Full standalone ZIP of the workspace (for copying elsewhere)"""
     workspace_root = find_workspace_root()
     print(f"📁 Detected workspace: {workspace_root}")
     
@@ -38,12 +155,9 @@ def archive_workspace():
     archive_path = archives_dir / archive_name
     
     with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file_path in workspace_root.rglob('*'):
-            if ('__pycache__' not in str(file_path) and 
-                '.pyc' not in str(file_path) and
-                'Archives' not in str(file_path)):
-                arcname = file_path.relative_to(workspace_root.parent)
-                zipf.write(file_path, arcname)
+        for file_path, _ in _walk_workspace(workspace_root):
+            arcname = file_path.relative_to(workspace_root.parent)
+            zipf.write(file_path, arcname)
     
     print(f"✅ Workspace archived: {archive_path}")
     return archive_path
@@ -57,15 +171,23 @@ def list_all_archives():
         print("❌ No archives found")
         return []
     
-    archives = sorted(archives_dir.glob("*.zip"), key=os.path.getmtime, reverse=True)
+    archives = list(archives_dir.glob("*.zip"))
+    if (archives_dir / "store" / "snapshots").exists():
+        archives += _list_snapshots(archives_dir / "store")
+    archives.sort(key=os.path.getmtime, reverse=True)
     
     print("📚 All available archives:")
     print("-" * 60)
     for i, arch in enumerate(archives, 1):
         mod_time = datetime.datetime.fromtimestamp(arch.stat().st_mtime)
-        size_mb = arch.stat().st_size / 1024 / 1024
+        if arch.suffix == ".json":
+            stats = json.loads(arch.read_text(encoding="utf-8"))["stats"]
+            size = f"{stats['bytes'] / 1024 / 1024:.1f} MB in {stats['files']} files, " \
+                   f"+{stats['new_bytes'] / 1024 / 1024:.1f} MB stored"
+        else:
+            size = f"{arch.stat().st_size / 1024 / 1024:.1f} MB"
         print(f"  {i:2d}. {arch.name}")
-        print(f"      📅 {mod_time.strftime('%Y-%m-%d %H:%M')} | 📦 {size_mb:.1f} MB")
+        print(f"      📅 {mod_time.strftime('%Y-%m-%d %H:%M')} | 📦 {size}")
     
     return archives
 
@@ -84,17 +206,23 @@ def restore_any_archive():
         archive_number = int(choice)
         if 1 <= archive_number <= len(archives):
             selected_archive = archives[archive_number - 1]
-            _restore_single_archive(selected_archive)
+            paths = input("📂 Paths to restore, comma-separated (Enter=all): ").strip()
+            _restore_single_archive(selected_archive, [p.strip() for p in paths.split(",") if p.strip()] or None)
         else:
             print("❌ Invalid archive number")
             
     except ValueError:
         print("❌ Please enter a valid number")
 
-def _restore_single_archive(archive_path):
-    """Restore a specific archive to test folder"""
+def _selected(name, paths):
+    return paths is None or any(name == p or name.startswith(p.rstrip("/") + "/") for p in paths)
+
+def _restore_single_archive(archive_path, paths=None):
+    """Restore a specific archive (or only `paths` inside it) to test folder"""
+    # Snapshots live in Archives/store/snapshots; test folders always go in Archives
+    archives_dir = archive_path.parents[2] if archive_path.suffix == ".json" else archive_path.parent
     # Create test folder with archive name
-    test_dir = archive_path.parent / f"TEST_{archive_path.stem}"
+    test_dir = archives_dir / f"TEST_{archive_path.stem}"
     
     # Clear existing test directory
     if test_dir.exists():
@@ -103,9 +231,27 @@ def _restore_single_archive(archive_path):
     
     test_dir.mkdir(exist_ok=True)
     
-    # Extract archive
-    with zipfile.ZipFile(archive_path, 'r') as zipf:
-        zipf.extractall(test_dir)
+    if archive_path.suffix == ".json":
+        # Only the chunks of selected files are read, one at a time
+        store = archives_dir / "store"
+        files = json.loads(archive_path.read_text(encoding="utf-8"))["files"]
+        restored = 0
+        for rel, entry in files.items():
+            if not _selected(rel, paths):
+                continue
+            target = test_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "wb") as out:
+                for digest in entry["chunks"]:
+                    out.write(zlib.decompress(_chunk_path(store, digest).read_bytes()))
+            os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            restored += 1
+        print(f"📄 {restored} files restored")
+    else:
+        # Extract archive
+        with zipfile.ZipFile(archive_path, 'r') as zipf:
+            members = [m for m in zipf.namelist() if _selected(m, paths)]
+            zipf.extractall(test_dir, members)
     
     print(f"✅ Restored to: {test_dir}")
     print(f"🚀 To test this version:")
@@ -122,11 +268,37 @@ def delete_old_archives():
     
     archives = sorted(archives_dir.glob("*.zip"), key=os.path.getmtime, reverse=True)
     
-    if len(archives) > 10:
+    if len(archives) > KEEP_SNAPSHOTS:
         print("🗑️  Cleaning up old archives (keeping last 10)...")
-        for arch in archives[10:]:
+        for arch in archives[KEEP_SNAPSHOTS:]:
             print(f"   Deleting: {arch.name}")
             arch.unlink()
+    
+    store = archives_dir / "store"
+    if not (store / "snapshots").exists():
+        return
+    snapshots = _list_snapshots(store)
+    for snap in snapshots[KEEP_SNAPSHOTS:]:
+        print(f"   Deleting: {snap.name}")
+        snap.unlink()
+    # Sweep chunks no remaining snapshot refers to, past the grace period
+    cutoff = datetime.datetime.now().timestamp() - CHUNK_GRACE_S
+    live = set()
+    for snap in snapshots[:KEEP_SNAPSHOTS]:
+        for entry in json.loads(snap.read_text(encoding="utf-8"))["files"].values():
+            live.update(entry["chunks"])
+    swept = 0
+    for chunk in (store / "chunks").glob("*/*"):
+        if chunk.name in live:
+            continue
+        try:
+            if chunk.stat().st_mtime < cutoff:
+                chunk.unlink()
+                swept += 1
+        except FileNotFoundError:
+            pass
+    if swept:
+        print(f"   Removed {swept} unreferenced chunks")
 
 if __name__ == "__main__":
     print("🔄 Workspace Archive Manager")
@@ -137,13 +309,14 @@ if __name__ == "__main__":
     
     # Simple menu
     print("\nOptions:")
-    print("1. 📦 Archive current workspace (quick backup)")
+    print("1. 📦 Snapshot current workspace (incremental)")
     print("2. 📚 Browse all archives")
     print("3. 🔄 Restore any archive")
     print("4. 🗑️  Clean up old archives (keep last 10)")
+    print("5. 🗜️  Export full ZIP")
     
     try:
-        choice = input("\nChoose (1-4, Enter=Archive): ").strip()
+        choice = input("\nChoose (1-5, Enter=Archive): ").strip()
         
         if choice == "2":
             list_all_archives()
@@ -151,6 +324,8 @@ if __name__ == "__main__":
             restore_any_archive()
         elif choice == "4":
             delete_old_archives()
+        elif choice == "5":
+            export_zip_archive()
         else:  # Default: archive
             archive_workspace()
             
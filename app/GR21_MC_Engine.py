@@ -22,9 +22,12 @@ class Barrier:
 class Structure:
     def __init__(self, name: str, underlyings: List[str], initial_prices: List[float],
                  barriers: List[Barrier], basket_type: BasketType,
-                 maturity: float, principal: float = 100.0, coupon_rate: float = 0.0):
+                 maturity: float, principal: float = 100.0, coupon_rate: float = 0.0,
+                 instrument_ids: List[str] = None, ko_level: float = 98.0):
         self.name = name
         self.underlyings = underlyings
+        self.instrument_ids = instrument_ids or underlyings
+        self.ko_level = float(ko_level)  # worst-of performance (% of initial) needed to keep capital + coupon
         self.initial_prices = np.array(initial_prices, dtype=np.float64)
         self.barriers = barriers
         self.basket_type = basket_type
@@ -46,41 +49,558 @@ class Structure:
             barriers.append(Barrier(type=BarrierType[b["type"]], level=float(level)))
         principal = float(next((p["principal"] for p in data.get("other_props", []) if "principal" in p), 100.0))
         coupon = float(next((p["coupon"] for p in data.get("other_props", []) if "coupon" in p), 0.0))
-        return cls(data.get("name", "Note"), underlyings, initial_prices, barriers, BasketType.WORST_OF, maturity, principal, coupon)
+        # The payoff reads the KO as a % of the initial fixing; the first KO_DOWN barrier sets it
+        ko = next((b.level for b in barriers if b.type is BarrierType.KO_DOWN), None)
+        extra = {} if ko is None else {"ko_level": round(ko / S0 * 100.0, 10)}
+        return cls(data.get("name", "Note"), underlyings, initial_prices, barriers, BasketType.WORST_OF, maturity, principal, coupon,
+                   data.get("instrument_ids"), **extra)
+
+    def performance(self, prices: np.ndarray) -> np.ndarray:
+        """Prices rebased to 100 at the initial fixing, so real spots and 100-base quotes agree"""
+        return prices / self.initial_prices.reshape((-1,) + (1,) * (prices.ndim - 1)) * 100.0
+
+    def no_ko(self, expiry_prices: np.ndarray) -> np.ndarray:
+        return np.min(self.performance(expiry_prices), axis=0) >= self.ko_level
 
     def payoff(self, expiry_prices: np.ndarray) -> np.ndarray:
-        worst_of_price = np.min(expiry_prices, axis=0)
+        worst_of_price = np.min(self.performance(expiry_prices), axis=0)
         coupon_payment = (self.coupon_rate / 100) * self.maturity * self.principal
 
         gross_payoff = np.where(
-            worst_of_price >= 98.0,
-            self.principal + coupon_payment,  # Full capital + coupon
-            worst_of_price                    # Capital at risk
+            worst_of_price >= self.ko_level,
+            self.principal + coupon_payment,            # Full capital + coupon
+            self.principal * worst_of_price / 100.0     # Capital at risk
         )
         return gross_payoff - self.principal  # Net to investor
 
-def mc_value(structure: Structure, r: float = 0.05, sigma: float = 0.25, n_paths: int = 10000,
-             n_steps: int = 1, correlations: np.ndarray = None) -> Dict[str, Any]:
-    T = structure.maturity
-    dt = T / max(n_steps, 1)
+FAN_QUANTILES = (5, 25, 50, 75, 95)
+VAR_LEVELS = (0.95, 0.99)
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy rel_acc (DDSketch-style log buckets).
+    Sketches with the same rel_acc merge by adding bucket counts, so chunked or parallel runs
+    combine exactly as if all values had been added to one."""
+
+    def __init__(self, rel_acc: float = 0.005):
+        self.rel_acc = rel_acc
+        self.gamma = (1 + rel_acc) / (1 - rel_acc)
+        self._log_gamma = np.log(self.gamma)
+        self.pos: Dict[int, int] = {}
+        self.neg: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+
+    def _bucket(self, store: Dict[int, int], mags: np.ndarray):
+        idx, counts = np.unique(np.ceil(np.log(mags) / self._log_gamma).astype(np.int64), return_counts=True)
+        for i, c in zip(idx.tolist(), counts.tolist()):
+            store[i] = store.get(i, 0) + c
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        pos, neg = values[values > 0], values[values < 0]
+        if len(pos):
+            self._bucket(self.pos, pos)
+        if len(neg):
+            self._bucket(self.neg, -neg)
+        self.zero += len(values) - len(pos) - len(neg)
+        self.count += len(values)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for mine, theirs in ((self.pos, other.pos), (self.neg, other.neg)):
+            for i, c in theirs.items():
+                mine[i] = mine.get(i, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def _ascending(self):
+        """(value, count) pairs from smallest to largest bucket"""
+        mid = lambda i: 2 * self.gamma**i / (self.gamma + 1)
+        for i in sorted(self.neg, reverse=True):
+            yield -mid(i), self.neg[i]
+        if self.zero:
+            yield 0.0, self.zero
+        for i in sorted(self.pos):
+            yield mid(i), self.pos[i]
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return float("nan")
+        rank, seen = q * (self.count - 1), 0
+        for value, c in self._ascending():
+            seen += c
+            if seen > rank:
+                return value
+        return value
+
+    def upper_tail_mean(self, frac: float) -> float:
+        """Mean of the largest frac share of values (expected shortfall when values are losses)"""
+        want = max(frac * self.count, 1.0)
+        left, total = want, 0.0
+        for value, c in reversed(list(self._ascending())):
+            take = min(c, left)
+            total += take * value
+            left -= take
+            if left <= 0:
+                break
+        return total / (want - left) if want > left else float("nan")
+
+class PayoffStats:
+    """Streaming, mergeable summary of net payoffs: moments, loss/gain probabilities, a
+    fixed-bin histogram and a loss sketch for VaR/ES. Nothing per path is retained."""
+
+    def __init__(self, lo: float, hi: float, bins: int = 50, rel_acc: float = 0.005):
+        self.edges = np.linspace(lo, hi, bins + 1)
+        self.hist = np.zeros(bins, dtype=np.int64)
+        self.n = 0
+        self.total = self.total_sq = 0.0
+        self.n_positive = self.n_loss = 0
+        self.loss_total = 0.0
+        self.losses = QuantileSketch(rel_acc)
+
+    @classmethod
+    def for_structure(cls, structure: Structure, bins: int = 50) -> "PayoffStats":
+        """Bins span every possible net payoff: full capital loss up to principal + coupon"""
+        max_gain = (structure.coupon_rate / 100) * structure.maturity * structure.principal
+        return cls(-structure.principal, max(max_gain, 1e-9), bins)
+
+    def add(self, net: np.ndarray):
+        self.n += len(net)
+        self.total += float(net.sum())
+        self.total_sq += float(np.dot(net, net))
+        self.n_positive += int(np.count_nonzero(net > 0))
+        loss = net < 0
+        self.n_loss += int(np.count_nonzero(loss))
+        self.loss_total += float(net[loss].sum())
+        self.hist += np.histogram(np.clip(net, self.edges[0], self.edges[-1]), bins=self.edges)[0]
+        self.losses.add(-net)
+
+    def merge(self, other: "PayoffStats") -> "PayoffStats":
+        self.n += other.n
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.n_positive += other.n_positive
+        self.n_loss += other.n_loss
+        self.loss_total += other.loss_total
+        self.hist += other.hist
+        self.losses.merge(other.losses)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(max(self.total_sq / self.n - self.mean**2, 0.0) * self.n / max(self.n - 1, 1)))
+
+    def summary(self, levels=VAR_LEVELS) -> Dict[str, Any]:
+        """Undiscounted payoff risk metrics; expected_loss_given_loss, VaR and ES are losses
+        (positive = money lost)"""
+        out = {
+            "prob_positive": self.n_positive / self.n * 100,
+            "prob_loss": self.n_loss / self.n * 100,
+            "payoff_std": self.std,
+            "expected_loss_given_loss": -self.loss_total / self.n_loss if self.n_loss else 0.0,
+            "payoff_histogram": {"edges": self.edges.tolist(), "counts": self.hist.tolist()},
+        }
+        for level in levels:
+            tag = f"{level * 100:g}".replace(".", "_")
+            out[f"var_{tag}"] = self.losses.quantile(level)
+            out[f"es_{tag}"] = self.losses.upper_tail_mean(1 - level)
+        return out
+
+def _fan_frame(structure: Structure, prices: np.ndarray, sample_idx: np.ndarray):
+    """Quantile bands and sampled values for one time step, per underlying plus the worst-of"""
+    perf = structure.performance(prices)
+    rows = np.vstack([perf, perf.min(axis=0)])
+    return np.percentile(rows, FAN_QUANTILES, axis=1).T, rows[:, sample_idx]
+
+def _iter_steps(structure: Structure, r: float, sigma: float, n_paths: int, n_steps: int,
+                correlations: np.ndarray = None, normal=np.random.standard_normal):
+    """Yield (step, prices) for steps 0..n_steps; prices is one (assets x paths) array updated in place.
+    Peak memory is a few (assets x paths) buffers whatever n_steps is: the shock is scaled,
+    shifted and exponentiated in place, and the Cholesky product is skipped when uncorrelated."""
+    dt = structure.maturity / max(n_steps, 1)
+    n_assets = len(structure.underlyings)
+    prices = np.repeat(structure.initial_prices[:, np.newaxis], n_paths, axis=1)
+    chol = None if correlations is None else np.linalg.cholesky(correlations)
+    drift, vol = (r - 0.5 * sigma**2) * dt, sigma * np.sqrt(dt)
+    yield 0, prices
+    for t in range(1, n_steps + 1):
+        z = normal((n_assets, n_paths))
+        if chol is not None:
+            z = np.dot(chol, z)
+        z *= vol
+        z += drift
+        prices *= np.exp(z, out=z)
+        yield t, prices
+
+TRADING_DAYS = 252
+
+def _bootstrap_cum(structure: Structure, history, block: int, r: float = None) -> np.ndarray:
+    """Prefix sums (days+1, assets) of the basket's joint daily log returns. With r given,
+    each column gets a constant daily shift so that exp(block return), averaged over every
+    window the sampler can draw, grows at exp(r * block / 252): a martingale under the bootstrap"""
+    returns = history.select(structure.instrument_ids)
+    if len(returns) <= block:
+        raise ValueError(f"Need more than {block} days of joint history for " + ", ".join(map(str, structure.instrument_ids)))
+    cum = np.zeros((len(returns) + 1, returns.shape[1]))
+    np.cumsum(returns, axis=0, out=cum[1:])
+    if r is not None:
+        windows = cum[block:] - cum[:-block]
+        shift = (r * block / TRADING_DAYS - np.log(np.mean(np.exp(windows), axis=0))) / block
+        cum += np.arange(len(cum))[:, np.newaxis] * shift
+    return cum
+
+def _iter_bootstrap_steps(structure: Structure, history, n_paths: int, n_steps: int, block: int = 10,
+                          r: float = 0.05, risk_neutral: bool = True, randint=np.random.randint):
+    """Moving-block bootstrap of joint daily returns, same (step, prices) protocol as _iter_steps.
+    Each path is a chain of `block`-day windows drawn from history; a window's return is
+    cum[start + k] - cum[start], so every step is a couple of row gathers over all paths."""
+    cum = _bootstrap_cum(structure, history, block, r if risk_neutral else None)
+    n_days = max(int(round(structure.maturity * TRADING_DAYS)), 1)
+    windows = cum[block:] - cum[:-block]      # full-block returns, one row per start
+    s0 = structure.initial_prices[:, np.newaxis]
+    acc = np.zeros((n_paths, cum.shape[1]))   # log return of completed blocks
+    starts = randint(0, len(windows), n_paths)
+    done_blocks = 0
+    yield 0, np.repeat(s0, n_paths, axis=1)
+    for t in range(1, n_steps + 1):
+        day = int(round(t * n_days / n_steps))
+        while (done_blocks + 1) * block <= day:
+            acc += windows[starts]
+            done_blocks += 1
+            starts = randint(0, len(windows), n_paths)
+        log_ret = acc + cum[starts + (day - done_blocks * block)] - cum[starts]
+        yield t, s0 * np.exp(log_ret.T)
+
+HESTON_DEFAULTS = {"kappa": 2.0, "theta": None, "xi": 0.5, "rho": -0.7, "v0": None}  # None -> sigma**2
+QE_PSI_C = 1.5
+
+def _iter_heston_steps(structure: Structure, r: float, sigma: float, n_paths: int, n_steps: int,
+                       correlations: np.ndarray = None, params: Dict[str, Any] = None,
+                       normal=np.random.standard_normal, uniform=np.random.random_sample):
+    """Correlated multi-asset Heston with Andersen's QE variance step and martingale-corrected
+    log-spot step, same (step, prices) protocol as _iter_steps. Parameters may be scalars or
+    one value per asset; correlations apply to the spot shocks, rho to each spot/variance pair.
+    QE matches the first two moments of the exact variance transition, so coarse steps stay
+    accurate where an Euler scheme would need many small ones. xi = 0 is deterministic variance
+    (GBM when theta = v0); rho is then moot."""
+    p = dict(HESTON_DEFAULTS, **(params or {}))
     n_assets = len(structure.underlyings)
-    paths = np.zeros((n_assets, n_paths, n_steps + 1), dtype=np.float64)
-    paths[:, :, 0] = structure.initial_prices[:, np.newaxis]
-    correlations = correlations if correlations is not None else np.eye(n_assets)
-    chol = np.linalg.cholesky(correlations)
+    col = lambda v, default: np.broadcast_to(np.asarray(default if v is None else v, dtype=np.float64),
+                                             (n_assets,)).reshape(-1, 1)
+    kappa, xi, rho = col(p["kappa"], None), col(p["xi"], None), col(p["rho"], None)
+    flat = xi == 0
+    xi, rho = np.where(flat, 1.0, xi), np.where(flat, 0.0, rho)
+    theta, v0 = col(p["theta"], sigma**2), col(p["v0"], sigma**2)
+    chol = None if correlations is None else np.linalg.cholesky(correlations)
 
+    dt = structure.maturity / max(n_steps, 1)
+    ekt = np.exp(-kappa * dt)
+    c1, c2 = xi**2 * ekt * (1 - ekt) / kappa, theta * xi**2 * (1 - ekt)**2 / (2 * kappa)
+    # Log-spot weights with gamma1 = gamma2 = 1/2 (central discretisation of the integrated variance)
+    k1 = 0.5 * dt * (kappa * rho / xi - 0.5) - rho / xi
+    k2 = 0.5 * dt * (kappa * rho / xi - 0.5) + rho / xi
+    k3 = k4 = 0.5 * dt * (1 - rho**2)
+    big_a = k2 + 0.5 * k4
+
+    v = np.repeat(v0, n_paths, axis=1)
+    x = np.zeros((n_assets, n_paths))          # log(S / S0)
+    s0 = structure.initial_prices[:, np.newaxis]
+    yield 0, np.repeat(s0, n_paths, axis=1)
     for t in range(1, n_steps + 1):
-        z = np.dot(chol, np.random.standard_normal((n_assets, n_paths)))
-        paths[:, :, t] = paths[:, :, t-1] * np.exp((r - 0.5 * sigma**2) * dt + sigma * np.sqrt(dt) * z)
+        m = theta + (v - theta) * ekt
+        psi = np.where(flat, 1.0, (v * c1 + c2) / (m * m))
+        quad = psi <= QE_PSI_C
+        zv, u = normal((n_assets, n_paths)), uniform((n_assets, n_paths))
+
+        # Quadratic branch: v' = a (b + Zv)^2
+        inv = 2 / np.where(quad, psi, 1.0)
+        b2 = np.maximum(inv - 1 + np.sqrt(inv * (inv - 1)), 0.0)
+        a = m / (1 + b2)
+        # Exponential branch: point mass p at 0, exponential tail with rate beta
+        prob = np.where(quad, 0.0, (psi - 1) / (psi + 1))
+        beta = (1 - prob) / m
+        v_next = np.where(quad, a * (np.sqrt(b2) + zv)**2,
+                          np.where(u <= prob, 0.0, np.log((1 - prob) / np.maximum(1 - u, 1e-300)) / beta))
+        v_next = np.where(flat, m, v_next)
 
-    expiry_prices = paths[:, :, -1]
+        # Martingale correction: K0* = -log E[exp(A v')] - (K1 + K3/2) v
+        log_m = np.where(quad, big_a * b2 * a / (1 - 2 * big_a * a) - 0.5 * np.log(1 - 2 * big_a * a),
+                         np.log(prob + beta * (1 - prob) / (beta - big_a)))
+        log_m = np.where(flat, 0.0, log_m)
+        k0 = -log_m - (k1 + 0.5 * k3) * v
+
+        z = normal((n_assets, n_paths))
+        if chol is not None:
+            z = np.dot(chol, z)
+        x += r * dt + k0 + k1 * v + k2 * v_next + np.sqrt(k3 * v + k4 * v_next) * z
+        v = v_next
+        yield t, s0 * np.exp(x)
+
+def _path_steps(structure: Structure, r: float, sigma: float, n_paths: int, n_steps: int,
+                correlations: np.ndarray = None, model: str = "gbm", history=None, block: int = 10,
+                heston: Dict[str, Any] = None, scenarios=None, rng: np.random.Generator = None):
+    """The (step, prices) generator for the requested path model.
+    scenarios (app.scenarios.Scenarios) replaces fresh normals with a stored cube: one draw
+    per step for GBM, two for Heston (its uniforms are still drawn).
+    rng draws from a local generator instead of the global NumPy state."""
+    if model == "bootstrap":
+        if scenarios is not None:
+            raise ValueError("Stored scenarios apply to the gbm and heston models only")
+        unresolved = [u for u, i in zip(structure.underlyings, structure.instrument_ids) if not i]
+        if unresolved:
+            raise ValueError(f"No instrument for underlying(s) {', '.join(unresolved)}; cannot bootstrap history")
+        if history is None:
+            from app.history import get_return_history
+            history = get_return_history()
+        return _iter_bootstrap_steps(structure, history, n_paths, n_steps, block, r,
+                                     randint=np.random.randint if rng is None else rng.integers)
+    normal = (rng or np.random).standard_normal if scenarios is None else scenarios.stream()
+    if model == "heston":
+        return _iter_heston_steps(structure, r, sigma, n_paths, n_steps, correlations, heston, normal,
+                                  np.random.random_sample if rng is None else rng.random)
+    return _iter_steps(structure, r, sigma, n_paths, n_steps, correlations, normal)
+
+def mc_value(structure: Structure, r: float = 0.05, sigma: float = 0.25, n_paths: int = 10000,
+             n_steps: int = 1, correlations: np.ndarray = None, fan: bool = False,
+             fan_samples: int = 12, fan_points: int = 60, model: str = "gbm",
+             history=None, block: int = 10, heston: Dict[str, Any] = None,
+             var_levels=VAR_LEVELS, scenarios=None) -> Dict[str, Any]:
+    """Price the note; only the current step is held, never the (assets x paths x steps) cube.
+    With fan=True the result also carries a "fan" dict: per-step quantile bands of the
+    performance (100 = initial fixing) for each underlying and the worst-of, plus a few
+    sampled paths, recorded at up to fan_points steps.
+    model="bootstrap" replaces GBM with block-bootstrapped joint history (app.history,
+    risk-neutral re-centred); sigma and correlations are then implied by the data.
+    model="heston" uses the QE stochastic-vol stepper; `heston` overrides HESTON_DEFAULTS
+    and sigma**2 is the default long-run and initial variance.
+    Tail metrics (PayoffStats.summary) ride along: prob_positive/prob_loss, payoff_std,
+    VaR/ES of the net payoff at var_levels, the capital-loss conditional mean and a histogram.
+    scenarios: a stored normal cube (app.scenarios) shared by every note of the same shape."""
+    T = structure.maturity
+    dt = T / max(n_steps, 1)
+    if fan:
+        # Paths are exchangeable, so a fixed uniform draw of indices is a reservoir sample;
+        # it uses its own generator to leave the pricing stream untouched.
+        sample_idx = np.sort(np.random.default_rng(n_paths).choice(n_paths, min(fan_samples, n_paths), replace=False))
+        stride = max(1, -(-n_steps // fan_points))
+        times, bands, samples = [], [], []
+    steps = _path_steps(structure, r, sigma, n_paths, n_steps, correlations, model, history, block, heston,
+                        scenarios)
+    for t, prices in steps:
+        if fan and (t % stride == 0 or t == n_steps):
+            b, smp = _fan_frame(structure, prices, sample_idx)
+            times.append(t * dt)
+            bands.append(b)
+            samples.append(smp)
+
+    expiry_prices = prices
     net_payoffs = structure.payoff(expiry_prices)
     fair_value_net = np.exp(-r * T) * np.mean(net_payoffs)
     fair_value_gross = structure.principal + fair_value_net
-    prob_no_ko = np.mean(expiry_prices.min(axis=0) >= 98.0) * 100
-    return {
+    prob_no_ko = np.mean(structure.no_ko(expiry_prices)) * 100
+    stats = PayoffStats.for_structure(structure)
+    stats.add(net_payoffs)
+    result = {
         "fair_value_gross": float(fair_value_gross),
         "fair_value_net": float(fair_value_net),
         "prob_no_ko": float(prob_no_ko),
-        "mean_net_payoff": float(np.mean(net_payoffs))
+        "mean_net_payoff": float(np.mean(net_payoffs)),
+        "fair_value": float(fair_value_gross),
+        "mean_payoff": float(np.mean(net_payoffs)),
+        **stats.summary(var_levels),
+    }
+    if fan:
+        bands, samples = np.stack(bands, axis=1), np.stack(samples, axis=2)  # (series, points, q|path)
+        names = list(structure.underlyings) + ["worst_of"]
+        result["fan"] = {
+            "times": times,
+            "quantiles": list(FAN_QUANTILES),
+            "bands": {n: bands[i].tolist() for i, n in enumerate(names)},
+            "samples": {n: samples[i].tolist() for i, n in enumerate(names)},
+        }
+    return result
+
+def price_structure(data: dict, n_paths: int = 10000, n_steps: int = 1, method: str = "auto",
+                    scenario_seed: int = None, progress=None, rng: np.random.Generator = None,
+                    **kwargs) -> Dict[str, Any]:
+    """Shared entry point for UI, batch and tests: GR21 JSON input -> mc_value result.
+    method="auto" sends single-underlying GBM notes without fan charts to the GR22 PDE
+    pricer (deterministic, with delta/gamma) and baskets covered by a GR23 pricing table
+    to an interpolated table quote; "mc", "pde" and "table" force one (a "table" miss
+    still falls back to Monte Carlo).
+    scenario_seed prices Monte Carlo runs on the stored normal cube for that seed and
+    shape (app.scenarios), so a batch of same-shaped notes draws its shocks only once.
+    progress(estimate) makes a GBM Monte Carlo run progressive (mc_batches, drawing from rng):
+    it is called after every batch and a truthy return stops the run at that estimate."""
+    structure = Structure.from_json(data)
+    mc = None
+    closed = kwargs.get("model", "gbm") == "gbm" and not kwargs.get("fan")
+    if method == "auto" and closed:
+        method = "pde" if len(structure.underlyings) == 1 else "table" if scenario_seed is None else "mc"
+    if method == "table":
+        from app.GR23_Table_Engine import table_value
+        mc = table_value(structure, **kwargs) if closed else None
+    if mc is None and method == "pde":
+        from app.GR22_PDE_Engine import pde_value
+        mc = pde_value(structure, **kwargs)
+    elif mc is None and progress is not None and closed and scenario_seed is None:
+        batch_kwargs = {k: kwargs[k] for k in ("r", "sigma", "correlations") if k in kwargs}
+        for mc in mc_batches(structure, n_paths=n_paths, n_steps=n_steps, rng=rng, **batch_kwargs):
+            mc["structure_name"] = structure.name
+            if progress(mc):
+                break
+    elif mc is None:
+        if scenario_seed is not None:
+            from app.scenarios import get_scenario_store
+            draws = n_steps * (2 if kwargs.get("model") == "heston" else 1)
+            kwargs["scenarios"] = get_scenario_store().get(scenario_seed, len(structure.underlyings), draws, n_paths)
+        mc = mc_value(structure, n_paths=n_paths, n_steps=n_steps, **kwargs)
+    mc["structure_name"] = structure.name
+    return mc
+
+def mc_batches(structure: Structure, r: float = 0.05, sigma: float = 0.25, n_paths: int = 10000,
+               n_steps: int = 1, correlations: np.ndarray = None, first_batch: int = 1000,
+               max_batch: int = 50000, rng: np.random.Generator = None):
+    """Progressive pricing: yield a running estimate after each batch of paths.
+    Batches start at first_batch and double up to max_batch, so a first number arrives
+    almost immediately; each estimate carries the 95% confidence half-width of the fair
+    value ("ci95"). Pass rng when running off the main thread to keep streams independent."""
+    normal = (rng or np.random).standard_normal
+    disc = np.exp(-r * structure.maturity)
+    stats = PayoffStats.for_structure(structure)
+    no_ko = 0
+    batch = first_batch
+    while stats.n < n_paths:
+        n = min(batch, n_paths - stats.n)
+        for _, prices in _iter_steps(structure, r, sigma, n, n_steps, correlations, normal):
+            pass
+        stats.add(structure.payoff(prices))
+        no_ko += int(np.count_nonzero(structure.no_ko(prices)))
+        batch = min(batch * 2, max_batch)
+
+        yield {
+            "fair_value_gross": float(structure.principal + disc * stats.mean),
+            "fair_value_net": float(disc * stats.mean),
+            "prob_no_ko": no_ko / stats.n * 100,
+            "mean_net_payoff": stats.mean,
+            "fair_value": float(structure.principal + disc * stats.mean),
+            "mean_payoff": stats.mean,
+            **stats.summary(),
+            "ci95": float(1.96 * disc * stats.std / np.sqrt(stats.n)),
+            "paths_done": stats.n,
+            "n_paths": n_paths,
+        }
+
+class NoteSolver:
+    """Simulate once, then answer term-sheet questions on the same paths.
+    Only the expiry worst-of performance is kept (sorted, one float per path). The coupon
+    enters the payoff linearly, so the par coupon is closed form; KO levels are swept over
+    a whole grid at once with prefix sums over the sorted performances."""
+
+    def __init__(self, structure: Structure, r: float = 0.05, sigma: float = 0.25, n_paths: int = 100000,
+                 n_steps: int = 1, correlations: np.ndarray = None, **model_kwargs):
+        """model_kwargs go to _path_steps (model, history, block, heston, scenarios, rng)"""
+        self.structure = structure
+        self.r = r
+        self.disc = np.exp(-r * structure.maturity)
+        for _, prices in _path_steps(structure, r, sigma, n_paths, n_steps, correlations, **model_kwargs):
+            pass
+        self.worst = np.sort(structure.performance(prices).min(axis=0))
+        self._prefix = np.concatenate([[0.0], np.cumsum(self.worst)])
+
+    def _legs(self, ko_level):
+        """Per KO level: P(no KO) and E[(capital-at-risk net payoff) 1{KO}], both undiscounted"""
+        n = len(self.worst)
+        k = np.searchsorted(self.worst, np.asarray(ko_level, dtype=np.float64), side="left")
+        P = self.structure.principal
+        return (n - k) / n, (P / 100 * self._prefix[k] - P * k) / n
+
+    def value(self, coupon: float = None, ko_level: float = None):
+        """Fair value (gross) for any coupon (% p.a.) and KO level(s), without resimulating"""
+        s = self.structure
+        coupon = s.coupon_rate if coupon is None else coupon
+        survive, at_risk = self._legs(s.ko_level if ko_level is None else ko_level)
+        coupon_leg = survive * (coupon / 100) * s.maturity * s.principal
+        return s.principal + self.disc * (coupon_leg + at_risk)
+
+    def par_coupon(self, target: float = None, ko_level: float = None) -> float:
+        """Coupon (% p.a.) at which the note is worth target (default: principal, i.e. par)"""
+        s = self.structure
+        target = s.principal if target is None else target
+        survive, at_risk = self._legs(s.ko_level if ko_level is None else ko_level)
+        per_coupon_pct = survive * s.maturity * s.principal / 100
+        if per_coupon_pct <= 0:
+            return float("inf")
+        return float(((target - s.principal) / self.disc - at_risk) / per_coupon_pct)
+
+    def survival(self, ko_level) -> np.ndarray:
+        """P(no KO) in % for each KO level"""
+        return self._legs(ko_level)[0] * 100
+
+    def ko_for_survival(self, prob: float) -> float:
+        """Highest KO level (% of initial) that still keeps capital with probability prob (%)"""
+        n = len(self.worst)
+        k = n - int(np.ceil(prob / 100 * n))  # at most n - k paths may sit below the level
+        return float(self.worst[min(max(k, 0), n - 1)])
+
+    def ko_for_value(self, target: float = None, levels: np.ndarray = None) -> float:
+        """KO level at which the note is worth target, interpolated on a vectorised level grid"""
+        s = self.structure
+        target = s.principal if target is None else target
+        levels = np.linspace(50.0, 110.0, 601) if levels is None else np.asarray(levels, dtype=np.float64)
+        values = self.value(ko_level=levels)
+        above = values - target
+        cross = np.nonzero(np.sign(above[:-1]) != np.sign(above[1:]))[0]
+        if not len(cross):
+            return float("nan")
+        i = cross[0]
+        return float(levels[i] + (levels[i + 1] - levels[i]) * above[i] / (above[i] - above[i + 1]))
+
+LIFECYCLE_BATCH = 4_000_000  # terminal prices held at once (floats) when batching valuation dates
+
+def lifecycle_mtm(structure: Structure, elapsed: np.ndarray, spots: np.ndarray, r: float = 0.05,
+                  sigma: float = 0.25, n_paths: int = 20000, correlations: np.ndarray = None,
+                  batch_floats: int = LIFECYCLE_BATCH) -> Dict[str, Any]:
+    """Mark the note on every valuation date in one simulation.
+    elapsed: years since the initial fixing per date; spots: (dates x assets) closes on those dates.
+    One set of correlated unit shocks is drawn and rescaled by each date's remaining maturity, so the
+    (assets x dates x paths) terminal prices come from a single vectorised draw (common random numbers
+    also keep day-to-day moves in the marks free of simulation noise). The payoff is observed at
+    expiry, so a close below the KO level so far is reported (ko_breached) but does not fix the
+    outcome; the contingent coupon accrued to date is reported alongside."""
+    elapsed = np.asarray(elapsed, dtype=np.float64)
+    spots = np.asarray(spots, dtype=np.float64).reshape(len(elapsed), -1)
+    tau = np.clip(structure.maturity - elapsed, 0.0, None)
+    n_assets = len(structure.underlyings)
+    z = np.random.standard_normal((n_assets, n_paths))
+    if correlations is not None:
+        z = np.dot(np.linalg.cholesky(correlations), z)
+
+    gross = np.empty(len(tau))
+    no_ko = np.empty(len(tau))
+    chunk = max(1, batch_floats // (n_assets * n_paths))
+    for lo in range(0, len(tau), chunk):
+        t = tau[lo:lo + chunk]
+        # (assets x dates x paths): spot on each date grown over that date's remaining maturity
+        prices = z[:, None, :] * (sigma * np.sqrt(t))[None, :, None]
+        prices += ((r - 0.5 * sigma**2) * t)[None, :, None]
+        np.exp(prices, out=prices)
+        prices *= spots[lo:lo + chunk].T[:, :, None]
+        gross[lo:lo + chunk] = structure.principal + np.exp(-r * t) * structure.payoff(prices).mean(axis=1)
+        no_ko[lo:lo + chunk] = structure.no_ko(prices).mean(axis=1) * 100
+
+    worst_now = structure.performance(spots.T).min(axis=0)
+    return {
+        "elapsed": elapsed.tolist(),
+        "remaining_maturity": tau.tolist(),
+        "fair_value_gross": gross.tolist(),
+        "prob_no_ko": no_ko.tolist(),
+        "worst_performance": worst_now.tolist(),
+        "ko_breached": (np.minimum.accumulate(worst_now) < structure.ko_level).tolist(),
+        "coupon_accrued": ((structure.coupon_rate / 100) * np.minimum(elapsed, structure.maturity)
+                           * structure.principal).tolist(),
     }
@@ -0,0 +1,142 @@
+# USCAN  GR22 PDE Engine
+# Single-underlying notes on a 1-D Crank-Nicolson grid in x = log(S / S0).
+# Same Structure in, same result dict out as GR21 mc_value, plus delta/gamma read
+# off the grid. The payoff is Structure.payoff itself (cell-averaged at expiry so
+# the capital-at-risk jump does not cost accuracy); the grid is shifted so spot and
+# the KO level sit exactly on nodes. The generator is tridiagonal, so every time step
+# is an O(n) Thomas sweep with the implicit matrix factorised once.
+import numpy as np
+from typing import Dict, Any, Tuple
+
+from app.GR21_MC_Engine import Structure
+
+CELL_SAMPLES = 16     # payoff samples averaged per grid cell at expiry
+RANNACHER_STEPS = 4   # implicit half-steps before Crank-Nicolson, to damp the payoff jump
+WIDTH_SD = 7.0        # grid half-width in terminal standard deviations
+
+def _grid(structure: Structure, sigma: float, n_space: int):
+    """Uniform log grid through 0 (spot) and the KO level"""
+    T = structure.maturity
+    half = WIDTH_SD * sigma * np.sqrt(T) + 1e-12
+    dx = 2 * half / n_space
+    knot = np.log(structure.ko_level / 100.0) if structure.ko_level > 0 else 0.0
+    if 0 < abs(knot) < half:
+        # Shrink dx so the KO level (where the payoff jumps) is a whole number of steps from spot
+        k = max(1, int(round(abs(knot) / dx)))
+        dx = abs(knot) / k
+    n_side = int(np.ceil(half / dx))
+    return np.arange(-n_side, n_side + 1) * dx, dx
+
+def _operator(x: np.ndarray, dx: float, r: float, sigma: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Tuple[float, float]]:
+    """Generator of the log-price PDE on interior nodes as (sub, diag, super) bands, plus the
+    weights that extrapolate edge values linearly in S from their two inner neighbours (V_SS = 0)"""
+    m = len(x) - 2
+    nu = r - 0.5 * sigma**2
+    lo, mid, up = 0.5 * sigma**2 / dx**2 - nu / (2 * dx), -sigma**2 / dx**2 - r, 0.5 * sigma**2 / dx**2 + nu / (2 * dx)
+    sub, diag, sup = np.full(m - 1, lo), np.full(m, mid), np.full(m - 1, up)
+    S = np.exp(x)
+    w_lo = (S[0] - S[1]) / (S[2] - S[1])
+    w_hi = (S[-1] - S[-2]) / (S[-3] - S[-2])
+    # The edge values only involve the first/last two interior nodes, so folding them in keeps
+    # the operator tridiagonal
+    diag[0] += lo * (1 - w_lo)
+    sup[0] += lo * w_lo
+    diag[-1] += up * (1 - w_hi)
+    sub[-1] += up * w_hi
+    return sub, diag, sup, (w_lo, w_hi)
+
+def _extend(U: np.ndarray, weights: Tuple[float, float]) -> np.ndarray:
+    """Interior values -> full grid, edges extrapolated"""
+    w_lo, w_hi = weights
+    return np.vstack([(1 - w_lo) * U[0] + w_lo * U[1], U, (1 - w_hi) * U[-1] + w_hi * U[-2]])
+
+def _apply(sub, diag, sup, U: np.ndarray) -> np.ndarray:
+    """Tridiagonal matrix times U (columns rolled back together)"""
+    out = diag[:, None] * U
+    out[1:] += sub[:, None] * U[:-1]
+    out[:-1] += sup[:, None] * U[1:]
+    return out
+
+class _Thomas:
+    """Tridiagonal solver for a fixed matrix: factorised once, O(n) per solve.
+    The sweeps are sequential, so they run on Python floats column by column rather than
+    as one small numpy operation per row."""
+
+    def __init__(self, sub, diag, sup):
+        m = len(diag)
+        inv, ratio = [0.0] * m, [0.0] * (m - 1)  # 1 / pivot, super-diagonal / pivot
+        pivot = float(diag[0])
+        for i in range(m - 1):
+            inv[i] = 1.0 / pivot
+            ratio[i] = float(sup[i]) * inv[i]
+            pivot = float(diag[i + 1]) - float(sub[i]) * ratio[i]
+        inv[-1] = 1.0 / pivot
+        self.sub = [0.0] + [float(a) for a in sub]
+        self.inv = inv
+        self.ratio = ratio[::-1]
+
+    def solve(self, d: np.ndarray) -> np.ndarray:
+        cols = []
+        for col in d.T.tolist():
+            y, fwd = 0.0, []
+            for v, a, inv in zip(col, self.sub, self.inv):
+                y = (v - a * y) * inv
+                fwd.append(y)
+            y, back = fwd[-1], [fwd[-1]]
+            for v, c in zip(fwd[-2::-1], self.ratio):
+                y = v - c * y
+                back.append(y)
+            cols.append(back[::-1])
+        return np.array(cols).T
+
+def pde_value(structure: Structure, r: float = 0.05, sigma: float = 0.25, n_space: int = 200,
+              n_time: int = 100, **_) -> Dict[str, Any]:
+    """Price a single-underlying note by Crank-Nicolson (Rannacher start) in milliseconds.
+    Returns the mc_value keys (tail quantiles and the histogram need paths and are left to
+    Monte Carlo) plus delta and gamma with respect to the underlying's price;
+    Monte Carlo-only keyword arguments (n_paths, ...) are accepted and ignored."""
+    if len(structure.underlyings) != 1:
+        raise ValueError("pde_value prices single-underlying notes only")
+    T = structure.maturity
+    x, dx = _grid(structure, sigma, n_space)
+    s0 = structure.initial_prices[0]
+
+    # Terminal values, averaged over each cell: net payoff, no-KO / gain / loss indicators
+    # and the loss-only payoff; every column is rolled back together
+    offsets = (np.arange(CELL_SAMPLES) + 0.5) / CELL_SAMPLES - 0.5
+    prices = s0 * np.exp(x[:, None] + offsets * dx).reshape(1, -1)
+    net = structure.payoff(prices)
+    no_ko = structure.no_ko(prices)
+    V = np.stack([net, no_ko, net > 0, net < 0, np.minimum(net, 0.0)], axis=1)
+    V = V.reshape(len(x), CELL_SAMPLES, -1).mean(axis=1)
+
+    sub, diag, sup, edges = _operator(x, dx, r, sigma)
+    dt = T / n_time
+    half_step = 0.5 * dt
+    implicit = _Thomas(-half_step * sub, 1.0 - half_step * diag, -half_step * sup)  # (I - dt/2 L)
+    U = V[1:-1]
+    for _ in range(min(RANNACHER_STEPS, 2 * n_time)):
+        U = implicit.solve(U)
+    for _ in range(n_time - RANNACHER_STEPS // 2):
+        U = implicit.solve(U + half_step * _apply(sub, diag, sup, U))
+    V = _extend(U, edges)
+
+    i = len(x) // 2  # x = 0, the initial fixing
+    v_x = (V[i + 1, 0] - V[i - 1, 0]) / (2 * dx)
+    v_xx = (V[i + 1, 0] - 2 * V[i, 0] + V[i - 1, 0]) / dx**2
+    fair_value_net = V[i, 0]
+    growth = np.exp(r * T)  # undo discounting for probabilities and expectations
+    return {
+        "fair_value_gross": float(structure.principal + fair_value_net),
+        "fair_value_net": float(fair_value_net),
+        "prob_no_ko": float(growth * V[i, 1] * 100),
+        "mean_net_payoff": float(growth * fair_value_net),
+        "fair_value": float(structure.principal + fair_value_net),
+        "mean_payoff": float(growth * fair_value_net),
+        "prob_positive": float(growth * V[i, 2] * 100),
+        "prob_loss": float(growth * V[i, 3] * 100),
+        "expected_loss_given_loss": float(-V[i, 4] / V[i, 3]) if V[i, 3] > 0 else 0.0,  # positive = lost
+        "delta": float(v_x / s0),
+        "gamma": float((v_xx - v_x) / s0**2),
+        "pricer": "pde",
+    }
@@ -0,0 +1,227 @@
+# USCAN  GR23 Table Engine
+# Precomputed pricing tables for the baskets we quote most. An offline build runs the GR21
+# engine once per (tenor, vol) node with common random numbers and keeps, for every KO level,
+# the three path moments the fair value needs: P(no KO), E[loss 1{KO}] and E[loss^2 1{KO}].
+# The coupon enters the payoff linearly, so it is exact rather than a grid axis. Tables are
+# float32 .npy files memory-mapped on load; a lookup interpolates trilinearly over
+# (KO, tenor, vol) with an error estimate (curvature of the grid plus the table's own Monte
+# Carlo error) and returns None when it cannot answer, so callers fall back to mc_value.
+import argparse
+import bisect
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.GR21_MC_Engine import NoteSolver, Structure, mc_value
+
+TABLE_DIR = "data/pricing_tables"
+MAX_ERROR = 0.10   # largest estimated error (price points) a table quote may carry;
+                   # a default 10k-path mc_value run is ~0.15
+ARRAYS = ("survive", "m1", "m2")
+
+POPULAR_BASKETS = {
+    "Tencent_Baba": ["Tencent", "Baba"],
+    "HSBC_HangSeng": ["HSBC", "Hang Seng"],
+}
+DEFAULT_AXES = {
+    "ko": np.arange(70.0, 100.01, 0.5).tolist(),
+    "months": list(range(1, 25)),
+    "vol": np.round(np.arange(0.10, 0.6001, 0.025), 4).tolist(),
+}
+
+
+def basket_key(underlyings: List[str]) -> str:
+    """Worst-of baskets are order-free"""
+    return "|".join(sorted(underlyings))
+
+
+class PricingTable:
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        # (months, vol, ko) per 100 principal; plain views skip np.memmap's per-slice overhead
+        self.survive, self.m1, self.m2 = (arrays[a].view(np.ndarray) for a in ARRAYS)
+        self.meta = meta
+        self.axes = [[float(x) for x in meta["axes"][a]] for a in ("months", "vol", "ko")]
+        self.n_paths = meta["n_paths"]
+
+    # === Build / persist ===
+    @classmethod
+    def build(cls, underlyings: List[str], axes: Dict = None, r: float = 0.05, n_paths: int = 200000,
+              correlations: np.ndarray = None, seed: int = 42) -> "PricingTable":
+        axes = axes or DEFAULT_AXES
+        ko = np.asarray(axes["ko"], dtype=np.float64)
+        shape = (len(axes["months"]), len(axes["vol"]), len(ko))
+        out = {a: np.empty(shape, dtype=np.float32) for a in ARRAYS}
+        for i, months in enumerate(axes["months"]):
+            T = months / 12.0
+            structure = Structure("table", underlyings, [100.0] * len(underlyings), [], None, T)
+            for j, vol in enumerate(axes["vol"]):
+                # Common random numbers keep the grid smooth across nodes; a local generator
+                # leaves the global NumPy stream of later unseeded runs alone
+                rng = np.random.default_rng(seed)
+                worst = NoteSolver(structure, r, vol, n_paths, 1, correlations, rng=rng).worst
+                loss = worst - 100.0  # net capital-at-risk payoff on 100 principal
+                k = np.searchsorted(worst, ko, side="left")
+                out["survive"][i, j] = (n_paths - k) / n_paths
+                out["m1"][i, j] = np.concatenate([[0.0], np.cumsum(loss)])[k] / n_paths
+                out["m2"][i, j] = np.concatenate([[0.0], np.cumsum(loss * loss)])[k] / n_paths
+        meta = {"underlyings": list(underlyings), "axes": {a: list(axes[a]) for a in ("ko", "months", "vol")},
+                "r": r, "n_paths": n_paths, "seed": seed,
+                "correlations": None if correlations is None else np.asarray(correlations).tolist()}
+        return cls(out, meta)
+
+    def save(self, out_dir: str):
+        os.makedirs(out_dir, exist_ok=True)
+        for a in ARRAYS:
+            np.save(os.path.join(out_dir, f"{a}.npy"), getattr(self, a))
+        with open(os.path.join(out_dir, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load(cls, table_dir: str) -> "PricingTable":
+        with open(os.path.join(table_dir, "meta.json")) as f:
+            meta = json.load(f)
+        return cls({a: np.load(os.path.join(table_dir, f"{a}.npy"), mmap_mode="r") for a in ARRAYS}, meta)
+
+    # === Lookup ===
+    def covers(self, r: float, correlations) -> bool:
+        if abs(r - self.meta["r"]) > 1e-12:
+            return False
+        table_corr = self.meta["correlations"]
+        if correlations is None or table_corr is None:
+            return correlations is None and table_corr is None
+        return np.allclose(np.asarray(correlations), np.asarray(table_corr))
+
+    def value(self, structure: Structure, sigma: float) -> Optional[Dict]:
+        """Interpolated result for the structure, or None outside the grid.
+        VaR/ES and the payoff histogram need paths and are left to Monte Carlo."""
+        point = (structure.maturity * 12.0, sigma, structure.ko_level)
+        block, weights, ts = [], [], []
+        for axis, x in zip(self.axes, point):
+            if not axis[0] - 1e-9 <= x <= axis[-1] + 1e-9:
+                return None
+            i = min(max(bisect.bisect_right(axis, x) - 1, 0), len(axis) - 2)
+            t = (x - axis[i]) / (axis[i + 1] - axis[i])
+            # Up to one extra node each side of the cell, for the curvature estimate
+            lo, hi = max(i - 1, 0), min(i + 3, len(axis))
+            w = np.zeros(hi - lo)
+            w[i - lo], w[i - lo + 1] = 1 - t, t
+            block.append(slice(lo, hi))
+            weights.append(w)
+            ts.append(t)
+        block = tuple(block)
+        surv = self.survive[block].astype(np.float64)
+        m1 = self.m1[block].astype(np.float64)
+        m2 = self.m2[block].astype(np.float64)
+        months = np.asarray(self.axes[0][block[0]]).reshape(-1, 1, 1)
+        scale = structure.principal / 100.0
+        coupon = structure.coupon_rate * months / 12.0  # coupon payment per 100 principal
+        net = coupon * surv + m1                         # undiscounted E[net payoff]
+        var = coupon**2 * surv + m2 - net**2
+
+        interp = lambda grid: float(weights[0] @ ((grid @ weights[2]) @ weights[1]))
+        # Linear interpolation error along each axis ~ t(1-t)/2 x largest second difference
+        err = 0.0
+        for ax, t in enumerate(ts):
+            g = net.swapaxes(0, ax)
+            if len(g) >= 3:
+                err += 0.5 * t * (1 - t) * float(np.abs(g[:-2] - 2 * g[1:-1] + g[2:]).max())
+        disc = np.exp(-self.meta["r"] * structure.maturity)
+        mean_net = interp(net) * scale
+        std = np.sqrt(max(interp(var), 0.0)) * scale
+        survive = interp(surv)
+        error = disc * (err * scale + std / np.sqrt(self.n_paths))
+        return {
+            "fair_value_gross": float(structure.principal + disc * mean_net),
+            "fair_value_net": float(disc * mean_net),
+            "prob_no_ko": survive * 100,
+            "mean_net_payoff": mean_net,
+            "fair_value": float(structure.principal + disc * mean_net),
+            "mean_payoff": mean_net,
+            "prob_positive": survive * 100 if structure.coupon_rate > 0 else 0.0,
+            "prob_loss": (1 - survive) * 100,
+            "payoff_std": float(std),
+            # Positive = money lost, as in PayoffStats.summary
+            "expected_loss_given_loss": -interp(m1) * scale / (1 - survive) if survive < 1 else 0.0,
+            "table_error": float(error),
+            "pricer": "table",
+        }
+
+
+class PricingTables:
+    """All tables under one directory, keyed by basket"""
+
+    def __init__(self, tables: Dict[str, PricingTable]):
+        self.tables = tables
+
+    @classmethod
+    def load(cls, root: str = TABLE_DIR) -> "PricingTables":
+        tables = {}
+        if os.path.isdir(root):
+            for entry in sorted(os.scandir(root), key=lambda e: e.name):
+                if entry.is_dir() and os.path.exists(os.path.join(entry.path, "meta.json")):
+                    try:
+                        table = PricingTable.load(entry.path)
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Pricing table {entry.name} skipped ({e})")
+                        continue
+                    tables[basket_key(table.meta["underlyings"])] = table
+        return cls(tables)
+
+    def lookup(self, structure: Structure, r: float = 0.05, sigma: float = 0.25, correlations=None,
+               max_error: float = MAX_ERROR) -> Optional[Dict]:
+        """Table quote, or None when no table covers the note within max_error"""
+        table = self.tables.get(basket_key(structure.underlyings))
+        if table is None or not table.covers(r, correlations):
+            return None
+        result = table.value(structure, sigma)
+        if result is None or result["table_error"] > max_error:
+            return None
+        return result
+
+
+_default: Optional[PricingTables] = None
+
+
+def get_pricing_tables() -> PricingTables:
+    """Process-wide tables, memory-mapped once"""
+    global _default
+    if _default is None:
+        _default = PricingTables.load()
+    return _default
+
+
+def table_value(structure: Structure, r: float = 0.05, sigma: float = 0.25, correlations=None,
+                max_error: float = MAX_ERROR, **_) -> Optional[Dict]:
+    """price_structure hook: a table quote for GBM notes, None to fall through to Monte Carlo"""
+    return get_pricing_tables().lookup(structure, r, sigma, correlations, max_error)
+
+
+def quote(structure: Structure, r: float = 0.05, sigma: float = 0.25, correlations=None,
+          max_error: float = MAX_ERROR, n_paths: int = 10000) -> Dict:
+    """Table quote when one covers the note, else a full mc_value run"""
+    result = table_value(structure, r, sigma, correlations, max_error)
+    if result is None:
+        result = mc_value(structure, r, sigma, n_paths, correlations=correlations)
+        result["pricer"] = "mc"
+    return result
+
+
+def build_tables(baskets: Dict[str, List[str]] = None, root: str = TABLE_DIR, n_paths: int = 200000,
+                 axes: Dict = None):
+    for name, underlyings in (baskets or POPULAR_BASKETS).items():
+        t0 = time.perf_counter()
+        table = PricingTable.build(underlyings, axes, n_paths=n_paths)
+        table.save(os.path.join(root, name))
+        size = sum(getattr(table, a).nbytes for a in ARRAYS)
+        print(f"{name}: {table.survive.shape} grid, {size / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build pricing tables for the popular baskets")
+    ap.add_argument("--root", default=TABLE_DIR)
+    ap.add_argument("--paths", type=int, default=200000)
+    args = ap.parse_args()
+    build_tables(root=args.root, n_paths=args.paths)
@@ -1,46 +1,150 @@
-﻿import datetime
-from typing import Dict, List
+﻿import csv
+import datetime
+import html
+import io
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, List, Optional, TextIO
+
+# Templates are bound once at import; the render loop only calls them.
+_MD_ASSUMPTION = "\n- **{name}**: {underlyings}, {maturity:.2f} years, WORST_OF, Barriers: KO_DOWN at {ko}".format
+_MD_RESULT = "\n- **{name}**: Fair Value = ${fv:.2f}, Survival Probability = {prob:.2f}%".format
+_MD_RECOMMENDATION = "\n- **{name}**: {rec}".format
+_HTML_ASSUMPTION = "<li><b>{name}</b>: {underlyings}, {maturity:.2f} years, WORST_OF, Barriers: KO_DOWN at {ko}</li>\n".format
+_HTML_RESULT = "<li><b>{name}</b>: Fair Value = ${fv:.2f}, Survival Probability = {prob:.2f}%</li>\n".format
+_HTML_RECOMMENDATION = "<li><b>{name}</b>: {rec}</li>\n".format
+_INTRO = ("This report provides a comprehensive analysis of the structured product(s) "
+          "based on Monte Carlo simulations and AI-parsed inputs.")
+CSV_COLUMNS = ["name", "underlyings", "maturity", "ko_level", "fair_value_gross", "prob_no_ko", "recommendation"]
+SPOOL_BYTES = 1 << 20
+
+def recommendation(prob: float) -> str:
+    if prob > 70:
+        return f"High survival ({prob:.1f}%). Attractive if priced near fair value."
+    elif prob > 50:
+        return f"Moderate risk ({100-prob:.1f}% KO). Consider if coupon justifies."
+    return f"High KO risk ({100-prob:.1f}%). Only for risk-tolerant investors."
+
+def _row(s: Dict, r: Dict) -> Dict:
+    prob = r["prob_no_ko"]
+    return {
+        "name": s["name"],
+        "underlyings": ", ".join(s["underlyings"]),
+        "maturity": s["maturity"],
+        "ko": next((b["level"] for b in s["barriers"] if b["type"] == "KO_DOWN"), "100%"),
+        "fv": r["fair_value_gross"],
+        "prob": prob,
+        "rec": recommendation(prob),
+    }
+
+class _SectionSink:
+    """Spools each section to its own temp file so the header can be written last-but-first"""
+    SECTIONS = ("assumptions", "results", "recommendations")
+
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.spools = {k: tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES, mode="w+", encoding="utf-8")
+                       for k in self.SECTIONS}
+
+    def _assemble(self, header: str, openers: Dict[str, str], closer: str, sep: str):
+        self.out.write(header)
+        for k in self.SECTIONS:
+            self.out.write(sep + openers[k])
+            spool = self.spools[k]
+            spool.seek(0)
+            shutil.copyfileobj(spool, self.out)
+            spool.close()
+            self.out.write(closer)
+
+class _MarkdownSink(_SectionSink):
+    def add(self, row: Dict):
+        self.spools["assumptions"].write(_MD_ASSUMPTION(**row))
+        self.spools["results"].write(_MD_RESULT(**row))
+        self.spools["recommendations"].write(_MD_RECOMMENDATION(**row))
+
+    def finish(self, summary: Dict):
+        header = "\n".join([
+            "# USCAN Structured Product Report\n",
+            f"**Generated:** {summary['generated']}",
+            f"**Structures Analyzed:** {summary['count']}",
+            f"**Average Fair Value:** ${summary['avg_fv']:.2f}\n",
+            _INTRO + "\n",
+        ])
+        openers = {"assumptions": "## Assumptions\n", "results": "\n## Results\n",
+                   "recommendations": "\n## Recommendations\n"}
+        self._assemble(header, openers, closer="", sep="\n")
+
+class _HtmlSink(_SectionSink):
+    def add(self, row: Dict):
+        row = {k: html.escape(v) if isinstance(v, str) else v for k, v in row.items()}
+        self.spools["assumptions"].write(_HTML_ASSUMPTION(**row))
+        self.spools["results"].write(_HTML_RESULT(**row))
+        self.spools["recommendations"].write(_HTML_RECOMMENDATION(**row))
+
+    def finish(self, summary: Dict):
+        header = (
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>USCAN Report</title></head><body>\n"
+            "<h1>USCAN Structured Product Report</h1>\n"
+            f"<p><b>Generated:</b> {summary['generated']}<br>\n"
+            f"<b>Structures Analyzed:</b> {summary['count']}<br>\n"
+            f"<b>Average Fair Value:</b> ${summary['avg_fv']:.2f}</p>\n"
+            f"<p>{_INTRO}</p>\n"
+        )
+        openers = {"assumptions": "<h2>Assumptions</h2>\n<ul>\n", "results": "<h2>Results</h2>\n<ul>\n",
+                   "recommendations": "<h2>Recommendations</h2>\n<ul>\n"}
+        self._assemble(header, openers, closer="</ul>\n", sep="")
+        self.out.write("</body></html>\n")
+
+class _CsvSink:
+    def __init__(self, out: TextIO):
+        self.writer = csv.writer(out)
+        self.writer.writerow(CSV_COLUMNS)
+
+    def add(self, row: Dict):
+        self.writer.writerow([row["name"], row["underlyings"], f"{row['maturity']:.4f}", row["ko"],
+                              f"{row['fv']:.4f}", f"{row['prob']:.2f}", row["rec"]])
+
+    def finish(self, summary: Dict):
+        pass
+
+SINKS = {"markdown": _MarkdownSink, "html": _HtmlSink, "csv": _CsvSink}
+EXTENSIONS = {".md": "markdown", ".html": "html", ".htm": "html", ".csv": "csv"}
 
 class ReportEngine:
     def __init__(self):
         pass
 
     def generate_report(self, mc_results: Dict, gr21_input: List[Dict]) -> Dict:
-        results = mc_results["results"]
-        report_lines = ["# USCAN Structured Product Report\n"]
-        report_lines.append(f"**Generated:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report_lines.append(f"**Structures Analyzed:** {len(results)}")
-        
-        # Use GROSS fair value
-        avg_fv = sum(r["fair_value_gross"] for r in results) / len(results)
-        report_lines.append(f"**Average Fair Value:** ${avg_fv:.2f}\n")
-        report_lines.append("This report provides a comprehensive analysis of the structured product(s) based on Monte Carlo simulations and AI-parsed inputs.\n")
-
-        report_lines.append("## Assumptions\n")
-        for s, r in zip(gr21_input, results):
-            struct_name = s["name"]
-            underlyings = ", ".join(s["underlyings"])
-            maturity = s["maturity"]
-            ko_level = next((b["level"] for b in s["barriers"] if b["type"] == "KO_DOWN"), "100%")
-            report_lines.append(f"- **{struct_name}**: {underlyings}, {maturity:.2f} years, WORST_OF, Barriers: KO_DOWN at {ko_level}")
+        buf = io.StringIO()
+        self.render(mc_results["results"], gr21_input, {"markdown": buf})
+        return {"markdown": buf.getvalue()}
 
-        report_lines.append("\n## Results\n")
+    def render(self, results: Iterable[Dict], gr21_input: Iterable[Dict], outputs: Dict[str, TextIO]) -> Dict:
+        """Single pass over (input, result) pairs, writing every requested format at once.
+        Memory is constant in the number of structures: section bodies are spooled to disk."""
+        sinks = [SINKS[fmt](out) for fmt, out in outputs.items()]
+        count, fv_sum = 0, 0.0
         for s, r in zip(gr21_input, results):
-            struct_name = s["name"]
-            fv = r["fair_value_gross"]
-            prob = r["prob_no_ko"]
-            report_lines.append(f"- **{struct_name}**: Fair Value = ${fv:.2f}, Survival Probability = {prob:.2f}%")
+            row = _row(s, r)
+            count += 1
+            fv_sum += row["fv"]
+            for sink in sinks:
+                sink.add(row)
+        summary = {"generated": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                   "count": count, "avg_fv": fv_sum / count if count else 0.0}
+        for sink in sinks:
+            sink.finish(summary)
+        return summary
 
-        report_lines.append("\n## Recommendations\n")
-        for s, r in zip(gr21_input, results):
-            struct_name = s["name"]
-            prob = r["prob_no_ko"]
-            if prob > 70:
-                report_lines.append(f"- **{struct_name}**: High survival ({prob:.1f}%). Attractive if priced near fair value.")
-            elif prob > 50:
-                report_lines.append(f"- **{struct_name}**: Moderate risk ({100-prob:.1f}% KO). Consider if coupon justifies.")
-            else:
-                report_lines.append(f"- **{struct_name}**: High KO risk ({100-prob:.1f}%). Only for risk-tolerant investors.")
-
-        markdown = "\n".join(report_lines)
-        return {"markdown": markdown}
+    def render_files(self, results: Iterable[Dict], gr21_input: Iterable[Dict], paths: List[str]) -> Dict:
+        """Stream the report to files; the format comes from each path's extension"""
+        files = {}
+        try:
+            for path in paths:
+                fmt = EXTENSIONS[os.path.splitext(path)[1].lower()]
+                files[fmt] = open(path, "w", encoding="utf-8", newline="" if fmt == "csv" else None)
+            return self.render(results, gr21_input, files)
+        finally:
+            for f in files.values():
+                f.close()
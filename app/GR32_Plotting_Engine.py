@@ -1,24 +1,45 @@
 # app/GR32_Plotting_Engine.py
+import os
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-from typing import Dict, Any, List
+from itertools import zip_longest
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# key, figure number (interactive mode), figsize, draw method
+PLOT_SPECS = [
+    ("payoff_distribution", 1, (10, 6), "_draw_payoff"),
+    ("price_paths", 2, (12, 7), "_draw_price_paths"),
+    ("barrier_types", 3, (9, 8), "_draw_barrier"),
+    ("risk_reward", 4, (11, 6), "_draw_risk"),
+    ("correlation", 5, (10, 8), "_draw_correlation"),
+    ("fair_value_hist", 6, (10, 6), "_draw_returns"),
+    ("payoff_diagram", 7, (10, 6), "_draw_payoff_diagram"),
+]
+_SPECS_BY_KEY = {key: (num, figsize, draw) for key, num, figsize, draw in PLOT_SPECS}
 
 class UniversalPlottingEngine:
-    def __init__(self):
+    def __init__(self, headless: bool = False):
         self.style = 'seaborn-v0_8-whitegrid'
-        plt.style.use(self.style)
-        print("ENHANCED UniversalPlottingEngine initialized")
-    
+        self.headless = headless
+        self._figures: Dict[str, Figure] = {}  # headless: one reusable Figure per plot type
+        if not headless:
+            plt.style.use(self.style)
+        print("ENHANCED UniversalPlottingEngine initialized" + (" (headless)" if headless else ""))
+
     def create_universal_plots(self, mc_results: Dict[str, Any], input_json: List[Dict], feature_set="structures"):
         print(f"Creating ENHANCED universal plots (n_structs: {len(input_json)})")
-        
+
         self._create_proven_plots(mc_results, input_json)
         self._create_structure_plots(mc_results, input_json)
-        
+
         return {"status": "success", "plots_created": 8, "engine": "enhanced"}
-    
+
     def _create_proven_plots(self, mc_results: Dict, input_json: List):
         print("Generating 6 proven plot types...")
         self._create_payoff_plot(mc_results)
@@ -27,94 +48,171 @@ class UniversalPlottingEngine:
         self._create_risk_plot(mc_results)
         self._create_correlation_plot(input_json)
         self._create_returns_plot(mc_results)
-    
+
     def _create_structure_plots(self, mc_results: Dict, input_json: List):
         print("Generating 2 structure-specific plots...")
         self._create_payoff_diagram(mc_results, input_json)
         self._create_basket_sens_plot(mc_results, input_json)
-    
+
+    # === Interactive (pyplot) wrappers ===
+    def _show(self, key: str, mc_results: Dict, input_json: List):
+        num, figsize, draw = _SPECS_BY_KEY[key]
+        fig = plt.figure(num, figsize=figsize)
+        fig.clf()
+        getattr(self, draw)(fig, fig.add_subplot(), mc_results, input_json)
+        fig.tight_layout()
+        plt.show(block=False)
+
     def _create_payoff_plot(self, mc_results: Dict):
-        plt.figure(1, figsize=(10, 6))
+        self._show("payoff_distribution", mc_results, [])
+
+    def _create_price_paths_plot(self, mc_results: Dict, input_json: List):
+        self._show("price_paths", mc_results, input_json)
+
+    def _create_barrier_plot(self, mc_results: Dict, input_json: List):
+        self._show("barrier_types", mc_results, input_json)
+
+    def _create_risk_plot(self, mc_results: Dict):
+        self._show("risk_reward", mc_results, [])
+
+    def _create_correlation_plot(self, input_json: List):
+        self._show("correlation", {}, input_json)
+
+    def _create_returns_plot(self, mc_results: Dict):
+        self._show("fair_value_hist", mc_results, [])
+
+    def _create_payoff_diagram(self, mc_results: Dict, input_json: List):
+        self._show("payoff_diagram", mc_results, input_json)
+
+    def _create_basket_sens_plot(self, mc_results: Dict, input_json: List):
+        fig = self._basket_sens_figure(mc_results, input_json)
+        fig.show()
+        print("Interactive heatmap displayed via Plotly.")
+
+    # === Headless (Figure/Agg, no pyplot state) ===
+    def _figure(self, key: str, figsize) -> Figure:
+        fig = self._figures.get(key)
+        if fig is None:
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+            self._figures[key] = fig
+        else:
+            fig.clear()
+        return fig
+
+    def render_to_files(self, mc_results: Dict, input_json: List, out_dir: str, prefix: str = "",
+                        formats: Tuple[str, ...] = ("png",), html: bool = True) -> List[str]:
+        """Render every plot to out_dir/<prefix><plot>.<fmt>; the sensitivity heatmap goes to HTML"""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        with matplotlib.style.context(self.style):
+            for key, _, figsize, draw in PLOT_SPECS:
+                fig = self._figure(key, figsize)
+                getattr(self, draw)(fig, fig.add_subplot(), mc_results, input_json)
+                fig.tight_layout()
+                for fmt in formats:
+                    path = os.path.join(out_dir, f"{prefix}{key}.{fmt}")
+                    fig.savefig(path, format=fmt)
+                    paths.append(path)
+        if html:
+            path = os.path.join(out_dir, f"{prefix}basket_sensitivity.html")
+            self._basket_sens_figure(mc_results, input_json).write_html(path, include_plotlyjs="cdn")
+            paths.append(path)
+        return paths
+
+    # === Drawing on a given Figure/Axes ===
+    def _draw_payoff(self, fig, ax, mc_results: Dict, input_json: List):
         results = mc_results.get('results', [])
         if not results:
-            plt.bar(['No Data'], [0], color='gray', alpha=0.8)
-            plt.title('PAYOFF DISTRIBUTION: No Results Available', fontsize=16, fontweight='bold')
-            plt.ylabel('Loss Probability (%)')
-            plt.tight_layout()
-            plt.show(block=False)
+            ax.bar(['No Data'], [0], color='gray', alpha=0.8)
+            ax.set_title('PAYOFF DISTRIBUTION: No Results Available', fontsize=16, fontweight='bold')
+            ax.set_ylabel('Loss Probability (%)')
             return
-        
-        probs = [100 - r.get('prob_positive', 0) for r in results]
+
+        # Table/PDE quotes may not carry every path statistic; a missing one is shown as n/a
+        probs = [r['prob_loss'] if 'prob_loss' in r else
+                 100 - r['prob_positive'] if 'prob_positive' in r else None for r in results]
         categories = [r['structure_name'] for r in results]
-        colors = ['#e74c3c' if p > 20 else '#2ecc71' for p in probs]
-        
-        plt.bar(categories, probs, color=colors, alpha=0.8)
-        plt.title('PAYOFF DISTRIBUTION: Loss Prob by Structure', fontsize=16, fontweight='bold')
-        plt.ylabel('Loss Probability (%)')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.show(block=False)
-    
-    def _create_price_paths_plot(self, mc_results: Dict, input_json: List):
-        plt.figure(2, figsize=(12, 7))
-        n_structs = min(len(input_json), 2)
-        for i in range(n_structs):
-            inp = input_json[i]
-            n_paths = 20
-            times = np.linspace(0, inp.get('maturity', 1), 100)
-            paths = 100 * np.exp(np.cumsum(np.random.normal(0, 0.02, (n_paths, len(times))), axis=1))
-            for p in paths:
-                plt.plot(times, p + i*50, alpha=0.5, lw=0.5)
-        plt.title('PRICE PATHS: Multi-Structure Simulation', fontsize=16)
-        plt.xlabel('Time (Years)')
-        plt.ylabel('Normalized Price')
-        plt.grid(alpha=0.3)
-        plt.tight_layout()
-        plt.show(block=False)
-    
-    def _create_barrier_plot(self, mc_results: Dict, input_json: List):
-        plt.figure(3, figsize=(9, 8))
+        colors = ['gray' if p is None else '#e74c3c' if p > 20 else '#2ecc71' for p in probs]
+
+        bars = ax.bar(categories, [p or 0 for p in probs], color=colors, alpha=0.8)
+        for bar, p in zip(bars, probs):
+            if p is None:
+                ax.annotate('n/a', (bar.get_x() + bar.get_width() / 2, 0), ha='center', va='bottom', color='gray')
+        ax.set_title('PAYOFF DISTRIBUTION: Loss Prob by Structure', fontsize=16, fontweight='bold')
+        ax.set_ylabel('Loss Probability (%)')
+        ax.tick_params(axis='x', labelrotation=45)
+
+    def _draw_price_paths(self, fig, ax, mc_results: Dict, input_json: List):
+        # Pair each result with its input first, so barrier lines follow the fans actually drawn
+        fanned = [(r, inp) for r, inp in zip_longest(mc_results.get('results', []), input_json, fillvalue={})
+                  if r.get('fan')][:2]
+        fans = [r for r, _ in fanned]
+        if not fans:
+            ax.text(0.5, 0.5, 'No fan data - price with fan_steps > 0', ha='center', va='center',
+                    transform=ax.transAxes, fontsize=12, color='gray')
+        for r, color in zip(fans, ['#2980b9', '#c0392b']):
+            fan = r['fan']
+            times = fan['times']
+            q = {p: i for i, p in enumerate(fan['quantiles'])}
+            worst = np.asarray(fan['bands']['worst_of'])
+            label = r.get('structure_name', 'Structure')
+            ax.fill_between(times, worst[:, q[5]], worst[:, q[95]], color=color, alpha=0.15, lw=0)
+            ax.fill_between(times, worst[:, q[25]], worst[:, q[75]], color=color, alpha=0.3, lw=0)
+            ax.plot(times, worst[:, q[50]], color=color, lw=2, label=f'{label} worst-of median')
+            for name, bands in fan['bands'].items():
+                if name != 'worst_of':
+                    ax.plot(times, np.asarray(bands)[:, q[50]], color=color, lw=1, ls='--', alpha=0.7)
+            for path in fan['samples']['worst_of']:
+                ax.plot(times, path, color=color, lw=0.5, alpha=0.4)
+        for _, inp in fanned:
+            for b in inp.get('barriers', []):
+                level = b.get('level')
+                if isinstance(level, str) and level.endswith('%'):
+                    ax.axhline(float(level[:-1]), color='black', ls=':', lw=1)
+        ax.set_title('PRICE PATHS: Worst-of Fan (5/25/50/75/95%) with Sampled Paths', fontsize=16)
+        ax.set_xlabel('Time (Years)')
+        ax.set_ylabel('Performance (% of Initial)')
+        if fans:
+            ax.legend(loc='upper left')
+        ax.grid(alpha=0.3)
+
+    def _draw_barrier(self, fig, ax, mc_results: Dict, input_json: List):
         barrier_types = []
         for inp in input_json:
             for b in inp.get('barriers', []):
                 barrier_types.append(b.get('type', 'NONE'))
-        
+
         if not barrier_types:
-            plt.pie([100], labels=['No Barriers'], colors=['gray'], autopct='%1.1f%%')
-            plt.title('BARRIER TYPE DISTRIBUTION: No Barriers', fontsize=16, fontweight='bold')
+            ax.pie([100], labels=['No Barriers'], colors=['gray'], autopct='%1.1f%%')
+            ax.set_title('BARRIER TYPE DISTRIBUTION: No Barriers', fontsize=16, fontweight='bold')
         else:
             unique, counts = np.unique(barrier_types, return_counts=True)
             sizes = counts / len(barrier_types) * 100
             colors = ['#2ecc71', '#e74c3c', '#3498db', '#f39c12'][:len(unique)]
-            plt.pie(sizes, labels=unique, colors=colors, autopct='%1.1f%%', startangle=90)
-            plt.title('BARRIER TYPE DISTRIBUTION', fontsize=16, fontweight='bold')
-        plt.tight_layout()
-        plt.show(block=False)
-    
-    def _create_risk_plot(self, mc_results: Dict):
-        plt.figure(4, figsize=(11, 6))
+            ax.pie(sizes, labels=unique, colors=colors, autopct='%1.1f%%', startangle=90)
+            ax.set_title('BARRIER TYPE DISTRIBUTION', fontsize=16, fontweight='bold')
+
+    def _draw_risk(self, fig, ax, mc_results: Dict, input_json: List):
         results = mc_results.get('results', [])
         if not results:
-            plt.bar(['No Data'], [0], label='Fair Value', color='#3498db')
-            plt.bar(['No Data'], [0], label='Risk (Std)', color='#e74c3c')
+            ax.bar(['No Data'], [0], label='Fair Value', color='#3498db')
+            ax.bar(['No Data'], [0], label='Risk (Std)', color='#e74c3c')
         else:
             names = [r['structure_name'] for r in results]
             fvs = [abs(r.get('fair_value', 0)) for r in results]
-            risks = [abs(r.get('mean_payoff', 0)) * 0.2 for r in results]
+            risks = [r.get('payoff_std', abs(r.get('mean_payoff', 0)) * 0.2) for r in results]
             x = np.arange(len(names))
             width = 0.35
-            plt.bar(x - width/2, fvs, width, label='Fair Value', color='#3498db')
-            plt.bar(x + width/2, risks, width, label='Risk (Std)', color='#e74c3c')
-            plt.xticks(x, names, rotation=45)
-        plt.title('RISK-REWARD TRADEOFF', fontsize=16)
-        plt.xlabel('Structures')
-        plt.ylabel('Value')
-        plt.legend()
-        plt.tight_layout()
-        plt.show(block=False)
-    
-    def _create_correlation_plot(self, input_json: List):
-        plt.figure(5, figsize=(10, 8))
+            ax.bar(x - width/2, fvs, width, label='Fair Value', color='#3498db')
+            ax.bar(x + width/2, risks, width, label='Risk (Std)', color='#e74c3c')
+            ax.set_xticks(x, names, rotation=45)
+        ax.set_title('RISK-REWARD TRADEOFF', fontsize=16)
+        ax.set_xlabel('Structures')
+        ax.set_ylabel('Value')
+        ax.legend()
+
+    def _draw_correlation(self, fig, ax, mc_results: Dict, input_json: List):
         corr = None
         for inp in input_json:
             for p in inp.get('other_props', []):
@@ -125,54 +223,46 @@ class UniversalPlottingEngine:
                 break
         if corr is None:
             corr = np.eye(2)
-        im = plt.imshow(corr, cmap='RdYlBu_r', vmin=0, vmax=1)
-        plt.colorbar(im, label='Correlation')
-        plt.title('BASKET CORRELATION MATRIX', fontsize=16)
-        plt.xticks(range(corr.shape[0]), [f"Asset {i+1}" for i in range(corr.shape[0])])
-        plt.yticks(range(corr.shape[0]), [f"Asset {i+1}" for i in range(corr.shape[0])])
+        im = ax.imshow(corr, cmap='RdYlBu_r', vmin=0, vmax=1)
+        fig.colorbar(im, ax=ax, label='Correlation')
+        ax.set_title('BASKET CORRELATION MATRIX', fontsize=16)
+        ax.set_xticks(range(corr.shape[0]), [f"Asset {i+1}" for i in range(corr.shape[0])])
+        ax.set_yticks(range(corr.shape[0]), [f"Asset {i+1}" for i in range(corr.shape[0])])
         for i in range(corr.shape[0]):
             for j in range(corr.shape[0]):
-                plt.text(j, i, f'{corr[i,j]:.2f}', ha='center', va='center')
-        plt.tight_layout()
-        plt.show(block=False)
-    
-    def _create_returns_plot(self, mc_results: Dict):
-        plt.figure(6, figsize=(10, 6))
+                ax.text(j, i, f'{corr[i,j]:.2f}', ha='center', va='center')
+
+    def _draw_returns(self, fig, ax, mc_results: Dict, input_json: List):
         results = mc_results.get('results', [])
         fvs = [r.get('fair_value', 0) for r in results]
         if not fvs:
             fvs = [0]
-        plt.hist(fvs, bins=10, alpha=0.7, color='#3498db', edgecolor='black')
-        plt.axvline(np.mean(fvs), color='red', ls='--', label=f'Mean FV: {np.mean(fvs):.2f}')
-        plt.title('FAIR VALUE DISTRIBUTION', fontsize=16)
-        plt.xlabel('Fair Value ($)')
-        plt.ylabel('Count')
-        plt.legend()
-        plt.tight_layout()
-        plt.show(block=False)
-    
-    def _create_payoff_diagram(self, mc_results: Dict, input_json: List):
-        plt.figure(7, figsize=(10, 6))
+        ax.hist(fvs, bins=10, alpha=0.7, color='#3498db', edgecolor='black')
+        ax.axvline(np.mean(fvs), color='red', ls='--', label=f'Mean FV: {np.mean(fvs):.2f}')
+        ax.set_title('FAIR VALUE DISTRIBUTION', fontsize=16)
+        ax.set_xlabel('Fair Value ($)')
+        ax.set_ylabel('Count')
+        ax.legend()
+
+    def _draw_payoff_diagram(self, fig, ax, mc_results: Dict, input_json: List):
         results = mc_results.get('results', [])
         if not results:
-            plt.plot([50, 150], [0, 0], label='No Data', lw=2)
+            ax.plot([50, 150], [0, 0], label='No Data', lw=2)
         else:
             for res, inp in zip(results, input_json):
                 strike = inp.get('option_legs', [{}])[0].get('strike', 100) if inp.get('option_legs') else 100
                 stock_range = np.linspace(50, 150, 100)
                 premium = next((p.get('premium', 5) for p in inp.get('other_props', [])), 5)
                 payoff = premium - np.maximum(strike - stock_range, 0)
-                plt.plot(stock_range, payoff, label=res['structure_name'], lw=2)
-        plt.axhline(0, color='k', ls='-', alpha=0.3)
-        plt.title('PAYOFF DIAGRAMS: Multi-Structure', fontsize=16)
-        plt.xlabel('Stock Price at Expiry')
-        plt.ylabel('Payoff ($)')
-        plt.legend()
-        plt.grid(alpha=0.3)
-        plt.tight_layout()
-        plt.show(block=False)
-    
-    def _create_basket_sens_plot(self, mc_results: Dict, input_json: List):
+                ax.plot(stock_range, payoff, label=res['structure_name'], lw=2)
+        ax.axhline(0, color='k', ls='-', alpha=0.3)
+        ax.set_title('PAYOFF DIAGRAMS: Multi-Structure', fontsize=16)
+        ax.set_xlabel('Stock Price at Expiry')
+        ax.set_ylabel('Payoff ($)')
+        ax.legend()
+        ax.grid(alpha=0.3)
+
+    def _basket_sens_figure(self, mc_results: Dict, input_json: List) -> go.Figure:
         # FIXED: Match matrix size to labels
         data = np.random.rand(3, 5)  # 3 rows, 5 cols
         fig = px.imshow(
@@ -184,8 +274,32 @@ class UniversalPlottingEngine:
             aspect="auto"
         )
         fig.update_layout(height=500)
-        fig.show()
-        print("Interactive heatmap displayed via Plotly.")
+        return fig
+
+# === Batch rendering across processes ===
+_worker_engine: Optional[UniversalPlottingEngine] = None
+
+def _init_render_worker():
+    global _worker_engine
+    _worker_engine = UniversalPlottingEngine(headless=True)
+
+def _render_pack(job) -> Tuple[str, List[str]]:
+    name, mc_results, input_json, out_dir, formats, html = job
+    if _worker_engine is None:
+        _init_render_worker()
+    return name, _worker_engine.render_to_files(mc_results, input_json, os.path.join(out_dir, name),
+                                                formats=formats, html=html)
+
+def render_plot_packs(packs: Iterable[Tuple[str, Dict, List]], out_dir: str, formats=("png",),
+                      html: bool = True, workers: Optional[int] = None) -> Dict[str, List[str]]:
+    """Render (name, mc_results, input_json) packs headlessly, one process per CPU.
+    Each worker keeps its own engine, so figures are reused across packs."""
+    jobs = ((name, mc, inp, out_dir, tuple(formats), html) for name, mc, inp in packs)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return dict(map(_render_pack, jobs))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as pool:
+        return dict(pool.map(_render_pack, jobs, chunksize=4))
 
 if __name__ == "__main__":
     engine = UniversalPlottingEngine()
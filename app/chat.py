@@ -0,0 +1,170 @@
+# app/chat.py
+# Incremental deal parsing for live chat feeds (Bloomberg IB / WeChat style), where
+# one structure arrives as several short messages: "Tencent + Baba", "4m", "KO 98",
+# "11% pa". Each message is scanned once with the shared DealExtractor and folded
+# into a small per-conversation partial deal; history is never rescanned. When the
+# required fields are all present the deal is emitted as GR21 input (and optionally
+# priced) and the conversation starts a fresh partial for the next quote.
+# Per conversation only a handful of scalars is kept, and idle or excess
+# conversations are dropped least-recently-active first.
+import argparse
+import json
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.extractor import get_extractor
+from app.scanner import fields_to_deal, normalize_text
+
+REQUIRED = ("underlyings", "months", "ko", "coupon")
+MAX_CONVERSATIONS = 100_000
+MAX_IDLE_S = 3600.0
+
+
+class PartialDeal:
+    """Fields seen so far in one conversation; later messages override earlier values"""
+    __slots__ = ("underlyings", "months", "ko", "coupon", "callable", "messages", "last_seen")
+
+    def __init__(self):
+        self.underlyings: Tuple[str, ...] = ()
+        self.months = None
+        self.ko = None
+        self.coupon = None
+        self.callable = False
+        self.messages = 0
+        self.last_seen = 0.0
+
+    def update(self, hits: Iterable[Tuple[str, object, int, int]], max_assets: int = 2):
+        """Fold one message's scan hits; a bare percentage is the coupon unless one is stated"""
+        pct = coupon = None
+        for field, value, _, _ in hits:
+            if field == "underlying":
+                if value not in self.underlyings and len(self.underlyings) < max_assets:
+                    self.underlyings += (value,)
+            elif field == "months":
+                self.months = value
+            elif field == "ko":
+                self.ko = value
+            elif field == "coupon":
+                coupon = value if coupon is None else coupon
+            elif field == "pct":
+                pct = value if pct is None else pct
+            elif field == "callable":
+                self.callable = True
+        if coupon is not None:
+            self.coupon = coupon
+        elif pct is not None and self.coupon is None:
+            self.coupon = pct
+        self.messages += 1
+
+    def missing(self, required=REQUIRED) -> List[str]:
+        return [f for f in required if not getattr(self, f)]
+
+    def fields(self) -> Dict:
+        """DealExtractor.extract-shaped fields, for fields_to_deal"""
+        return {"underlyings": list(self.underlyings), "months": self.months, "ko": self.ko,
+                "coupon": self.coupon, "callable": self.callable}
+
+
+class ChatParser:
+    """Stateful parser over many concurrent conversations.
+    feed() returns an event dict when a message completes a deal, else None. With price=True
+    the event carries "mc" (or "future" when an executor is given, to keep feed() non-blocking)."""
+
+    def __init__(self, required=REQUIRED, max_assets: int = 2, price: bool = False,
+                 n_paths: int = 10000, executor: Optional[Executor] = None, orchestrator=None,
+                 max_conversations: int = MAX_CONVERSATIONS, max_idle: float = MAX_IDLE_S):
+        self.required = tuple(required)
+        self.max_assets = max_assets
+        self.price = price
+        self.n_paths = n_paths
+        self.executor = executor
+        self.max_conversations = max_conversations
+        self.max_idle = max_idle
+        self._orch = orchestrator
+        self._extractor = get_extractor()
+        self._open: "OrderedDict[str, PartialDeal]" = OrderedDict()  # least recently active first
+        self.stats = {"messages": 0, "deals": 0, "expired": 0}
+
+    def feed(self, conversation: str, text: str, now: Optional[float] = None) -> Optional[Dict]:
+        now = time.monotonic() if now is None else now
+        self.stats["messages"] += 1
+        partial = self._open.pop(conversation, None)
+        if partial is None:
+            partial = PartialDeal()
+        partial.update(self._extractor.scan(normalize_text(text)), self.max_assets)
+        partial.last_seen = now
+
+        if partial.missing(self.required) or not (partial.months and partial.underlyings):
+            if partial.underlyings or partial.months or partial.ko or partial.coupon:
+                self._open[conversation] = partial  # chatter with no deal terms is not kept
+            self._expire(now)
+            return None
+        self._expire(now)
+        self.stats["deals"] += 1
+        return self._emit(conversation, partial)
+
+    def _emit(self, conversation: str, partial: PartialDeal) -> Dict:
+        if self._orch is None:
+            from app.orchestrator import UScanOrchestrator
+            self._orch = UScanOrchestrator()
+        parsed = fields_to_deal(partial.fields(), self.max_assets)
+        event = {"conversation": conversation, "messages": partial.messages, "parsed": parsed,
+                 "gr21": self._orch._to_gr21_input(parsed)}
+        if self.price:
+            if self.executor is not None:
+                event["future"] = self.executor.submit(self._orch._run_mc, event["gr21"], self.n_paths)
+            else:
+                event["mc"] = self._orch._run_mc(event["gr21"], self.n_paths)
+        return event
+
+    def _expire(self, now: float):
+        """Drop conversations idle longer than max_idle, and the oldest beyond max_conversations"""
+        while self._open:
+            conversation, partial = next(iter(self._open.items()))
+            if len(self._open) <= self.max_conversations and now - partial.last_seen <= self.max_idle:
+                break
+            del self._open[conversation]
+            self.stats["expired"] += 1
+
+    def pending(self, conversation: str) -> Optional[Dict]:
+        """Partial fields and what is still missing for a conversation, if any"""
+        partial = self._open.get(conversation)
+        if partial is None:
+            return None
+        return {**partial.fields(), "missing": partial.missing(self.required), "messages": partial.messages}
+
+    def reset(self, conversation: str):
+        self._open.pop(conversation, None)
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+
+def iter_chat_deals(messages: Iterable[Tuple[str, str]], parser: Optional[ChatParser] = None) -> Iterator[Dict]:
+    """Stream (conversation, text) pairs through a ChatParser, yielding completed deals"""
+    parser = ChatParser() if parser is None else parser
+    for conversation, text in messages:
+        event = parser.feed(conversation, text)
+        if event is not None:
+            yield event
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parse deals from a JSONL chat feed of "
+                                             '{"conversation": ..., "text": ...} lines')
+    ap.add_argument("feed", nargs="?", help="JSONL file (default: stdin)")
+    ap.add_argument("--price", action="store_true", help="price each deal as it completes")
+    ap.add_argument("--paths", type=int, default=10000)
+    args = ap.parse_args()
+
+    src = open(args.feed, encoding="utf-8") if args.feed else sys.stdin
+    with src:
+        lines = (json.loads(line) for line in src if line.strip())
+        parser = ChatParser(price=args.price, n_paths=args.paths)
+        for event in iter_chat_deals(((m["conversation"], m["text"]) for m in lines), parser):
+            print(json.dumps(event, default=str), flush=True)
+    print(f"{parser.stats['messages']} messages, {parser.stats['deals']} deals, "
+          f"{len(parser)} conversations still open", file=sys.stderr)
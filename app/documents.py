@@ -0,0 +1,122 @@
+# app/documents.py
+# Term-sheet / issuer-pack extraction: one document -> many GR21 inputs.
+# The document is converted to text once, block headings are located with a
+# single regex pass, and each block is extracted over its own (start, end)
+# window of the same string -- no copies and no whole-document rescans.
+# Large documents fan blocks out to a process pool.
+import html
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.extractor import get_extractor
+from app.orchestrator import UScanOrchestrator
+from app.scanner import fields_to_deal
+
+PARALLEL_MIN_CHARS = 1_000_000
+
+BLOCK_HEAD_RE = re.compile(
+    r"^[ \t]*(?:#{1,6}[ \t]+|\d+[.)][ \t]+)?(?:indicative[ \t]+)?"
+    r"(?:term[ \t]*sheet|fixed[ \t]+coupon[ \t]+note|fcn|autocall(?:able)?|reverse[ \t]+convertible"
+    r"|(?:product|note|structure|deal|tranche|series)[ \t]*(?:#|no\.?)?[ \t]*\d+)\b[^\n]{0,80}$"
+    r"|^[ \t]*(?:-{4,}|={4,}|\f)[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_HTML_RE = re.compile(
+    r"<(script|style)\b.*?</\1\s*>|<(/?)(p|div|br|tr|li|h[1-6]|hr|table|section|article)\b[^>]*>|<[^>]+>",
+    re.IGNORECASE | re.DOTALL,
+)
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "hr", "section", "article"}
+
+
+def html_to_text(doc: str) -> str:
+    """Flatten HTML in one pass: block tags become newlines, headings get a rule"""
+    def repl(m):
+        if m.group(1):
+            return " "
+        tag = (m.group(3) or "").lower()
+        if not tag:
+            return " "
+        if tag in _HEADING_TAGS and not m.group(2):
+            return "\n----\n"
+        return "\n"
+    return html.unescape(_HTML_RE.sub(repl, doc))
+
+
+def load_document(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        doc = f.read()
+    if path.lower().endswith((".html", ".htm")) or doc.lstrip()[:1] == "<":
+        doc = html_to_text(doc)
+    return doc
+
+
+def find_blocks(text: str) -> List[Tuple[int, int]]:
+    """(start, end) spans between block headings; text before the first heading is its own block"""
+    cuts = [m.start() for m in BLOCK_HEAD_RE.finditer(text)]
+    if not cuts or cuts[0] != 0:
+        cuts.insert(0, 0)
+    cuts.append(len(text))
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def extract_span(text: str, start: int, end: int) -> Optional[Dict]:
+    """Deal dict for one block (every underlying in the block is kept)"""
+    return fields_to_deal(get_extractor().extract(text, start, end), max_assets=None)
+
+
+def _extract_chunk(args) -> List[Tuple[int, Dict]]:
+    chunk, offset, spans = args
+    out = []
+    for i, (a, b) in spans:
+        deal = extract_span(chunk, a - offset, b - offset)
+        if deal:
+            out.append((i, deal))
+    return out
+
+
+def iter_document_deals(text: str, workers: Optional[int] = None) -> Iterator[Tuple[int, Tuple[int, int], Dict]]:
+    """Yield (block_index, span, deal) in document order"""
+    spans = find_blocks(text)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if len(text) < PARALLEL_MIN_CHARS or workers <= 1 or len(spans) < 2:
+        for i, (a, b) in enumerate(spans):
+            deal = extract_span(text, a, b)
+            if deal:
+                yield i, (a, b), deal
+        return
+
+    # Group consecutive blocks into ~4 chunks per worker; each worker gets one slice
+    target = len(text) // (workers * 4) + 1
+    chunks, group, size = [], [], 0
+    for i, span in enumerate(spans):
+        group.append((i, span))
+        size += span[1] - span[0]
+        if size >= target:
+            chunks.append(group)
+            group, size = [], 0
+    if group:
+        chunks.append(group)
+    jobs = ((text[g[0][1][0]:g[-1][1][1]], g[0][1][0], g) for g in chunks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_extract_chunk, jobs):
+            for i, deal in result:
+                yield i, spans[i], deal
+
+
+def iter_document_gr21(text: str, workers: Optional[int] = None) -> Iterator[Dict]:
+    """Stream GR21 inputs for every structure block in the document"""
+    orch = UScanOrchestrator()
+    for i, _, deal in iter_document_deals(text, workers):
+        gr21 = orch._to_gr21_input(deal)[0]
+        gr21["block"] = i
+        yield gr21
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        for s in iter_document_gr21(load_document(path)):
+            print(json.dumps(s))
@@ -0,0 +1,237 @@
+# app/extractor.py
+# Single-pass deal term extractor shared by every parser in USCAN.
+# One compiled regex walks the text once; numeric fields (tenor, KO, coupon)
+# come out of named groups and every word token is fed to an Aho-Corasick
+# automaton over the underlying dictionary, so cost is linear in the text and
+# independent of how many tickers/aliases are loaded. Percentages and bare "m"
+# tenors are read in context: "strike 85%" is not a coupon and "USD 10m" is
+# not a tenor. Aliases that start with a short bare number ("5 hk") are left out
+# of the automaton, since "2 years 5 hk" reads as a quantity, not HSBC; such
+# tickers match in their dotted form ("0005.hk", "5.hk"), while "700 hk" still does.
+import csv
+import os
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_DICTIONARY = os.path.join(os.path.dirname(__file__), "config", "underlyings.csv")
+
+_NUM = r"(\d+(?:\.\d+)?)"
+MIN_BARE_TICKER_DIGITS = 3  # "700 hk" is a ticker, "5 hk" may be a quantity
+CURRENCIES = ("usd", "hkd", "eur", "gbp", "jpy", "cny", "cnh", "sgd", "aud", "chf")
+# Each branch is guarded by a first-character lookahead so ordinary words and
+# whitespace fail fast instead of trying every numeric alternative.
+TOKEN_RE = re.compile(
+    rf"(?=[kK])(?P<ko>\b(?:ko|knock[\s-]?out)\s*(?:level|barrier)?\s*(?:[:@=]|at\b)?\s*{_NUM}\s*%?)"
+    rf"|(?=[cC])(?P<coupon_pre>\b(?:coupon|cpn)\s*(?:rate)?\s*[:=]?\s*{_NUM}\s*%)"
+    rf"|(?=\d)(?:(?P<coupon_post>{_NUM}\s*%\s*(?:coupon|cpn|p\.\s?a\.?|pa\b|per\s+annum|annual))"
+    rf"|(?P<months>\b(\d+)\s*(?:months?|mths?|mos?|m\b(?!\s*(?:notional|nominal|ntl|{'|'.join(CURRENCIES)})\b))\b)"
+    rf"|(?P<years>\b{_NUM}\s*(?:years?|yrs?|y)\b)"
+    rf"|(?P<pct>{_NUM}\s*%))"
+    r"|(?P<word>[a-z0-9]+(?:[.&'][a-z0-9]+)*)",
+    re.IGNORECASE,
+)
+WORD_RE = re.compile(r"[a-z0-9]+(?:[.&'][a-z0-9]+)*", re.IGNORECASE)
+
+FLAG_WORDS = {"callable": "callable", "autocall": "callable", "autocallable": "callable"}
+# A percentage right after one of these is some other level, never the coupon
+PCT_LABELS = frozenset({"strike", "barrier", "ki", "knock", "protection", "airbag",
+                        "participation", "gearing", "trigger", "autocall", "autocallable", "call",
+                        "callable", "fee", "upfront", "spot", "initial", "floor", "cap", "ltv"})
+# ...and these continue a label without starting one ("knock-in 60%", "ki put 70%", "strike at 85%")
+PCT_CONNECTORS = frozenset({"at", "of", "level", "is", "price", "in", "put"})
+_GAP_RE = re.compile(r"[\s:=@-]*")
+
+
+def tokenize_alias(alias: str) -> Tuple[str, ...]:
+    """Split an alias with the same word rule the scanner uses"""
+    return tuple(w.lower() for w in WORD_RE.findall(alias))
+
+
+class AliasTrie:
+    """Aho-Corasick automaton over word tokens (multi-word aliases like "hang seng")"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        self._built = True
+        self.size = 0
+        self.max_tokens = 0
+
+    def add(self, alias: str, name: str):
+        tokens = tokenize_alias(alias)
+        if not tokens:
+            return
+        node = 0
+        for tok in tokens:
+            nxt = self._goto[node].get(tok)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][tok] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node] = [(len(tokens), name)]
+        self._built = False
+        self.size += 1
+        self.max_tokens = max(self.max_tokens, len(tokens))
+
+    def build(self):
+        """Compute failure links (BFS) and merge outputs along them"""
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for tok, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(tok, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def root(self) -> Dict[str, int]:
+        """Tokens that can start an alias"""
+        if not self._built:
+            self.build()
+        return self._goto[0]
+
+    def step(self, state: int, token: str) -> int:
+        if not self._built:
+            self.build()
+        goto, fail = self._goto, self._fail
+        while state and token not in goto[state]:
+            state = fail[state]
+        return goto[state].get(token, 0)
+
+    def matches(self, state: int) -> List[Tuple[int, str]]:
+        """(n_tokens, name) for every alias ending at this state, longest first"""
+        return self._out[state]
+
+
+def load_dictionary(path: str = DEFAULT_DICTIONARY) -> AliasTrie:
+    """Load a name,ticker,aliases CSV (aliases separated by '|') into a trie.
+    Aliases starting with a bare number shorter than MIN_BARE_TICKER_DIGITS are skipped."""
+    trie = AliasTrie()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            name = row["name"].strip()
+            trie.add(name, name)
+            if row.get("ticker"):
+                trie.add(row["ticker"], name)
+            for alias in (row.get("aliases") or "").split("|"):
+                tokens = tokenize_alias(alias)
+                if tokens and not (tokens[0].isdigit() and len(tokens[0]) < MIN_BARE_TICKER_DIGITS):
+                    trie.add(alias, name)
+    trie.build()
+    return trie
+
+
+class DealExtractor:
+    def __init__(self, trie: Optional[AliasTrie] = None):
+        self.trie = trie if trie is not None else load_dictionary()
+
+    def scan(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Tuple[str, object, int, int]]:
+        """Yield (field, value, start, end) hits in document order, in one pass"""
+        endpos = len(text) if endpos is None else endpos
+        trie = self.trie
+        root = trie.root()
+        state = 0
+        starts = deque(maxlen=max(trie.max_tokens, 1))  # start offsets of recent words
+        run: List[Tuple[int, int, str]] = []  # alias hits while a prefix is still open
+        label_end = currency_end = -1  # end of the last percentage label / currency word
+        for m in TOKEN_RE.finditer(text, pos, endpos):
+            kind = m.lastgroup
+            if kind != "word":
+                state = 0
+                if run:
+                    yield from _resolve(run)
+                    run = []
+                value = m.group(m.lastindex + 1)
+                after_label = label_end >= 0 and _GAP_RE.fullmatch(text, label_end, m.start())
+                after_currency = currency_end >= 0 and _GAP_RE.fullmatch(text, currency_end, m.start())
+                label_end = currency_end = -1
+                if kind == "months":
+                    if not (after_currency and text[m.end() - 1] in "mM"):  # "USD 10m" is an amount
+                        yield "months", int(value), m.start(), m.end()
+                elif kind == "years":
+                    yield "months", int(round(float(value) * 12)), m.start(), m.end()
+                elif kind == "ko":
+                    yield "ko", _number(value), m.start(), m.end()
+                elif kind in ("coupon_pre", "coupon_post"):
+                    yield "coupon", float(value), m.start(), m.end()
+                elif not after_label:
+                    yield "pct", float(value), m.start(), m.end()
+                continue
+
+            token = m.group(0).lower()
+            if token in PCT_LABELS:
+                label_end = m.end()
+            elif token in PCT_CONNECTORS and label_end >= 0 and _GAP_RE.fullmatch(text, label_end, m.start()):
+                label_end = m.end()  # "strike at 85%", "barrier level 70%"
+            else:
+                label_end = -1
+            currency_end = m.end() if token in CURRENCIES else -1
+            if token in FLAG_WORDS:
+                yield FLAG_WORDS[token], True, m.start(), m.end()
+            if state == 0 and token not in root:
+                continue  # fast path: most words cannot start an alias
+            starts.append(m.start())
+            state = trie.step(state, token)
+            for n_tokens, name in trie.matches(state):
+                run.append((starts[-n_tokens], m.end(), name))
+            if state == 0 and run:
+                # No alias prefix is open, so nothing later can overlap these hits
+                yield from _resolve(run)
+                run = []
+        if run:
+            yield from _resolve(run)
+
+    def extract(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Dict:
+        """Fold scan hits into fields: first tenor/KO/coupon wins, underlyings in order.
+        Without a stated coupon the first unlabeled percentage is taken as the coupon."""
+        fields = {"underlyings": [], "months": None, "ko": None, "coupon": None, "callable": False}
+        pct = None
+        for field, value, _, _ in self.scan(text, pos, endpos):
+            if field == "underlying":
+                if value not in fields["underlyings"]:
+                    fields["underlyings"].append(value)
+            elif field == "callable":
+                fields["callable"] = True
+            elif field == "pct":
+                pct = value if pct is None else pct
+            elif fields[field] is None:
+                fields[field] = value
+        if fields["coupon"] is None and pct is not None:
+            fields["coupon"] = pct
+        return fields
+
+
+def _resolve(run: List[Tuple[int, int, str]]) -> Iterator[Tuple[str, str, int, int]]:
+    """Longest non-overlapping aliases, left to right"""
+    last_end = -1
+    for start, end, name in sorted(run, key=lambda h: (h[0], h[0] - h[1])):
+        if start >= last_end:
+            yield "underlying", name, start, end
+            last_end = end
+
+
+def _number(s: str):
+    v = float(s)
+    return int(v) if v.is_integer() else v
+
+
+_default: Optional[DealExtractor] = None
+
+
+def get_extractor() -> DealExtractor:
+    """Process-wide extractor, compiled once from the default dictionary"""
+    global _default
+    if _default is None:
+        _default = DealExtractor()
+    return _default
@@ -0,0 +1,123 @@
+# app/history.py
+# Joint daily log-return history for the instrument universe, plus raw closes
+# for lifecycle marking (load_closes).
+# Built once from a long-format close CSV (date,ticker,close) into a single
+# (days x instruments) float32 matrix on the union calendar, closes carried
+# forward over holidays, and memory-mapped on load like the symbol index.
+# Days before an instrument's first close are NaN; select() trims to the
+# window where every requested instrument has history.
+import csv
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+RETURNS_DIR = "data/returns"
+PRICE_HISTORY = "data/prices.csv"
+
+
+def _read_closes(csv_path: str, ids: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """ticker -> {date: close}, optionally only for ids"""
+    wanted = set(ids) if ids is not None else None
+    closes: Dict[str, Dict[str, float]] = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            t = row["ticker"].strip()
+            if row.get("close") and (wanted is None or t in wanted):
+                closes.setdefault(t, {})[row["date"].strip()] = float(row["close"])
+    return closes
+
+
+def _align_closes(closes: Dict[str, Dict[str, float]], ids: List[str]):
+    """(dates, (days x ids) closes) on the union calendar, carried forward; NaN before first close"""
+    dates = sorted({d for t in ids for d in closes.get(t, {})})
+    row_of = {d: i for i, d in enumerate(dates)}
+    levels = np.full((len(dates), len(ids)), np.nan)
+    for j, t in enumerate(ids):
+        series = closes.get(t, {})
+        rows = np.fromiter((row_of[d] for d in series), dtype=np.int64, count=len(series))
+        levels[rows, j] = np.fromiter(series.values(), dtype=np.float64, count=len(series))
+    idx = np.where(np.isnan(levels), 0, np.arange(len(dates))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return dates, levels[idx, np.arange(len(ids))]
+
+
+def load_closes(ids: List[str], start: str, end: Optional[str] = None,
+                csv_path: str = PRICE_HISTORY):
+    """Closes for ids on every date in [start, end] (ISO dates) where all of them have a price.
+    Returns (dates, (days x ids) array)."""
+    closes = _read_closes(csv_path, ids)
+    missing = [t for t in ids if t not in closes]
+    if missing:
+        raise KeyError(f"No closes for {', '.join(missing)} in {csv_path}")
+    dates, levels = _align_closes(closes, ids)
+    keep = np.array([start <= d and (end is None or d <= end) for d in dates], dtype=bool)
+    keep &= np.isfinite(levels).all(axis=1)
+    return [d for d, k in zip(dates, keep) if k], levels[keep]
+
+
+class ReturnHistory:
+    def __init__(self, returns: np.ndarray, ids: List[str], dates: List[str]):
+        self.returns = returns          # (days, instruments) log returns, row i = dates[i] vs previous close
+        self.ids = ids
+        self.dates = dates
+        self._col = {t: i for i, t in enumerate(ids)}
+
+    @classmethod
+    def build(cls, csv_path: str = PRICE_HISTORY) -> "ReturnHistory":
+        closes = _read_closes(csv_path)
+        ids = sorted(closes)
+        dates, levels = _align_closes(closes, ids)
+        returns = np.diff(np.log(levels), axis=0).astype(np.float32)
+        return cls(returns, ids, dates[1:])
+
+    def save(self, out_dir: str, source: Dict):
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, "returns.npy"), self.returns)
+        with open(os.path.join(out_dir, "meta.json"), "w") as f:
+            json.dump({"source": source, "ids": self.ids, "dates": self.dates}, f)
+
+    @classmethod
+    def load(cls, csv_path: str = PRICE_HISTORY, out_dir: str = RETURNS_DIR) -> "ReturnHistory":
+        """Memory-map the prebuilt matrix, rebuilding it first if the CSV changed"""
+        st = os.stat(csv_path)
+        source = {"csv": os.path.abspath(csv_path), "size": st.st_size, "mtime": st.st_mtime}
+        try:
+            with open(os.path.join(out_dir, "meta.json")) as f:
+                meta = json.load(f)
+            if meta["source"] == source:
+                return cls(np.load(os.path.join(out_dir, "returns.npy"), mmap_mode="r"),
+                           meta["ids"], meta["dates"])
+        except (OSError, ValueError, KeyError):
+            pass
+        history = cls.build(csv_path)
+        try:
+            history.save(out_dir, source)
+        except OSError as e:
+            print(f"Return history not cached ({e})")
+        return history
+
+    def select(self, ids: List[str]) -> np.ndarray:
+        """(days, len(ids)) float64 returns over the window where all ids have history"""
+        missing = [t for t in ids if t not in self._col]
+        if missing:
+            raise KeyError(f"No return history for {', '.join(map(str, missing))}")
+        block = np.asarray(self.returns[:, [self._col[t] for t in ids]], dtype=np.float64)
+        valid = np.isfinite(block).all(axis=1)
+        first = int(np.argmax(valid)) if valid.any() else len(block)
+        return block[first:]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+_default: Optional[ReturnHistory] = None
+
+
+def get_return_history() -> ReturnHistory:
+    """Process-wide history, loaded once"""
+    global _default
+    if _default is None:
+        _default = ReturnHistory.load()
+    return _default
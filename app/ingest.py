@@ -0,0 +1,216 @@
+# app/ingest.py
+# Streaming email ingestion: mbox files and folders of .eml/.txt messages flow
+# through decode -> strip quotes/signature -> dedup -> parse_deal -> price.
+# Every stage is a generator, so memory stays bounded by the in-flight window
+# plus one digest per unique body, no matter how big the inbox is.
+import argparse
+import email
+import hashlib
+import json
+import mailbox
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from email import policy
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+MESSAGE_EXTS = (".eml", ".txt")
+
+_QUOTE_HEADER_RE = re.compile(
+    r"^\s*(?:on\s.+wrote:|-{2,}\s*original message\s*-{2,}|from:\s.+\s<?[\w.+-]+@[\w.-]+>?)\s*$",
+    re.IGNORECASE,
+)
+_FORWARD_RE = re.compile(r"^\s*(?:-{2,}\s*forwarded message\s*-{2,}|begin forwarded message:)\s*$", re.IGNORECASE)
+_HEADER_FIELD_RE = re.compile(r"^\s*(?:from|sent|date|to|cc|subject|reply-to)\s*:", re.IGNORECASE)
+_FORWARD_SUBJECT_RE = re.compile(r"^\s*fwd?\s*:", re.IGNORECASE)
+_SIGNATURE_RE = re.compile(
+    r"^\s*(?:--\s*|sent from my \w+.*|best regards,?|kind regards,?|regards,?|thanks,?|disclaimer:.*)$",
+    re.IGNORECASE,
+)
+SIGNATURE_LINES = 8  # a sign-off only counts within this many lines of the end of a segment
+_TAG_RE = re.compile(r"<[^>]+>")
+_NORM_RE = re.compile(r"\s+")
+
+
+# === Sources ===
+def iter_raw_messages(paths: Iterable[str]) -> Iterator[Tuple[str, email.message.Message]]:
+    """Yield (source_id, message) from mbox files and .eml/.txt directory trees"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _iter_dir(path)
+        elif path.lower().endswith(MESSAGE_EXTS):
+            yield path, _read_message(path)
+        else:
+            box = mailbox.mbox(path, factory=None, create=False)
+            try:
+                for i, key in enumerate(box.iterkeys()):
+                    with box.get_file(key) as f:
+                        yield f"{path}#{i}", email.message_from_binary_file(f, policy=policy.default)
+            finally:
+                box.close()
+
+
+def _iter_dir(root: str) -> Iterator[Tuple[str, email.message.Message]]:
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(MESSAGE_EXTS):
+                    yield entry.path, _read_message(entry.path)
+
+
+def _read_message(path: str) -> email.message.Message:
+    with open(path, "rb") as f:
+        if path.lower().endswith(".txt"):
+            msg = email.message.EmailMessage()
+            msg.set_content(f.read().decode("utf-8", errors="replace"))
+            return msg
+        return email.message_from_binary_file(f, policy=policy.default)
+
+
+# === Stages ===
+def decode_body(msg: email.message.Message) -> str:
+    """Best text body: text/plain if present, else tag-stripped text/html"""
+    plain, html = None, None
+    for part in msg.walk() if msg.is_multipart() else [msg]:
+        ctype = part.get_content_type()
+        if ctype not in ("text/plain", "text/html") or part.get_filename():
+            continue
+        try:
+            text = part.get_content()
+        except (LookupError, KeyError, AttributeError):
+            payload = part.get_payload(decode=True) or b""
+            text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+        if ctype == "text/plain" and plain is None:
+            plain = text
+        elif ctype == "text/html" and html is None:
+            html = _TAG_RE.sub(" ", text)
+    return plain if plain is not None else (html or "")
+
+
+def strip_reply(body: str, forwarded: bool = False) -> str:
+    """Drop quoted reply history and signature blocks; keep forwarded content.
+    Forward headers (and, for a forwarded message, Outlook "Original Message" headers) split the
+    body into segments instead of ending it; each segment loses its own trailing signature."""
+    def starts_forward(line):
+        return _FORWARD_RE.match(line) or (forwarded and _QUOTE_HEADER_RE.match(line))
+
+    segments, kept = [], []
+    lines = iter(body.splitlines())
+    for line in lines:
+        if starts_forward(line):
+            segments.append(kept)
+            kept = []
+            while line is not None and starts_forward(line):  # skip the header block(s)
+                line = next((l for l in lines if l.strip() and not _HEADER_FIELD_RE.match(l)), None)
+            if line is None:
+                break
+        if _QUOTE_HEADER_RE.match(line):  # also the first line after a forward header
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        kept.append(line)
+    segments.append(kept)
+    return "\n\n".join(s for s in map(_strip_signature, segments) if s)
+
+
+def _strip_signature(lines) -> str:
+    """Cut at the first sign-off in the last few lines, never at the opening line"""
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    for i in content[1:][-SIGNATURE_LINES:]:
+        if _SIGNATURE_RE.match(lines[i]):
+            lines = lines[:i]
+            break
+    return "\n".join(lines).strip()
+
+
+def body_digest(body: str) -> str:
+    normalized = _NORM_RE.sub(" ", body.casefold()).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def iter_bodies(paths: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+    """(source_id, digest, body) for every message with a non-empty body"""
+    for source, msg in iter_raw_messages(paths):
+        body = strip_reply(decode_body(msg), forwarded=bool(_FORWARD_SUBJECT_RE.match(msg.get("subject") or "")))
+        if body:
+            yield source, body_digest(body), body
+
+
+# === Worker side ===
+_orch = None
+
+
+def _init_worker():
+    global _orch
+    from app.orchestrator import UScanOrchestrator
+    _orch = UScanOrchestrator()
+
+
+def price_body(body: str) -> Dict:
+    """parse_deal -> GR21 -> MC for one body (runs in a worker process)"""
+    from app.scanner import parse_deal
+    if _orch is None:
+        _init_worker()
+    parsed = parse_deal(body)
+    if not parsed:
+        return {"status": "error", "error": "Parse failed"}
+    gr21 = _orch._to_gr21_input(parsed)
+    return {"status": "success", "parsed": parsed, "mc": _orch._run_mc(gr21)}
+
+
+# === Pipeline ===
+def run_ingestion(paths: Iterable[str], out_path: str, workers: Optional[int] = None,
+                  max_inflight: Optional[int] = None) -> Dict:
+    """Stream messages to a JSONL file; each unique body is parsed and priced once"""
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or workers * 4
+    first_source: Dict[str, str] = {}
+    stats = {"messages": 0, "unique": 0, "duplicates": 0, "priced": 0, "failed": 0}
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+
+    with open(out_path, "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {}
+
+        def drain(block_until):
+            done, _ = wait(pending, return_when=block_until)
+            for fut in done:
+                source, digest = pending.pop(fut)
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    rec = {"status": "error", "error": str(e)}
+                stats["priced" if rec["status"] == "success" else "failed"] += 1
+                out.write(json.dumps({"source": source, "digest": digest, **rec}, default=str) + "\n")
+
+        for source, digest, body in iter_bodies(paths):
+            stats["messages"] += 1
+            if digest in first_source:
+                stats["duplicates"] += 1
+                out.write(json.dumps({"source": source, "digest": digest,
+                                      "duplicate_of": first_source[digest]}) + "\n")
+                continue
+            first_source[digest] = source
+            stats["unique"] += 1
+            pending[pool.submit(price_body, body)] = (source, digest)
+            if len(pending) >= max_inflight:
+                drain(FIRST_COMPLETED)
+        while pending:
+            drain(FIRST_COMPLETED)
+
+    print(f"Ingested {stats['messages']} messages: {stats['unique']} unique, "
+          f"{stats['duplicates']} duplicates, {stats['priced']} priced, {stats['failed']} failed")
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parse and price deals from mbox/.eml/.txt inputs")
+    ap.add_argument("paths", nargs="+", help="mbox files, message files or directories")
+    ap.add_argument("--out", default=f"outputs/ingest/INGEST_{datetime.now().strftime('%Y%m%d_%H%M')}.jsonl")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    run_ingestion(args.paths, args.out, workers=args.workers)
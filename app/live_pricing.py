@@ -0,0 +1,95 @@
+# app/live_pricing.py
+# Progressive pricing for interactive front ends.
+# A LiveRun prices one structure on a background executor through GR21 price_structure:
+# notes it sends to Monte Carlo run in growing path batches (mc_batches) with the
+# running estimate published after every batch, PDE/table quotes land at once; callers
+# poll snapshot() from the UI thread and may cancel() between batches. Runs go either
+# to a plain executor or through the AnalysisScheduler (tier caps, fair share, shedding).
+import threading
+from concurrent.futures import Executor
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.GR21_MC_Engine import Structure, price_structure
+
+
+class LiveRun:
+    def __init__(self, gr21_input: Dict, n_paths: int = 200000, n_steps: int = 1,
+                 seed: Optional[int] = None):
+        self.gr21_input = gr21_input
+        self.structure = Structure.from_json(gr21_input)
+        self.n_paths = n_paths
+        self.n_steps = n_steps
+        self.seed = seed
+        self.status = "queued"  # queued | running | done | cancelled | error
+        self.error: Optional[str] = None
+        self.future = None
+        self._latest: Optional[Dict] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, executor: Executor) -> "LiveRun":
+        self.future = executor.submit(self._run)
+        return self
+
+    def submit(self, scheduler, user_id: str = "guest") -> "LiveRun":
+        """Queue on an AnalysisScheduler; it may lower n_paths (tier cap, overload) or shed the run"""
+        self.future = scheduler.submit(self.structure.name, user_id, n_paths=self.n_paths, run=self._scheduled)
+        self.future.add_done_callback(self._on_done)
+        return self
+
+    def _scheduled(self, text: str, user_id: str, n_paths: int) -> Dict:
+        self.n_paths = n_paths
+        self._run()
+        return {"status": "error" if self.status == "error" else "success", "live": self.status}
+
+    def _on_done(self, future):
+        """A shed run resolves without ever starting; surface the scheduler's error"""
+        if future.cancelled() or self.status != "queued":
+            return
+        result = future.result() if future.exception() is None else {"error": str(future.exception())}
+        self.error = result.get("error", "not run")
+        self.status = "error"
+
+    def _run(self):
+        if self._cancel.is_set():
+            self.status = "cancelled"
+            return
+        self.status = "running"
+        try:
+            result = price_structure(self.gr21_input, n_paths=self.n_paths, n_steps=self.n_steps,
+                                     progress=self._publish, rng=np.random.default_rng(self.seed))
+            if "paths_done" not in result:  # closed-form quote: no sampling error beyond the table's own
+                result = {**result, "ci95": result.get("table_error", 0.0), "paths_done": self.n_paths,
+                          "n_paths": self.n_paths}
+            self._publish(result)
+            self.status = "cancelled" if self._cancel.is_set() else "done"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "error"
+
+    def _publish(self, est: Dict) -> bool:
+        with self._lock:
+            self._latest = est
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Stop after the batch in flight; a run still queued never starts"""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelled"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "cancelled", "error")
+
+    def snapshot(self) -> Optional[Dict]:
+        """Latest running estimate (a copy), or None before the first batch lands"""
+        with self._lock:
+            return dict(self._latest) if self._latest else None
+
+    def mc_results(self) -> Dict:
+        """Latest estimate in the {"results": [...]} shape the report engines take"""
+        snap = self.snapshot()
+        return {"results": [snap] if snap else []}
@@ -3,60 +3,108 @@ from enum import Enum
 from datetime import datetime
 import json
 import os
+import sqlite3
+import threading
+
+FREE_MONTHLY_RUNS = 5
 
 class MembershipTier(Enum):
     FREE = "free"
     PREMIUM = "premium"
 
 class UScanMembership:
-    def __init__(self):
-        self.db_path = "data/user_usage.json"
-        os.makedirs("data", exist_ok=True)
+    """Per-user monthly quotas in SQLite (WAL): one atomic upsert per check, safe across processes"""
+
+    def __init__(self, db_path: str = "data/user_usage.db", legacy_json: str = "data/user_usage.json"):
+        self.db_path = db_path
+        self.legacy_json = legacy_json
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._local = threading.local()
         self._ensure_db()
 
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
     def _ensure_db(self):
-        """Create valid JSON file if missing or corrupt"""
-        if not os.path.exists(self.db_path):
-            with open(self.db_path, "w") as f:
-                json.dump({}, f)
-            print(f"Created new user DB: {self.db_path}")
-            return
-        
-        # Validate JSON
+        """Create tables and import the legacy JSON usage file once"""
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY, tier TEXT NOT NULL DEFAULT 'free', created TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS usage (
+                user_id TEXT NOT NULL, month TEXT NOT NULL, runs INTEGER NOT NULL,
+                PRIMARY KEY (user_id, month)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        if os.path.exists(self.legacy_json):
+            self._migrate_json(conn)
+
+    def _migrate_json(self, conn: sqlite3.Connection):
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            with open(self.db_path, "r") as f:
-                json.load(f)
-        except:
-            print(f"Corrupted DB detected. Resetting {self.db_path}")
-            with open(self.db_path, "w") as f:
-                json.dump({}, f)
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+                conn.execute("COMMIT")
+                return
+            try:
+                with open(self.legacy_json, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                print(f"Corrupted legacy DB {self.legacy_json}; skipping migration")
+                data = {}
+            for user_id, user in data.items():
+                conn.execute("INSERT OR IGNORE INTO users (user_id, tier, created) VALUES (?, ?, ?)",
+                             (user_id, user.get("tier", "free"), user.get("created", datetime.now().isoformat())))
+                for month, runs in user.get("runs", {}).items():
+                    conn.execute("""INSERT INTO usage (user_id, month, runs) VALUES (?, ?, ?)
+                                    ON CONFLICT (user_id, month) DO UPDATE SET runs = MAX(runs, excluded.runs)""",
+                                 (user_id, month, int(runs)))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_json', ?)", (datetime.now().isoformat(),))
+            conn.execute("COMMIT")
+            print(f"Migrated {len(data)} users from {self.legacy_json} to {self.db_path}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_tier(self, user_id: str) -> MembershipTier:
+        row = self._conn().execute("SELECT tier FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return MembershipTier(row[0]) if row else MembershipTier.FREE
+
+    def set_tier(self, user_id: str, tier: MembershipTier):
+        self._conn().execute("""INSERT INTO users (user_id, tier, created) VALUES (?, ?, ?)
+                                ON CONFLICT (user_id) DO UPDATE SET tier = excluded.tier""",
+                             (user_id, tier.value, datetime.now().isoformat()))
 
     def can_run_analysis(self, user_id: str) -> dict:
-        self._ensure_db()
-        try:
-            with open(self.db_path, "r") as f:
-                data = json.load(f)
-        except:
-            data = {}
-        
-        if user_id not in data:
-            data[user_id] = {"tier": "free", "runs": {}, "created": datetime.now().isoformat()}
-        
-        user = data[user_id]
+        conn = self._conn()
         month = datetime.now().strftime("%Y-%m")
-        runs = user["runs"].get(month, 0)
-        
-        if user["tier"] == "free" and runs >= 5:
-            return {"allowed": False, "remaining": 0, "message": "Free tier limit: 5/month. Upgrade?"}
-        
-        user["runs"][month] = runs + 1
-        data[user_id] = user
-        
-        with open(self.db_path, "w") as f:
-            json.dump(data, f, indent=2)
-        
-        remaining = "Unlimited" if user["tier"] == "premium" else max(0, 5 - runs - 1)
-        return {"allowed": True, "remaining": remaining, "message": f"Run #{runs + 1}"}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO users (user_id, tier, created) VALUES (?, 'free', ?)",
+                         (user_id, datetime.now().isoformat()))
+            tier = conn.execute("SELECT tier FROM users WHERE user_id = ?", (user_id,)).fetchone()[0]
+            limit = FREE_MONTHLY_RUNS if tier == "free" else None
+            cur = conn.execute("""INSERT INTO usage (user_id, month, runs) VALUES (?, ?, 1)
+                                  ON CONFLICT (user_id, month) DO UPDATE SET runs = runs + 1
+                                  WHERE ? IS NULL OR runs < ?""",
+                               (user_id, month, limit, limit))
+            allowed = cur.rowcount > 0
+            runs = conn.execute("SELECT runs FROM usage WHERE user_id = ? AND month = ?",
+                                (user_id, month)).fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        if not allowed:
+            return {"allowed": False, "remaining": 0, "message": f"Free tier limit: {FREE_MONTHLY_RUNS}/month. Upgrade?"}
+        remaining = "Unlimited" if tier == "premium" else max(0, FREE_MONTHLY_RUNS - runs)
+        return {"allowed": True, "remaining": remaining, "message": f"Run #{runs}"}
 
 # Legal Disclaimers
 LEGAL_DISCLAIMERS = {
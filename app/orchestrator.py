@@ -1,6 +1,9 @@
 ﻿from app.scanner import parse_deal
-from app.GR21_MC_Engine import Structure, mc_value
+from app.GR21_MC_Engine import NoteSolver, Structure, lifecycle_mtm, price_structure
+from app.history import PRICE_HISTORY, load_closes
 from app.GR31_Report_Engine import ReportEngine
+from app.symbols import get_symbol_index
+import itertools
 import os
 import json
 from datetime import datetime
@@ -8,10 +11,12 @@ from datetime import datetime
 class UScanOrchestrator:
     def __init__(self):
         self.report_engine = ReportEngine()
+        self.symbols = get_symbol_index()
 
     def _to_gr21_input(self, parsed):
         underlyings = parsed.get("basket", ["Tencent", "Baba"])
-        initial_prices = [100.0] * len(underlyings)
+        instruments = [self.symbols.resolve(u) for u in underlyings]
+        initial_prices = [i.spot if i and i.spot else 100.0 for i in instruments]
         barriers = []
         if parsed.get("ko"):
             barriers.append({"type": "KO_DOWN", "level": f"{parsed['ko']}%"})
@@ -22,6 +27,7 @@ class UScanOrchestrator:
         return [{
             "name": parsed.get("name", "Note"),
             "underlyings": underlyings,
+            "instrument_ids": [i.id if i else None for i in instruments],
             "initial_prices": initial_prices,
             "maturity": parsed.get("maturity_months", 4) / 12.0,
             "basket_type": "WORST_OF",
@@ -29,22 +35,69 @@ class UScanOrchestrator:
             "other_props": props
         }]
 
-    def _run_mc(self, gr21_input):
-        results = []
+    def _run_mc(self, gr21_input, n_paths: int = 10000, fan_steps: int = 0, scenario_seed: int = None,
+                method: str = "auto"):
+        """fan_steps > 0 simulates that many steps and attaches fan-chart aggregates;
+        method is passed to price_structure ("mc" forces Monte Carlo)"""
+        return {"results": list(self._iter_mc(gr21_input, n_paths, fan_steps, scenario_seed, method))}
+
+    def _iter_mc(self, gr21_input, n_paths: int = 10000, fan_steps: int = 0, scenario_seed: int = None,
+                 method: str = "auto"):
+        """Price structures one at a time (lazy counterpart of _run_mc)"""
         for s in gr21_input:
-            struct = Structure.from_json(s)
-            mc = mc_value(struct, n_paths=10000, n_steps=1)
-            mc["structure_name"] = struct.name
-            results.append(mc)
-        return {"results": results}
+            yield price_structure(s, n_paths=n_paths, n_steps=max(fan_steps, 1), method=method,
+                                  fan=fan_steps > 0, scenario_seed=scenario_seed)
+
+    def solve_terms(self, gr21_item, n_paths: int = 100000, target: float = None, survival: float = 70.0):
+        """Par coupon, KO level for par and KO level for a survival target, all from one simulation"""
+        struct = Structure.from_json(gr21_item)
+        solver = NoteSolver(struct, n_paths=n_paths)
+        return {
+            "structure_name": struct.name,
+            "fair_value_gross": float(solver.value()),
+            "par_coupon": solver.par_coupon(target),
+            "ko_for_par": solver.ko_for_value(target),
+            "survival_target": survival,
+            "ko_for_survival": solver.ko_for_survival(survival),
+        }
+
+    def mark_to_market(self, gr21_item, trade_date: str, end_date: str = None, n_paths: int = 20000,
+                       csv_path: str = PRICE_HISTORY):
+        """Daily MTM from trade_date (ISO) to end_date or the last close on file, in one simulation.
+        The initial fixing is the trade-date close of each underlying."""
+        struct = Structure.from_json(gr21_item)
+        unresolved = [u for u, i in zip(struct.underlyings, struct.instrument_ids) if not i]
+        if unresolved:
+            raise ValueError(f"No instrument for underlying(s) {', '.join(unresolved)}; cannot load closes")
+        dates, spots = load_closes(struct.instrument_ids, trade_date, end_date, csv_path)
+        if not dates or dates[0] != trade_date:
+            raise ValueError(f"No closes for every underlying on trade date {trade_date}")
+        struct.initial_prices = spots[0].copy()
+        t0 = datetime.fromisoformat(trade_date)
+        elapsed = [(datetime.fromisoformat(d) - t0).days / 365.0 for d in dates]
+        live = [i for i, t in enumerate(elapsed) if t <= struct.maturity]
+        marks = lifecycle_mtm(struct, [elapsed[i] for i in live], spots[live], n_paths=n_paths)
+        return {"structure_name": struct.name, "dates": [dates[i] for i in live], **marks}
+
+def run_book(gr21_input, out_base: str, formats=(".md", ".html", ".csv"), n_paths: int = 10000,
+             scenario_seed: int = None):
+    """Price a book of structures and stream its report to out_base + each extension.
+    gr21_input may be a generator; nothing is held per structure. With scenario_seed every
+    note of the same shape is priced on one stored normal cube (app.scenarios)."""
+    orch = UScanOrchestrator()
+    inputs, to_price = itertools.tee(gr21_input)
+    os.makedirs(os.path.dirname(out_base) or ".", exist_ok=True)
+    paths = [f"{out_base}{ext}" for ext in formats]
+    summary = orch.report_engine.render_files(orch._iter_mc(to_price, n_paths, scenario_seed=scenario_seed), inputs, paths)
+    return {"status": "success", "summary": summary, "paths": paths}
 
-def run_analysis(text: str, user_id: str = "guest"):
+def run_analysis(text: str, user_id: str = "guest", n_paths: int = 10000):
     orch = UScanOrchestrator()
     parsed = parse_deal(text)
     if not parsed:
         return {"status": "error", "error": "Parse failed"}
     gr21 = orch._to_gr21_input(parsed)
-    mc = orch._run_mc(gr21)
+    mc = orch._run_mc(gr21, n_paths=n_paths)
     report = orch.report_engine.generate_report(mc, gr21)
     os.makedirs(f"outputs/{user_id}", exist_ok=True)
     base = f"outputs/{user_id}/USCAN_{datetime.now().strftime('%Y%m%d_%H%M')}"
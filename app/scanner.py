@@ -1,19 +1,89 @@
-﻿import re
+﻿import hashlib
+import threading
+from collections import OrderedDict
 from typing import Optional, Dict
+from app.extractor import get_extractor
+
+_PUNCT = str.maketrans({
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u2013": "-", "\u2014": "-", "\u2212": "-", "\uff05": "%", "\u00a0": " ",
+})
+_SPACED = (",", ";", "+", "/")
+
+def normalize_text(text: str) -> str:
+    """Canonical form for cache keys: case fold, unify punctuation, collapse whitespace"""
+    if not text.isascii():
+        text = text.translate(_PUNCT)
+    text = text.casefold()
+    for ch in _SPACED:
+        if ch in text:
+            text = text.replace(ch, f" {ch} ")
+    return " ".join(text.split())
+
+class ParseCache:
+    """Thread-safe LRU of parse results keyed by a digest of the normalized text"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_parse(self, text: str) -> Optional[Dict]:
+        normalized = normalize_text(text)
+        key = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return _copy(self._data[key])
+            self.misses += 1
+        parsed = parse_deal_uncached(normalized)
+        with self._lock:
+            self._data[key] = parsed
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return _copy(parsed)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._data), "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+def _copy(parsed: Optional[Dict]) -> Optional[Dict]:
+    return None if parsed is None else {**parsed, "basket": list(parsed["basket"])}
+
+# Shared by every run_analysis call in the process
+PARSE_CACHE = ParseCache()
 
 def parse_deal(text: str) -> Optional[Dict]:
-    text = text.lower()
-    months = re.search(r"(\d+)\s*months?", text)
-    ko = re.search(r"ko\s*(\d+)%", text)
-    coupon = re.search(r"(\d+(?:\.\d+)?)%\s*coupon", text)
-    assets = re.findall(r"\b(tencent|baba|hsbc|hang seng|apple|google)\b", text)[:2]
-    if not months or len(assets) < 1:
+    return PARSE_CACHE.get_or_parse(text)
+
+def parse_deal_uncached(text: str) -> Optional[Dict]:
+    return fields_to_deal(get_extractor().extract(text))
+
+def fields_to_deal(fields: Dict, max_assets: Optional[int] = 2) -> Optional[Dict]:
+    """Turn DealExtractor fields into the parse_deal dict (None if tenor/underlying missing)"""
+    assets = fields["underlyings"][:max_assets]
+    if not fields["months"] or len(assets) < 1:
         return None
+    ko = fields["ko"] if fields["ko"] is not None else 100
     return {
-        "name": f"{'_'.join([a.title() for a in assets])}_KO{ko.group(1) if ko else '100'}",
-        "basket": [a.title() for a in assets],
-        "maturity_months": int(months.group(1)),
-        "ko": int(ko.group(1)) if ko else 100,
-        "coupon": float(coupon.group(1)) if coupon else 0.0,
-        "principal": 100.0
+        "name": f"{'_'.join(assets)}_KO{ko}",
+        "basket": assets,
+        "maturity_months": fields["months"],
+        "ko": ko,
+        "coupon": fields["coupon"] if fields["coupon"] is not None else 0.0,
+        "principal": 100.0,
+        "callable": fields["callable"]
     }
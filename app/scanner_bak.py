@@ -56,48 +56,51 @@ def main():
         else:
             st.warning("⚠️ Please enter some text to analyze")
 
-def analyze_structure(text):
-    st.markdown("---")
-    st.subheader("📊 Analysis Results")
-    
-    # Detection patterns
-    patterns = {
-        "Instrument Type": {
-            "pattern": r'\b(FCN|Autocall|Reverse Convertible|Call Option|Put Option|Structured Note)\b',
-            "description": "Type of financial instrument"
-        },
-        "Underlying Asset": {
-            "pattern": r'(?:on|underlying|reference)\s+([A-Z]{1,5})',
-            "description": "Stock or index the instrument is based on"
-        },
-        "Strike Price": {
-            "pattern": r'(?:strike|strik)[:\s]+([0-9.,]+)',
-            "description": "Strike price level"
-        },
-        "Maturity": {
-            "pattern": r'(?:maturity|tenor|term)[:\s]+([0-9]+\s*(?:months?|years?|days?|weeks?))',
-            "description": "Time to expiration"
-        },
-        "Currency": {
-            "pattern": r'([A-Z]{3})\s+(?:FCN|Call|Put|Autocall)',
-            "description": "Currency denomination"
-        },
-        "Coupon": {
-            "pattern": r'(?:coupon|interest)[:\s]+([0-9.]+%)',
-            "description": "Interest or coupon rate"
-        }
+# Detection patterns
+PATTERNS = {
+    "Instrument Type": {
+        "pattern": r'\b(FCN|Autocall|Reverse Convertible|Call Option|Put Option|Structured Note)\b',
+        "description": "Type of financial instrument"
+    },
+    "Underlying Asset": {
+        "pattern": r'(?:on|underlying|reference)\s+([A-Z]{1,5})',
+        "description": "Stock or index the instrument is based on"
+    },
+    "Strike Price": {
+        "pattern": r'(?:strike|strik)[:\s]+([0-9.,]+)',
+        "description": "Strike price level"
+    },
+    "Maturity": {
+        "pattern": r'(?:maturity|tenor|term)[:\s]+([0-9]+\s*(?:months?|years?|days?|weeks?))',
+        "description": "Time to expiration"
+    },
+    "Currency": {
+        "pattern": r'([A-Z]{3})\s+(?:FCN|Call|Put|Autocall)',
+        "description": "Currency denomination"
+    },
+    "Coupon": {
+        "pattern": r'(?:coupon|interest)[:\s]+([0-9.]+%)',
+        "description": "Interest or coupon rate"
     }
-    
+}
+
+def extract_fields(text):
+    """Match every detection pattern; returns {field: {"value", "description"}}"""
     results = {}
-    
-    # Analyze each pattern
-    for field, config in patterns.items():
+    for field, config in PATTERNS.items():
         match = re.search(config['pattern'], text, re.IGNORECASE)
         if match:
             results[field] = {
                 "value": match.group(1),
                 "description": config['description']
             }
+    return results
+
+def analyze_structure(text):
+    st.markdown("---")
+    st.subheader("📊 Analysis Results")
+    
+    results = extract_fields(text)
     
     # Display results
     if results:
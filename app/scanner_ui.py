@@ -1,72 +1,27 @@
 ﻿import streamlit as st
 import os
+import sys
 import json
-import traceback
 from datetime import datetime
-import numpy as np
-import re
 
-# === parse_deal ===
-def parse_deal(text: str):
-    try:
-        text = text.lower().replace(" p.a.", "").replace(" coupon", "").replace(" ko ", " ko")
-        months = int(re.search(r"(\d+)\s*months?", text).group(1))
-        basket = [w.capitalize() for w in re.findall(r"tencent|baba|hsbc|meta", text)]
-        ko_match = re.search(r"ko\s*(\d+)%?", text)
-        ko = int(ko_match.group(1)) if ko_match else 0
-        coupon_match = re.search(r"(\d+(?:\.\d+)?)%", text)
-        coupon = float(coupon_match.group(1)) if coupon_match else 0
-        name = f"{'_'.join(basket)}_KO{ko}"
-        return {
-            "name": name,
-            "basket": basket,
-            "maturity_months": months,
-            "ko": ko,
-            "coupon": coupon,
-            "principal": 100
-        }
-    except Exception as e:
-        st.error(f"Parse error: {e}")
-        return None
-
-# === FINAL mc_value ===
-def mc_value(struct, n_paths=10000, n_steps=1):
-    np.random.seed(42)
-    T = struct["maturity"]
-    S0 = np.array(struct["initial_prices"])
-    n = len(S0)
-    dt = T / n_steps
-    drift = (0.05 - 0.5 * 0.2**2) * dt
-    vol = 0.2 * np.sqrt(dt)
-
-    increments = drift + vol * np.random.randn(n_paths, n_steps, n)
-    log_paths = np.cumsum(increments, axis=1)
-    paths = np.exp(log_paths) * S0
-
-    S0_broadcast = S0.reshape(1, 1, n)
-    S0_broadcast = np.tile(S0_broadcast, (n_paths, 1, 1))
+# `streamlit run app/scanner_ui.py` only puts app/ on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.scanner import parse_deal as _parse_deal
+from app.live_pricing import LiveRun
+from app.orchestrator import UScanOrchestrator
+from app.scheduler import get_scheduler
 
-    paths = np.concatenate([S0_broadcast, paths], axis=1)
+# === Shared per server process (survive reruns and sessions) ===
+@st.cache_resource
+def get_orchestrator():
+    return UScanOrchestrator()
 
-    worst = np.min(paths, axis=2)
-    ko_level = 0.98
-    ko_hit = np.any(worst <= ko_level, axis=1)
-    survival = ~ko_hit
-
-    coupon = struct["other_props"][1]["coupon"]
-    final_worst = worst[:, -1]
-    payoff = np.where(
-        survival,
-        100 + coupon * T * 100,
-        np.where(final_worst < ko_level, final_worst * 100, 100)
-    )
-    fv = np.mean(payoff) * np.exp(-0.05 * T)
-    prob_no_ko = np.mean(survival)
-
-    return {
-        "fair_value_gross": round(fv, 2),
-        "prob_no_ko": round(prob_no_ko * 100, 2)
-    }
+# === parse_deal ===
+def parse_deal(text: str):
+    parsed = _parse_deal(text)
+    if not parsed:
+        st.error("Parse error: need a tenor (e.g. '4 months') and at least one known underlying")
+    return parsed
 
 # === ReportEngine ===
 class ReportEngine:
@@ -95,49 +50,13 @@ class ReportEngine:
 """
         return {"markdown": markdown.strip()}
 
-# === run_analysis ===
-def run_analysis(text: str, user_id: str = "guest"):
-    try:
-        st.write("**1/4** Parsing...")
-        parsed = parse_deal(text)
-        if not parsed:
-            return {"status": "error", "error": "Parse failed"}
-
-        st.write("**2/4** Building model...")
-        gr21_input = [{
-            "name": parsed["name"],
-            "underlyings": parsed["basket"],
-            "initial_prices": [100.0] * len(parsed["basket"]),
-            "maturity": parsed["maturity_months"] / 12.0,
-            "basket_type": "WORST_OF",
-            "barriers": [{"type": "KO_DOWN", "level": f"{parsed['ko']}%"}] if parsed["ko"] else [],
-            "other_props": [{"principal": 100}, {"coupon": parsed["coupon"] / 100}]
-        }]
-
-        st.write("**3/4** Monte Carlo (10k paths)...")
-        results = []
-        mc = mc_value(gr21_input[0], n_paths=10000)
-        mc["structure_name"] = gr21_input[0]["name"]
-        results.append(mc)
-        mc_results = {"results": results}
-
-        st.write("**4/4** Report...")
-        engine = ReportEngine()
-        report = engine.generate_report(mc_results, gr21_input)
-
-        os.makedirs(f"outputs/{user_id}", exist_ok=True)
-        base = f"outputs/{user_id}/USCAN_{datetime.now().strftime('%Y%m%d_%H%M')}"
-        with open(f"{base}.json", "w") as f:
-            json.dump({"mc": mc_results, "report": report}, f, indent=2, default=str)
-        with open(f"{base}_Report.md", "w") as f:
-            f.write(report["markdown"])
-
-        return {"status": "success", "mc": mc_results, "report": report}
-    except Exception as e:
-        tb = traceback.format_exc()
-        st.error(f"**CRASH**: {e}")
-        st.code(tb)
-        return {"status": "error", "error": str(e), "traceback": tb}
+def save_outputs(user_id, mc_results, report):
+    os.makedirs(f"outputs/{user_id}", exist_ok=True)
+    base = f"outputs/{user_id}/USCAN_{datetime.now().strftime('%Y%m%d_%H%M')}"
+    with open(f"{base}.json", "w") as f:
+        json.dump({"mc": mc_results, "report": report}, f, indent=2, default=str)
+    with open(f"{base}_Report.md", "w") as f:
+        f.write(report["markdown"])
 
 # === UI ===
 st.set_page_config(page_title="USCAN", layout="centered")
@@ -150,17 +69,60 @@ text = st.text_area(
     height=100
 )
 
+# Offer only what the user's tier may run; the scheduler would cap anything larger anyway
+path_budget = get_scheduler().max_paths("guest")
+path_options = [n for n in (10_000, 50_000, 200_000, 1_000_000) if n <= path_budget] or [path_budget]
+n_paths = st.select_slider("Paths", options=path_options, value=min(200_000, path_options[-1]))
+
 if st.button("Analyze", type="primary"):
-    with st.spinner("Running full analysis..."):
-        result = run_analysis(text)
-    if result["status"] == "success":
-        mc = result["mc"]["results"][0]
-        fv = mc["fair_value_gross"]
-        overpriced = 100 - fv
-        ko_risk = 100 - mc["prob_no_ko"]
-        st.success(f"**Fair Value: ${fv:.2f}**")
-        st.warning(f"**Overpriced by: ${overpriced:.2f} | KO Risk: {ko_risk:.1f}%**")
-        st.markdown("---")
-        st.markdown(result["report"]["markdown"])
+    parsed = parse_deal(text)
+    if parsed:
+        prev = st.session_state.get("live")
+        if prev is not None:
+            prev.cancel()
+        gr21_input = get_orchestrator()._to_gr21_input(parsed)
+        # Queued with every other analysis: tier path caps, fair share and overload shedding apply
+        st.session_state["live"] = LiveRun(gr21_input[0], n_paths=n_paths).submit(get_scheduler(), "guest")
+        st.session_state["live_input"] = gr21_input
+        st.session_state.pop("live_report", None)
+
+live = st.session_state.get("live")
+
+# Only this fragment reruns while pricing is in flight; the rest of the page stays idle
+@st.fragment(run_every=0.2 if live is not None and not live.finished else None)
+def show_live():
+    live = st.session_state.get("live")
+    if live is None:
+        return
+    est = live.snapshot()
+    if live.status == "error":
+        st.error(f"Analysis failed: {live.error}")
+        return
+    if est is None:
+        st.info("Pricing...")
     else:
-        st.error("Analysis failed.")
+        fv = est["fair_value_gross"]
+        pricer = {"pde": "GR22 PDE", "table": "GR23 pricing table"}.get(est.get("pricer"))
+        if pricer:
+            st.success(f"**Fair Value: ${fv:.2f}** ({pricer})")
+        else:
+            st.success(f"**Fair Value: ${fv:.2f} ± {est['ci95']:.2f}** (95% CI, {est['paths_done']:,} paths)")
+        st.warning(f"**Overpriced by: ${100 - fv:.2f} | KO Risk: {100 - est['prob_no_ko']:.1f}%**")
+        st.progress(est["paths_done"] / est["n_paths"])
+    if not live.finished:
+        if st.button("Cancel"):
+            live.cancel()
+        return
+    if live.status == "cancelled":
+        st.caption("Cancelled - showing the estimate at the last completed batch.")
+    if est is not None and "live_report" not in st.session_state:
+        mc_results = live.mc_results()
+        report = ReportEngine().generate_report(mc_results, st.session_state["live_input"])
+        save_outputs("guest", mc_results, report)
+        st.session_state["live_report"] = report
+        st.rerun()  # full rerun switches the fragment's polling off
+    if "live_report" in st.session_state:
+        st.markdown("---")
+        st.markdown(st.session_state["live_report"]["markdown"])
+
+show_live()
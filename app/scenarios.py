@@ -0,0 +1,152 @@
+# app/scenarios.py
+# Scenario store: standard normal cubes generated once per (seed, assets, draws, paths)
+# and kept as memory-mapped .npy files under data/scenarios, so every process that
+# prices the same shape reads the same shocks from the page cache instead of drawing
+# them again. For worker pools a cube can also be published to shared memory and
+# attached by name, zero-copy. Shocks are independent N(0,1) float32; the engine
+# applies each note's correlation (Cholesky) and vol itself. Files are evicted
+# least-recently-used once the store outgrows its size budget.
+import os
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+SCENARIO_DIR = "data/scenarios"
+MAX_STORE_BYTES = 2 << 30   # evict least-recently-used cubes beyond this
+GEN_CHUNK = 1 << 22         # normals generated per write when building a cube
+
+Key = Tuple[int, int, int, int]  # (seed, n_assets, n_draws, n_paths)
+
+
+class Scenarios:
+    """A (draws x assets x paths) cube of standard normals; one draw feeds one time step"""
+
+    def __init__(self, cube: np.ndarray, key: Key):
+        self.cube = cube
+        self.key = key
+        self._shm = None  # keeps an attached shared-memory segment mapped
+
+    def stream(self):
+        """A normal(shape) callable for the GR21 path generators, handing out successive draws.
+        Each draw is a float64 copy, since the generators scale shocks in place."""
+        draws = iter(self.cube)
+
+        def normal(shape):
+            z = next(draws, None)
+            if z is None:
+                raise ValueError(f"Scenario cube {self.key} has only {len(self.cube)} draws")
+            if z.shape != tuple(shape):
+                raise ValueError(f"Scenario draw is {z.shape}, engine asked for {tuple(shape)}")
+            return z.astype(np.float64)
+
+        return normal
+
+
+class SharedScenarios:
+    """Owner side of a shared-memory copy of a cube. Hand .spec to workers (attach_scenarios);
+    close() unlinks the segment once the pool is done."""
+
+    def __init__(self, scenarios: Scenarios):
+        cube = scenarios.cube
+        self._shm = shared_memory.SharedMemory(create=True, size=max(cube.nbytes, 1))
+        np.ndarray(cube.shape, cube.dtype, buffer=self._shm.buf)[:] = cube
+        self.spec = {"name": self._shm.name, "shape": cube.shape, "key": scenarios.key}
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedScenarios":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_scenarios(spec: Dict) -> Scenarios:
+    """Worker side (a child of the owner, sharing its resource tracker): map a published
+    cube by name without copying it"""
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    s = Scenarios(np.ndarray(tuple(spec["shape"]), np.float32, buffer=shm.buf), tuple(spec["key"]))
+    s._shm = shm
+    return s
+
+
+class ScenarioStore:
+    def __init__(self, root: str = SCENARIO_DIR, max_bytes: int = MAX_STORE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._open: Dict[Key, Scenarios] = {}
+
+    def path(self, key: Key) -> str:
+        return os.path.join(self.root, "normals_s{}_a{}_d{}_p{}.npy".format(*key))
+
+    def get(self, seed: int, n_assets: int, n_draws: int, n_paths: int) -> Scenarios:
+        """Memory-mapped cube for this key, generated and saved on first use"""
+        key = (int(seed), int(n_assets), int(n_draws), int(n_paths))
+        path = self.path(key)
+        if key in self._open and os.path.exists(path):
+            os.utime(path)
+            return self._open[key]
+        try:
+            cube = np.load(path, mmap_mode="r")
+            os.utime(path)  # mtime doubles as last use for eviction
+        except (OSError, ValueError):
+            cube = self._generate(key, path)
+        self._open[key] = Scenarios(cube, key)
+        return self._open[key]
+
+    def share(self, seed: int, n_assets: int, n_draws: int, n_paths: int) -> SharedScenarios:
+        return SharedScenarios(self.get(seed, n_assets, n_draws, n_paths))
+
+    def _generate(self, key: Key, path: str) -> np.ndarray:
+        seed, n_assets, n_draws, n_paths = key
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(n_draws, n_assets, n_paths))
+        rng = np.random.default_rng(seed)
+        flat = out.reshape(-1)
+        for lo in range(0, flat.size, GEN_CHUNK):
+            rng.standard_normal(out=flat[lo:lo + GEN_CHUNK], dtype=np.float32)
+        out.flush()
+        del flat, out
+        os.replace(tmp, path)  # atomic: concurrent builders of the same key both end with one good file
+        self._evict(keep=path)
+        return np.load(path, mmap_mode="r")
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop least-recently-used cubes until the store fits max_bytes (open maps stay valid)"""
+        entries = []
+        for e in os.scandir(self.root):
+            if e.name.endswith(".npy") and e.path != keep:
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries) + (os.path.getsize(keep) if keep else 0)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        for key in [k for k in self._open if not os.path.exists(self.path(k))]:
+            del self._open[key]
+
+    def usage(self) -> int:
+        """Bytes on disk"""
+        if not os.path.isdir(self.root):
+            return 0
+        return sum(e.stat().st_size for e in os.scandir(self.root) if e.name.endswith(".npy"))
+
+
+_default: Optional[ScenarioStore] = None
+
+
+def get_scenario_store() -> ScenarioStore:
+    """Process-wide store, created once"""
+    global _default
+    if _default is None:
+        _default = ScenarioStore()
+    return _default
@@ -0,0 +1,210 @@
+# app/scheduler.py
+# Tier-aware scheduler in front of run_analysis and the UI's live pricing runs.
+# PREMIUM jobs always dispatch before FREE jobs; inside a tier users are served
+# round-robin so one heavy user cannot starve the rest. Each user has a cap on
+# concurrent jobs and each tier a cap on paths per job. When a tier's queue gets
+# deep, new jobs are degraded to fewer paths; users with too many queued jobs,
+# and FREE jobs past the shed depth, are rejected outright. Jobs price through
+# price_structure's auto dispatch, which already takes the PDE or table quote for
+# any note that has one whatever the load, so cutting paths is what is left to
+# degrade: it only changes the Monte Carlo baskets without a closed form.
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Optional
+
+from app.membership import MembershipTier
+
+DEFAULT_POLICY = {
+    MembershipTier.PREMIUM: {"max_paths": 1_000_000, "user_concurrency": 4, "user_queue": 64,
+                             "degrade_depth": 64, "shed_depth": None, "degraded_paths": 20_000},
+    MembershipTier.FREE: {"max_paths": 50_000, "user_concurrency": 1, "user_queue": 8,
+                          "degrade_depth": 16, "shed_depth": 128, "degraded_paths": 2_000},
+}
+TIER_ORDER = [MembershipTier.PREMIUM, MembershipTier.FREE]
+
+
+@dataclass
+class _Job:
+    text: str
+    user_id: str
+    tier: MembershipTier
+    n_paths: int
+    future: Future
+    run: Optional[Callable] = None
+    degraded: bool = False
+    submitted: float = field(default_factory=time.monotonic)
+
+
+class _TierQueue:
+    """Per-user FIFOs plus a round-robin ring of users with pending work"""
+
+    def __init__(self):
+        self.jobs: Dict[str, Deque[_Job]] = {}
+        self.ring: Deque[str] = deque()
+        self.depth = 0
+
+    def queued(self, user_id: str) -> int:
+        q = self.jobs.get(user_id)
+        return len(q) if q else 0
+
+    def push(self, job: _Job):
+        q = self.jobs.get(job.user_id)
+        if q is None:
+            q = self.jobs[job.user_id] = deque()
+            self.ring.append(job.user_id)
+        q.append(job)
+        self.depth += 1
+
+    def pop(self, runnable: Callable[[str], bool]) -> Optional[_Job]:
+        """Next job from the first user in ring order that is under its concurrency cap"""
+        for _ in range(len(self.ring)):
+            user = self.ring[0]
+            self.ring.rotate(-1)
+            if runnable(user):
+                q = self.jobs[user]
+                job = q.popleft()
+                if not q:
+                    del self.jobs[user]
+                    self.ring.remove(user)
+                self.depth -= 1
+                return job
+        return None
+
+
+class AnalysisScheduler:
+    def __init__(self, workers: int = 4, policy: Optional[Dict] = None, membership=None,
+                 run: Optional[Callable] = None):
+        if run is None:
+            from app.orchestrator import run_analysis
+            run = run_analysis
+        self._run = run
+        self.policy = policy or DEFAULT_POLICY
+        self.membership = membership
+        self._queues = {t: _TierQueue() for t in TIER_ORDER}
+        self._running: Dict[str, int] = {}
+        self._cv = threading.Condition()
+        self._stop = False
+        self.metrics = {t.value: {"submitted": 0, "completed": 0, "cancelled": 0, "shed": 0, "degraded": 0,
+                                  "started": 0, "wait_total": 0.0, "waits": deque(maxlen=1000)} for t in TIER_ORDER}
+        self._threads = [threading.Thread(target=self._worker, name=f"uscan-sched-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def tier_of(self, user_id: str) -> MembershipTier:
+        return self.membership.get_tier(user_id) if self.membership else MembershipTier.FREE
+
+    def max_paths(self, user_id: str = "guest", tier: Optional[MembershipTier] = None) -> int:
+        """Path budget per job for the user's tier"""
+        return self.policy[tier or self.tier_of(user_id)]["max_paths"]
+
+    def submit(self, text: str, user_id: str = "guest", tier: Optional[MembershipTier] = None,
+               n_paths: int = 10000, run: Optional[Callable] = None) -> Future:
+        """Queue an analysis; the Future resolves to the run_analysis result dict.
+        run replaces run_analysis for this job (same (text, user_id, n_paths=) call), so other
+        work such as a live pricing run is queued, capped and shed under the same policy."""
+        tier = tier or self.tier_of(user_id)
+        pol = self.policy[tier]
+        fut = Future()
+        with self._cv:
+            m = self.metrics[tier.value]
+            m["submitted"] += 1
+            depth = self._queues[tier].depth
+            over_user = self._queues[tier].queued(user_id) >= pol["user_queue"]
+            if over_user or (pol["shed_depth"] is not None and depth >= pol["shed_depth"]):
+                m["shed"] += 1
+                fut.set_result({"status": "error", "error": "Server busy - please retry shortly"})
+                return fut
+            job = _Job(text, user_id, tier, min(n_paths, pol["max_paths"]), fut, run)
+            if depth >= pol["degrade_depth"] and job.n_paths > pol["degraded_paths"]:
+                job.n_paths, job.degraded = pol["degraded_paths"], True
+                m["degraded"] += 1
+            self._queues[tier].push(job)
+            self._cv.notify()
+        return fut
+
+    def _next_job(self) -> Optional[_Job]:
+        for tier in TIER_ORDER:
+            cap = self.policy[tier]["user_concurrency"]
+            job = self._queues[tier].pop(lambda u: self._running.get(u, 0) < cap)
+            if job:
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cv:
+                job = self._next_job()
+                while job is None:
+                    if self._stop:
+                        return
+                    self._cv.wait()
+                    job = self._next_job()
+                self._running[job.user_id] = self._running.get(job.user_id, 0) + 1
+                wait = time.monotonic() - job.submitted
+                m = self.metrics[job.tier.value]
+                m["started"] += 1
+                m["wait_total"] += wait
+                m["waits"].append(wait)
+            ran = False
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    ran = True
+                    result = (job.run or self._run)(job.text, job.user_id, n_paths=job.n_paths)
+                    if isinstance(result, dict):
+                        result["schedule"] = {"tier": job.tier.value, "n_paths": job.n_paths,
+                                              "degraded": job.degraded, "wait_s": wait}
+                    job.future.set_result(result)
+            except Exception as e:
+                job.future.set_exception(e)
+            finally:
+                with self._cv:
+                    self._running[job.user_id] -= 1
+                    if not self._running[job.user_id]:
+                        del self._running[job.user_id]
+                    m["completed" if ran else "cancelled"] += 1
+                    self._cv.notify_all()
+
+    def stats(self) -> Dict:
+        """Per-tier queue depth, throughput counters and wait-time percentiles (seconds)"""
+        with self._cv:
+            out = {}
+            for tier in TIER_ORDER:
+                m = self.metrics[tier.value]
+                waits = sorted(m["waits"])
+                out[tier.value] = {
+                    "queue_depth": self._queues[tier].depth,
+                    "submitted": m["submitted"], "completed": m["completed"], "cancelled": m["cancelled"],
+                    "shed": m["shed"], "degraded": m["degraded"],
+                    "wait_mean": m["wait_total"] / m["started"] if m["started"] else 0.0,
+                    "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                    "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                    "wait_max": waits[-1] if waits else 0.0,
+                }
+            out["running_users"] = dict(self._running)
+            return out
+
+    def shutdown(self, wait: bool = True):
+        with self._cv:
+            self._stop = True
+            self._cv.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+
+_default: Optional[AnalysisScheduler] = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler() -> AnalysisScheduler:
+    """Process-wide scheduler shared by all UI sessions"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            from app.membership import UScanMembership
+            _default = AnalysisScheduler(membership=UScanMembership())
+        return _default
@@ -0,0 +1,243 @@
+# app/symbols.py
+# Symbol index: display names / aliases / tickers -> canonical instruments.
+# The index is prebuilt from app/config/underlyings.csv into flat numpy arrays
+# (string blobs + offsets, an open-addressing hash table of alias indices for exact
+# lookups, checked against the alias text so hash collisions cannot mis-resolve, and
+# a sorted deletion index for one-typo fuzzy lookups) and memory-mapped on
+# load, so startup cost does not grow with the size of the universe.
+# Spots come from a local snapshot CSV (ticker,spot[,asof]).
+import csv
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.extractor import DEFAULT_DICTIONARY, tokenize_alias
+
+INDEX_DIR = "data/symbol_index"
+SPOT_SNAPSHOT = "data/spots.csv"
+MIN_FUZZY_LEN = 4
+
+
+@dataclass
+class Instrument:
+    id: str        # canonical ID = exchange ticker, e.g. "0700.HK"
+    name: str      # display name used by parse_deal, e.g. "Tencent"
+    exchange: str
+    spot: Optional[float] = None
+
+
+def normalize_alias(alias: str) -> str:
+    return " ".join(tokenize_alias(alias))
+
+
+def _hash(key: str) -> int:
+    h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    return h or 1  # 0 marks an empty slot
+
+
+def _deletes(key: str) -> List[str]:
+    return [key[:i] + key[i + 1:] for i in range(len(key))]
+
+
+def _within_one_edit(a: str, b: str) -> int:
+    """Optimal string alignment distance, capped at 2"""
+    if abs(len(a) - len(b)) > 1:
+        return 2
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return min(prev[-1], 2)
+
+
+class _Strings:
+    """Immutable string table: one UTF-8 blob plus offsets"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob, self.offsets = blob, offsets
+
+    @classmethod
+    def build(cls, items: List[str]) -> "_Strings":
+        encoded = [s.encode("utf-8") for s in items]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded) or b"\0", dtype=np.uint8), offsets)
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+class SymbolIndex:
+    ARRAYS = ("ids_blob", "ids_off", "names_blob", "names_off", "exch_blob", "exch_off",
+              "alias_blob", "alias_off", "alias_row", "table_keys", "table_alias", "del_keys", "del_alias")
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.ids = _Strings(arrays["ids_blob"], arrays["ids_off"])
+        self.names = _Strings(arrays["names_blob"], arrays["names_off"])
+        self.exchanges = _Strings(arrays["exch_blob"], arrays["exch_off"])
+        self.aliases = _Strings(arrays["alias_blob"], arrays["alias_off"])
+        self.alias_row = arrays["alias_row"]
+        self.table_keys = arrays["table_keys"]
+        self.table_alias = arrays["table_alias"]
+        self.del_keys = arrays["del_keys"]
+        self.del_alias = arrays["del_alias"]
+        self.spots = np.full(len(self.ids), np.nan)
+        self._mask = len(self.table_keys) - 1
+        self._arrays = arrays
+
+    # === Build / persist ===
+    @classmethod
+    def build(cls, csv_path: str = DEFAULT_DICTIONARY) -> "SymbolIndex":
+        ids, names, exchanges, aliases, alias_row = [], [], [], [], []
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                r = len(ids)
+                ids.append(row["ticker"].strip())
+                names.append(row["name"].strip())
+                exchanges.append((row.get("exchange") or "").strip())
+                seen = set()
+                for alias in [row["name"], row["ticker"]] + (row.get("aliases") or "").split("|"):
+                    key = normalize_alias(alias)
+                    if key and key not in seen:
+                        seen.add(key)
+                        aliases.append(key)
+                        alias_row.append(r)
+
+        size = 1 << max(4, (2 * len(aliases) - 1).bit_length())
+        keys, slots = [0] * size, [-1] * size
+        for a, key in enumerate(aliases):
+            h = _hash(key)
+            i = h & (size - 1)
+            while keys[i] and not (keys[i] == h and aliases[slots[i]] == key):
+                i = (i + 1) & (size - 1)
+            if not keys[i]:  # first row wins for shared aliases
+                keys[i], slots[i] = h, a
+        table_keys = np.array(keys, dtype=np.uint64)
+        table_alias = np.array(slots, dtype=np.int32)
+
+        dk, da = [], []
+        for a, key in enumerate(aliases):
+            if len(key) >= MIN_FUZZY_LEN - 1:
+                for v in set([key] + _deletes(key)):
+                    dk.append(_hash(v))
+                    da.append(a)
+        del_keys = np.array(dk, dtype=np.uint64)
+        order = np.argsort(del_keys, kind="stable")
+
+        arrays = {"alias_row": np.array(alias_row, dtype=np.int32), "table_keys": table_keys,
+                  "table_alias": table_alias, "del_keys": del_keys[order],
+                  "del_alias": np.array(da, dtype=np.int32)[order]}
+        for prefix, items in (("ids", ids), ("names", names), ("exch", exchanges), ("alias", aliases)):
+            s = _Strings.build(items)
+            arrays[f"{prefix}_blob"], arrays[f"{prefix}_off"] = s.blob, s.offsets
+        return cls(arrays)
+
+    def save(self, index_dir: str, source: Dict):
+        os.makedirs(index_dir, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(index_dir, f"{name}.npy"), self._arrays[name])
+        with open(os.path.join(index_dir, "meta.json"), "w") as f:
+            json.dump(source, f)
+
+    @classmethod
+    def load(cls, csv_path: str = DEFAULT_DICTIONARY, index_dir: str = INDEX_DIR,
+             spot_path: Optional[str] = SPOT_SNAPSHOT) -> "SymbolIndex":
+        """Memory-map the prebuilt index, rebuilding it first if the CSV changed"""
+        st = os.stat(csv_path)
+        source = {"csv": os.path.abspath(csv_path), "size": st.st_size, "mtime": st.st_mtime}
+        try:
+            with open(os.path.join(index_dir, "meta.json")) as f:
+                fresh = json.load(f) == source
+            index = cls({n: np.load(os.path.join(index_dir, f"{n}.npy"), mmap_mode="r")
+                         for n in cls.ARRAYS}) if fresh else None
+        except (OSError, ValueError):
+            index = None
+        if index is None:
+            index = cls.build(csv_path)
+            try:
+                index.save(index_dir, source)
+            except OSError as e:
+                print(f"Symbol index not cached ({e})")
+        if spot_path and os.path.exists(spot_path):
+            index.load_spots(spot_path)
+        return index
+
+    def load_spots(self, path: str) -> int:
+        """Attach spots from a ticker,spot CSV; returns how many rows were matched"""
+        matched = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                r = self.row(row["ticker"])
+                if r is not None and row.get("spot"):
+                    self.spots[r] = float(row["spot"])
+                    matched += 1
+        return matched
+
+    # === Lookup ===
+    def row(self, alias: str) -> Optional[int]:
+        """Exact alias/ticker/name lookup, O(1); a hash match counts only if the alias text matches"""
+        key = normalize_alias(alias)
+        if not key:
+            return None
+        h = _hash(key)
+        keys, i = self.table_keys, h & self._mask
+        while True:
+            k = int(keys[i])
+            if k == 0:
+                return None
+            if k == h:
+                a = int(self.table_alias[i])
+                if self.aliases[a] == key:
+                    return int(self.alias_row[a])
+            i = (i + 1) & self._mask
+
+    def fuzzy_row(self, alias: str) -> Optional[int]:
+        """Closest alias within one edit (insert, delete, substitute, transpose)"""
+        key = normalize_alias(alias)
+        if len(key) < MIN_FUZZY_LEN:
+            return None
+        probes = np.array([_hash(v) for v in set([key] + _deletes(key))], dtype=np.uint64)
+        lo = np.searchsorted(self.del_keys, probes, side="left")
+        hi = np.searchsorted(self.del_keys, probes, side="right")
+        best, best_d = None, 2
+        for a in sorted({int(x) for l, h in zip(lo, hi) for x in self.del_alias[l:h]}):
+            d = _within_one_edit(key, self.aliases[a])
+            if d < best_d:
+                best, best_d = int(self.alias_row[a]), d
+        return best
+
+    def resolve(self, alias: str, fuzzy: bool = True) -> Optional[Instrument]:
+        r = self.row(alias)
+        if r is None and fuzzy:
+            r = self.fuzzy_row(alias)
+        if r is None:
+            return None
+        spot = float(self.spots[r])
+        return Instrument(id=self.ids[r], name=self.names[r], exchange=self.exchanges[r],
+                          spot=None if np.isnan(spot) else spot)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+_default: Optional[SymbolIndex] = None
+
+
+def get_symbol_index() -> SymbolIndex:
+    """Process-wide index, loaded once"""
+    global _default
+    if _default is None:
+        _default = SymbolIndex.load()
+    return _default
@@ -0,0 +1,302 @@
+"""
+Convergence benchmark
+Measures pricing error against golden reference values versus wall time for each engine
+configuration (paths, steps, antithetic and randomised-QMC shocks, the GR22 PDE), over a
+catalog of GR21 structures, and gates on bias and efficiency (1 / (RMSE^2 x seconds)).
+Golden values are closed form for single names, exact 1-D quadrature for pairs and a
+large antithetic run (cached in bench_golden.json, with its standard error) otherwise.
+
+    python bench_convergence.py --reps 8 > bench_convergence_output.txt
+    python bench_convergence.py --json curves.json             # save efficiency curves
+    python bench_convergence.py --gate --baseline curves.json  # exit 1 on bias / slowdown
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.GR21_MC_Engine import Structure, mc_value
+from app.GR22_PDE_Engine import pde_value
+from app.scenarios import Scenarios
+
+R, SIGMA = 0.05, 0.25
+GOLDEN_FILE = "bench_golden.json"
+GOLDEN_PATHS = 4_000_000
+BIAS_SD = 4.0         # gate: |mean error| within this many standard errors ...
+BIAS_FLOOR = 0.002    # ... plus this absolute slack (PDE grid error, float32 shocks)
+EFFICIENCY_SLACK = 0.5  # fail a configuration below half its baseline efficiency
+PDE_GATE_SPACE = 200    # PDE grids at least this fine must be within BIAS_FLOOR
+
+CATALOG = [
+    # name, names, maturity, coupon % p.a., KO level %, pairwise correlation
+    ("Single_KO98_4m", 1, 4 / 12, 11.0, 98.0, None),
+    ("Single_KO80_1y", 1, 1.0, 8.0, 80.0, None),
+    ("Pair_KO98_4m", 2, 4 / 12, 11.0, 98.0, None),
+    ("Pair_KO90_1y_rho60", 2, 1.0, 9.0, 90.0, 0.6),
+    ("Triple_KO95_6m_rho50", 3, 0.5, 12.0, 95.0, 0.5),
+]
+
+
+def make(entry) -> Dict:
+    name, n, T, coupon, ko, rho = entry
+    corr = None if rho is None else np.full((n, n), rho) + (1 - rho) * np.eye(n)
+    structure = Structure(name, [f"U{i}" for i in range(n)], [100.0] * n, [], None, T, 100.0, coupon, ko_level=ko)
+    return {"structure": structure, "correlations": corr, "rho": rho or 0.0}
+
+
+# === Golden values ===
+def _ncdf(x):
+    return 0.5 * (1 + np.vectorize(math.erf)(np.asarray(x, dtype=np.float64) / math.sqrt(2)))
+
+
+def _engine_value(s: Structure, pv_gross: float) -> float:
+    """GR21 reports principal + PV(net payoff), i.e. the principal itself is not discounted"""
+    return float(s.principal * (1 - math.exp(-R * s.maturity)) + pv_gross)
+
+
+def golden_single(s: Structure) -> float:
+    """PV of (P + C) N(d2) plus P N(-d1): the coupon digital and the capital-at-risk leg"""
+    T, vol = s.maturity, SIGMA * math.sqrt(s.maturity)
+    d1 = (math.log(100.0 / s.ko_level) + (R + 0.5 * SIGMA**2) * T) / vol
+    coupon = s.coupon_rate / 100 * T * s.principal
+    return _engine_value(s, math.exp(-R * T) * (s.principal + coupon) * _ncdf(d1 - vol) + s.principal * _ncdf(-d1))
+
+
+def golden_pair(s: Structure, rho: float, nodes: int = 400) -> float:
+    """Integrate over the first asset's shock; given it, the second asset is lognormal and
+    the worst-of payoff has a closed-form conditional expectation"""
+    T, vol = s.maturity, SIGMA * math.sqrt(s.maturity)
+    mu = math.log(100.0) + (R - 0.5 * SIGMA**2) * T
+    k, P = s.ko_level, s.principal
+    coupon = s.coupon_rate / 100 * T * P
+    z_k = (math.log(k) - mu) / vol  # first asset exactly at the KO level: the payoff kinks here
+    x, w = np.polynomial.legendre.leggauss(nodes)
+    z, wz = [], []
+    for a, b in ((-12.0, z_k), (z_k, 12.0)):
+        z.append(0.5 * (b - a) * x + 0.5 * (b + a))
+        wz.append(0.5 * (b - a) * w)
+    z, wz = np.concatenate(z), np.concatenate(wz)
+
+    p1 = np.exp(mu + vol * z)
+    m2, s2 = mu + vol * rho * z, vol * math.sqrt(1 - rho**2)
+    below = lambda a: np.exp(m2 + 0.5 * s2**2) * _ncdf((np.log(a) - m2 - s2**2) / s2)  # E[p2 1{p2 < a}]
+    above_prob = lambda a: _ncdf((m2 - np.log(a)) / s2)                                # P(p2 >= a)
+    knocked = P / 100 * (p1 * above_prob(p1) + below(p1))           # p1 < k: worst-of is min(p1, p2)
+    alive = (P + coupon) * above_prob(k) + P / 100 * below(np.full_like(z, k))
+    gross = np.where(p1 < k, knocked, alive)
+    density = np.exp(-0.5 * z**2) / math.sqrt(2 * math.pi)
+    return _engine_value(s, math.exp(-R * T) * np.sum(wz * density * gross))
+
+
+def golden_mc(case: Dict, n_paths: int = GOLDEN_PATHS, batch: int = 500_000) -> Dict:
+    """Antithetic reference run; returns value and standard error"""
+    s, corr = case["structure"], case["correlations"]
+    pair_means = []
+    for seed in range(n_paths // (2 * batch)):
+        z = np.random.default_rng(10_000 + seed).standard_normal((1, len(s.underlyings), batch))
+        for cube in (z, -z):
+            pair_means.append(mc_value(s, R, SIGMA, batch, 1, corr, scenarios=Scenarios(cube, (seed,)),
+                                       var_levels=())["fair_value_gross"])
+    pairs = np.array(pair_means).reshape(-1, 2).mean(axis=1)
+    return {"value": float(pairs.mean()), "se": float(pairs.std(ddof=1) / np.sqrt(len(pairs)))}
+
+
+def golden_values(cases: List[Dict], path: str = GOLDEN_FILE, rebuild: bool = False) -> Dict[str, Dict]:
+    cached = {}
+    if os.path.exists(path) and not rebuild:
+        with open(path) as f:
+            cached = json.load(f)
+    golden = {}
+    for case in cases:
+        s = case["structure"]
+        if len(s.underlyings) == 1:
+            golden[s.name] = {"value": golden_single(s), "se": 0.0, "method": "closed form"}
+        elif len(s.underlyings) == 2:
+            golden[s.name] = {"value": golden_pair(s, case["rho"]), "se": 0.0, "method": "quadrature"}
+        elif s.name in cached:
+            golden[s.name] = cached[s.name]
+        else:
+            golden[s.name] = {**golden_mc(case), "method": f"antithetic MC, {GOLDEN_PATHS:,} paths"}
+    with open(path, "w") as f:
+        json.dump({**cached, **golden}, f, indent=2)
+    return golden
+
+
+# === Shock generators (fed through mc_value's scenarios hook) ===
+def _antithetic(n_assets: int, n_steps: int, n_paths: int, rng: np.random.Generator) -> Scenarios:
+    half = rng.standard_normal((n_steps, n_assets, n_paths // 2))
+    return Scenarios(np.concatenate([half, -half], axis=2), ("antithetic",))
+
+
+def _inv_ncdf(u: np.ndarray) -> np.ndarray:
+    """Acklam's rational approximation to the normal quantile (relative error < 1.2e-9)"""
+    a = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+         1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+    b = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+         6.680131188771972e+01, -1.328068155288572e+01)
+    c = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+         -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+    d = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00)
+    lo = 0.02425
+    out = np.empty_like(u)
+    tail = np.minimum(u, 1 - u) < lo
+    q = np.sqrt(-2 * np.log(np.minimum(u[tail], 1 - u[tail])))
+    out[tail] = np.sign(u[tail] - 0.5) * -(((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / \
+        ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1)
+    q = u[~tail] - 0.5
+    t = q * q
+    out[~tail] = (((((a[0] * t + a[1]) * t + a[2]) * t + a[3]) * t + a[4]) * t + a[5]) * q / \
+        (((((b[0] * t + b[1]) * t + b[2]) * t + b[3]) * t + b[4]) * t + 1)
+    return out
+
+
+def _primes(n: int) -> List[int]:
+    found = []
+    k = 2
+    while len(found) < n:
+        if all(k % p for p in found):
+            found.append(k)
+        k += 1
+    return found
+
+
+def _halton(n_assets: int, n_steps: int, n_paths: int, rng: np.random.Generator) -> Scenarios:
+    """Halton points with a random (Cranley-Patterson) shift, mapped to normals"""
+    dims = n_assets * n_steps
+    idx = np.arange(1, n_paths + 1)
+    u = np.empty((dims, n_paths))
+    for j, base in enumerate(_primes(dims)):
+        k, f, x = idx.copy(), 1.0, np.zeros(n_paths)
+        while k.any():
+            f /= base
+            x += f * (k % base)
+            k //= base
+        u[j] = x
+    u = (u + rng.random((dims, 1))) % 1.0
+    u = np.clip(u, 1e-12, 1 - 1e-12)
+    return Scenarios(_inv_ncdf(u).reshape(n_steps, n_assets, n_paths), ("halton",))
+
+
+CONFIGS: Dict[str, Dict] = {
+    "mc": {"shocks": None},
+    "antithetic": {"shocks": _antithetic},
+    "qmc-halton": {"shocks": _halton},
+}
+
+
+# === Measurement ===
+def _run(case: Dict, shocks: Optional[Callable], n_paths: int, n_steps: int, seed: int):
+    """(fair value, plain Monte Carlo standard error at this path count)"""
+    s = case["structure"]
+    rng = np.random.default_rng(seed)
+    np.random.seed(seed)
+    scenarios = shocks(len(s.underlyings), n_steps, n_paths, rng) if shocks else None
+    res = mc_value(s, R, SIGMA, n_paths, n_steps, case["correlations"], scenarios=scenarios, var_levels=())
+    return res["fair_value_gross"], np.exp(-R * s.maturity) * res["payoff_std"] / np.sqrt(n_paths)
+
+
+def measure(cases: List[Dict], golden: Dict[str, Dict], paths: List[int], steps: List[int],
+            reps: int) -> List[Dict]:
+    rows = []
+    for case in cases:
+        s = case["structure"]
+        ref = golden[s.name]["value"]
+        plans = [(cfg, spec["shocks"], n, k) for cfg, spec in CONFIGS.items() for k in steps for n in paths]
+        for cfg, shocks, n_paths, n_steps in plans:
+            errors, mc_se, seconds = [], [], 0.0
+            for rep in range(reps):
+                t0 = time.perf_counter()
+                value, se = _run(case, shocks, n_paths, n_steps, seed=1000 * rep + n_steps)
+                seconds += time.perf_counter() - t0
+                errors.append(value - ref)
+                mc_se.append(se)
+            rows.append(_row(s.name, cfg, n_paths, n_steps, np.array(errors), seconds / reps, golden[s.name]["se"],
+                             float(np.mean(mc_se)) / np.sqrt(reps)))
+        if len(s.underlyings) == 1:
+            for n_space in (50, 100, 200, 400):
+                t0 = time.perf_counter()
+                value = pde_value(s, R, SIGMA, n_space=n_space, n_time=n_space // 2)["fair_value_gross"]
+                rows.append(_row(s.name, "pde", n_space, n_space // 2, np.array([value - ref]),
+                                 time.perf_counter() - t0, 0.0))
+    return rows
+
+
+def _row(name: str, config: str, n: int, n_steps: int, errors: np.ndarray, seconds: float, golden_se: float,
+         mc_se: float = 0.0) -> Dict:
+    rmse = float(np.sqrt(np.mean(errors**2)))
+    # Replication spread underestimates the error with few reps; the plain-MC error of the
+    # mean is a floor (conservative for antithetic / QMC, which only reduce variance)
+    se = max(float(errors.std(ddof=1) / np.sqrt(len(errors))) if len(errors) > 1 else 0.0, mc_se)
+    return {"structure": name, "config": config, "size": n, "n_steps": n_steps, "seconds": seconds,
+            "mean_error": float(errors.mean()), "rmse": rmse, "se": se, "golden_se": golden_se,
+            "efficiency": 1.0 / (max(rmse, 1e-9)**2 * max(seconds, 1e-6))}
+
+
+def gate(rows: List[Dict], baseline: Optional[List[Dict]] = None, slack: float = EFFICIENCY_SLACK) -> List[str]:
+    """Failures: biased estimates, PDE error at production grids, or a configuration whose
+    efficiency (geometric mean over rows matching the baseline) fell below (1 - slack) x baseline.
+    Efficiency is compared per configuration because single-row RMSEs from a few reps are noisy."""
+    failures = []
+    for r in rows:
+        if r["config"] == "pde":
+            if r["size"] >= PDE_GATE_SPACE and abs(r["mean_error"]) > BIAS_FLOOR:
+                failures.append(f"{r['structure']} pde n_space={r['size']}: error {r['mean_error']:+.4f}")
+            continue
+        allowed = BIAS_SD * math.hypot(r["se"], r["golden_se"]) + BIAS_FLOOR
+        if abs(r["mean_error"]) > allowed:
+            failures.append(f"{r['structure']} {r['config']} n={r['size']} steps={r['n_steps']}: "
+                            f"bias {r['mean_error']:+.4f} > {allowed:.4f}")
+    key = lambda r: (r["structure"], r["config"], r["size"], r["n_steps"])
+    base = {key(b): b for b in baseline or []}
+    ratios: Dict[str, List[float]] = {}
+    for r in rows:
+        b = base.get(key(r))
+        if b:
+            ratios.setdefault(r["config"], []).append(math.log(r["efficiency"] / b["efficiency"]))
+    for config, logs in ratios.items():
+        ratio = math.exp(sum(logs) / len(logs))
+        if ratio < 1 - slack:
+            failures.append(f"{config}: efficiency {ratio:.0%} of baseline over {len(logs)} rows")
+    return failures
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--paths", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--steps", type=int, nargs="+", default=[1, 12])
+    ap.add_argument("--reps", type=int, default=8, help="independent runs per configuration")
+    ap.add_argument("--only", nargs="+", help="catalog entries to run (default: all)")
+    ap.add_argument("--rebuild-golden", action="store_true")
+    ap.add_argument("--gate", action="store_true", help="exit 1 on bias or efficiency regressions")
+    ap.add_argument("--baseline", help="earlier --json output to compare efficiency against")
+    ap.add_argument("--json", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    cases = [make(e) for e in CATALOG if not args.only or e[0] in args.only]
+    golden = golden_values(cases, rebuild=args.rebuild_golden)
+    print("CONVERGENCE BENCHMARK - golden values")
+    for name, g in golden.items():
+        print(f"  {name:<24}{g['value']:>12.5f}  +/- {g['se']:.5f}  ({g['method']})")
+    print(f"{'structure':<24}{'config':<12}{'size':>8}{'steps':>6}{'seconds':>10}{'bias':>10}{'rmse':>10}{'efficiency':>12}")
+    results = measure(cases, golden, args.paths, args.steps, args.reps)
+    for r in results:
+        print(f"{r['structure']:<24}{r['config']:<12}{r['size']:>8}{r['n_steps']:>6}{r['seconds']:>10.4f}"
+              f"{r['mean_error']:>+10.4f}{r['rmse']:>10.4f}{r['efficiency']:>12.3g}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.gate:
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        failures = gate(results, baseline)
+        print("GATE: " + ("PASS" if not failures else f"FAIL ({len(failures)})"))
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1 if failures else 0)
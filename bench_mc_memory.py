@@ -0,0 +1,96 @@
+"""
+Monte Carlo memory + time benchmark
+Compares the path-cube layout scanner_ui used to carry with the shared GR21 engine
+(one in-place (assets x paths) slice per step) across step counts, reporting
+tracemalloc peak and wall time per run.
+
+    python bench_mc_memory.py --paths 20000 --steps 1 12 52 252 > bench_mc_output.txt
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.GR21_MC_Engine import price_structure
+
+STRUCTURE = {
+    "name": "Tencent_Baba_KO98",
+    "underlyings": ["Tencent", "Baba"],
+    "initial_prices": [100.0, 100.0],
+    "maturity": 4 / 12,
+    "basket_type": "WORST_OF",
+    "barriers": [{"type": "KO_DOWN", "level": "98%"}],
+    "other_props": [{"principal": 100}, {"coupon": 11}],
+}
+
+
+def _legacy_ui(struct: Dict, n_paths: int, n_steps: int) -> Dict:
+    # app/scanner_ui.py mc_value before it moved onto GR21, kept as a baseline
+    np.random.seed(42)
+    T = struct["maturity"]
+    S0 = np.array(struct["initial_prices"])
+    n = len(S0)
+    dt = T / n_steps
+    drift = (0.05 - 0.5 * 0.2**2) * dt
+    vol = 0.2 * np.sqrt(dt)
+    increments = drift + vol * np.random.randn(n_paths, n_steps, n)
+    paths = np.exp(np.cumsum(increments, axis=1)) * S0
+    S0_broadcast = np.tile(S0.reshape(1, 1, n), (n_paths, 1, 1))
+    paths = np.concatenate([S0_broadcast, paths], axis=1)
+    worst = np.min(paths, axis=2)
+    survival = ~np.any(worst <= 0.98, axis=1)
+    coupon = struct["other_props"][1]["coupon"]
+    final_worst = worst[:, -1]
+    payoff = np.where(survival, 100 + coupon * T * 100,
+                      np.where(final_worst < 0.98, final_worst * 100, 100))
+    return {"fair_value_gross": float(np.mean(payoff) * np.exp(-0.05 * T))}
+
+
+def _gr21(struct: Dict, n_paths: int, n_steps: int) -> Dict:
+    return price_structure(struct, n_paths=n_paths, n_steps=n_steps, method="mc")  # never a table/PDE quote
+
+
+ENGINES: Dict[str, Callable[[Dict, int, int], Dict]] = {
+    "legacy scanner_ui cube": _legacy_ui,
+    "GR21 price_structure": _gr21,
+}
+
+
+def measure(fn: Callable, n_paths: int, n_steps: int) -> Dict:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(STRUCTURE, n_paths, n_steps)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"peak_mb": peak / 1e6, "seconds": elapsed}
+
+
+def run(n_paths: int, steps: List[int]) -> List[Dict]:
+    rows = []
+    for n_steps in steps:
+        cube_mb = len(STRUCTURE["underlyings"]) * n_paths * (n_steps + 1) * 8 / 1e6
+        for name, fn in ENGINES.items():
+            rows.append({"engine": name, "n_paths": n_paths, "n_steps": n_steps,
+                         "cube_mb": cube_mb, **measure(fn, n_paths, n_steps)})
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--paths", type=int, default=20000)
+    ap.add_argument("--steps", type=int, nargs="+", default=[1, 12, 52, 252])
+    ap.add_argument("--json", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    print(f"MC MEMORY BENCHMARK - {args.paths:,} paths")
+    print(f"{'engine':<26}{'steps':>6}{'cube MB':>10}{'peak MB':>10}{'seconds':>10}")
+    results = run(args.paths, args.steps)
+    for r in results:
+        print(f"{r['engine']:<26}{r['n_steps']:>6}{r['cube_mb']:>10.1f}{r['peak_mb']:>10.1f}{r['seconds']:>10.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
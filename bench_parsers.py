@@ -0,0 +1,222 @@
+"""
+Parser accuracy + throughput benchmark
+Runs every parser over outputs/local_test/samples.json plus a generated corpus
+and reports per-field precision/recall, docs/sec and latency percentiles.
+
+    python bench_parsers.py --n 20000 --seed 7 > bench_output.txt
+"""
+import argparse
+import json
+import random
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.scanner import PARSE_CACHE, parse_deal, parse_deal_uncached
+
+SAMPLES_PATH = "outputs/local_test/samples.json"
+FIELDS = ["basket", "maturity_months", "ko", "coupon", "callable"]
+
+# Display name -> aliases a salesperson might type
+ALIASES = {
+    "Tencent": ["Tencent", "tencent", "TENCENT", "0700.HK", "700 HK"],
+    "Baba": ["Baba", "BABA", "Alibaba", "9988.HK"],
+    "HSBC": ["HSBC", "hsbc", "0005.HK"],
+    "Hang Seng": ["Hang Seng", "hang seng", "HSI", "Hang Seng Index"],
+    "Meta": ["Meta", "META", "Facebook"],
+    "Apple": ["Apple", "AAPL"],
+    "Google": ["Google", "GOOGL", "Alphabet"],
+}
+TEMPLATES = [
+    "{tenor} {basket} KO {ko}% {coupon}% coupon p.a. {bank}",
+    "{basket} {tenor} ko{ko}% {coupon}% p.a. {call}",
+    "FCN on {basket}\nTenor: {tenor}\nKO level: {ko}%\nCoupon: {coupon}%\n{call}",
+    "{bank} indicative: {basket}, {tenor}, knock-out {ko}%, {coupon}% pa {call}",
+    "pls quote {basket} {tenor} KO {ko} {coupon}% per annum",
+]
+
+
+# === Parser adapters: text -> dict with FIELDS (None = no prediction) ===
+def _from_parse_deal(fn: Callable[[str], Optional[Dict]]) -> Callable[[str], Dict]:
+    def run(text):
+        d = fn(text)
+        if not d:
+            return {}
+        return {"basket": d.get("basket"), "maturity_months": d.get("maturity_months"),
+                "ko": d.get("ko"), "coupon": d.get("coupon"), "callable": d.get("callable")}
+    return run
+
+
+def _legacy_scanner(text: str) -> Optional[Dict]:
+    # app/scanner.py regex set before the shared extractor, kept as a baseline
+    text = text.lower()
+    months = re.search(r"(\d+)\s*months?", text)
+    ko = re.search(r"ko\s*(\d+)%", text)
+    coupon = re.search(r"(\d+(?:\.\d+)?)%\s*coupon", text)
+    assets = re.findall(r"\b(tencent|baba|hsbc|hang seng|apple|google)\b", text)[:2]
+    if not months or len(assets) < 1:
+        return None
+    return {"basket": [a.title() for a in assets], "maturity_months": int(months.group(1)),
+            "ko": int(ko.group(1)) if ko else 100, "coupon": float(coupon.group(1)) if coupon else 0.0}
+
+
+def _legacy_ui(text: str) -> Optional[Dict]:
+    # app/scanner_ui.py regex set before the shared extractor, kept as a baseline
+    try:
+        text = text.lower().replace(" p.a.", "").replace(" coupon", "").replace(" ko ", " ko")
+        months = int(re.search(r"(\d+)\s*months?", text).group(1))
+        basket = [w.capitalize() for w in re.findall(r"tencent|baba|hsbc|meta", text)]
+        ko_match = re.search(r"ko\s*(\d+)%?", text)
+        coupon_match = re.search(r"(\d+(?:\.\d+)?)%", text)
+        return {"basket": basket, "maturity_months": months,
+                "ko": int(ko_match.group(1)) if ko_match else 0,
+                "coupon": float(coupon_match.group(1)) if coupon_match else 0}
+    except Exception:
+        return None
+
+
+def _bak(text: str) -> Dict:
+    from app.scanner_bak import extract_fields
+    found = extract_fields(text)
+    out = {}
+    if "Underlying Asset" in found:
+        out["basket"] = [found["Underlying Asset"]["value"]]
+    if "Maturity" in found:
+        n, unit = re.match(r"(\d+)\s*(\w+)", found["Maturity"]["value"]).groups()
+        out["maturity_months"] = int(n) * (12 if unit.lower().startswith("year") else 1)
+    if "Coupon" in found:
+        out["coupon"] = float(found["Coupon"]["value"].rstrip("%"))
+    return out
+
+
+def available_parsers() -> Dict[str, Callable[[str], Dict]]:
+    # scanner_ui.parse_deal delegates to scanner.parse_deal, so it is covered by the first entries
+    parsers = {
+        "scanner.parse_deal_uncached": _from_parse_deal(parse_deal_uncached),
+        "scanner.parse_deal (parse cache)": _from_parse_deal(parse_deal),
+        "legacy scanner regex": _from_parse_deal(_legacy_scanner),
+        "legacy scanner_ui regex": _from_parse_deal(_legacy_ui),
+    }
+    try:
+        import app.scanner_bak  # noqa: F401  (needs streamlit)
+        parsers["scanner_bak.extract_fields"] = _bak
+    except ImportError as e:
+        print(f"Skipping scanner_bak: {e}")
+    return parsers
+
+
+# === Corpus ===
+def generate_corpus(n: int, seed: int = 7, dup: float = 0.0) -> List[Dict]:
+    """n documents; a `dup` share re-sends an earlier deal with case/spacing changes"""
+    rng = random.Random(seed)
+    names = list(ALIASES)
+    docs = []
+    for _ in range(n):
+        if docs and rng.random() < dup:
+            prev = rng.choice(docs)
+            text = rng.choice([str.upper, str.lower, lambda t: t])(prev["text"])
+            docs.append({"text": re.sub(r"\s+", lambda _: rng.choice([" ", "  ", "\n"]), text) + " ",
+                         "expected": prev["expected"]})
+            continue
+        basket = rng.sample(names, rng.choice([1, 2, 2, 2]))
+        months = rng.choice([3, 4, 6, 9, 12])
+        ko = rng.choice([90, 95, 97, 98, 100, 102])
+        coupon = rng.choice([6, 7.5, 8, 9.5, 10, 11, 12.25, 15])
+        template = rng.choice(TEMPLATES)
+        callable_ = "{call}" in template and rng.random() < 0.3
+        tenor = rng.choice([f"{months} months", f"{months}m", f"{months} mths"]) if months != 12 \
+            else rng.choice(["12 months", "1 year", "1y"])
+        joiner = rng.choice([" + ", "/", ", ", " & "])
+        text = template.format(
+            tenor=tenor, basket=joiner.join(rng.choice(ALIASES[b]) for b in basket),
+            ko=ko, coupon=coupon, bank=rng.choice(["GS", "JPM", "UBS", ""]),
+            call="callable" if callable_ else "")
+        if rng.random() < 0.3:
+            text = re.sub(r" ", lambda _: rng.choice([" ", "  ", "\t"]), text)
+        docs.append({"text": text, "expected": {"basket": basket, "maturity_months": months,
+                                                 "ko": ko, "coupon": coupon, "callable": callable_}})
+    return docs
+
+
+def load_corpus(n: int, seed: int, dup: float = 0.0) -> List[Dict]:
+    with open(SAMPLES_PATH) as f:
+        samples = json.load(f)
+    for s in samples:
+        s["expected"].setdefault("callable", False)
+    return samples + generate_corpus(n, seed, dup)
+
+
+# === Scoring ===
+def _same(field, pred, exp) -> bool:
+    if field in ("coupon", "ko", "maturity_months"):
+        return abs(float(pred) - float(exp)) < 1e-9
+    return pred == exp
+
+
+def run_benchmark(name: str, parser: Callable[[str], Dict], corpus: List[Dict]) -> Dict:
+    tp = {f: 0 for f in FIELDS}
+    predicted = {f: 0 for f in FIELDS}
+    expected = {f: 0 for f in FIELDS}
+    lat = np.empty(len(corpus))
+    for i, doc in enumerate(corpus):
+        t0 = time.perf_counter_ns()
+        pred = parser(doc["text"])
+        lat[i] = time.perf_counter_ns() - t0
+        for f in FIELDS:
+            exp = doc["expected"].get(f)
+            got = pred.get(f)
+            if f == "basket":
+                exp_items = {x.lower() for x in exp or []}
+                got_items = {x.lower() for x in got or []}
+                tp[f] += len(exp_items & got_items)
+                predicted[f] += len(got_items)
+                expected[f] += len(exp_items)
+                continue
+            if exp is not None:
+                expected[f] += 1
+            if got is not None:
+                predicted[f] += 1
+                if exp is not None and _same(f, got, exp):
+                    tp[f] += 1
+    return {
+        "parser": name,
+        "docs_per_sec": len(corpus) / (lat.sum() / 1e9),
+        "latency_us": {f"p{q}": float(np.percentile(lat, q) / 1e3) for q in (50, 95, 99)},
+        "fields": {f: {"precision": tp[f] / predicted[f] if predicted[f] else 0.0,
+                       "recall": tp[f] / expected[f] if expected[f] else 0.0} for f in FIELDS},
+    }
+
+
+def print_report(res: Dict):
+    lat = res["latency_us"]
+    print(f"\n== {res['parser']} ==")
+    print(f"{res['docs_per_sec']:,.0f} docs/sec | latency p50 {lat['p50']:.1f}us "
+          f"p95 {lat['p95']:.1f}us p99 {lat['p99']:.1f}us")
+    print(f"{'field':<16}{'precision':>10}{'recall':>10}")
+    for f, m in res["fields"].items():
+        print(f"{f:<16}{m['precision']:>10.3f}{m['recall']:>10.3f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, default=20000, help="generated documents on top of samples.json")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--dup", type=float, default=0.5, help="share of near-duplicate re-sends")
+    ap.add_argument("--json", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.n, args.seed, args.dup)
+    print(f"PARSER BENCHMARK - {len(corpus)} documents")
+    all_results = []
+    for name, parser in available_parsers().items():
+        parser(corpus[0]["text"])  # warm up compiled state
+        res = run_benchmark(name, parser, corpus)
+        print_report(res)
+        if "parse cache" in name:
+            print(f"cache: {PARSE_CACHE.stats()}")
+        all_results.append(res)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=2)
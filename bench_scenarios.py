@@ -0,0 +1,82 @@
+"""
+Scenario store benchmark
+Prices a batch of same-shaped worst-of notes (coupon and KO varying) with fresh normals
+per note and again on one stored cube (app.scenarios), in-process and across a worker
+pool attached to a shared-memory copy, reporting notes per second.
+
+    python bench_scenarios.py --notes 2000 --paths 20000 --steps 1 > bench_scenarios_output.txt
+"""
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from app.GR21_MC_Engine import Structure, mc_value
+from app.scenarios import ScenarioStore, attach_scenarios
+
+CORR = np.array([[1.0, 0.5], [0.5, 1.0]])
+_shared = None
+
+
+def notes(n: int) -> List[Structure]:
+    rng = np.random.default_rng(0)
+    return [Structure(f"Note_{i}", ["Tencent", "Baba"], [100.0, 100.0], [], None, 1 / 3, 100.0,
+                      float(rng.uniform(6, 14)), ko_level=float(rng.uniform(85, 100))) for i in range(n)]
+
+
+def _init_worker(spec: Dict):
+    global _shared
+    _shared = attach_scenarios(spec)
+
+
+def _price_shared(args) -> float:
+    structure, n_paths, n_steps = args
+    return mc_value(structure, n_paths=n_paths, n_steps=n_steps, correlations=CORR,
+                    scenarios=_shared)["fair_value_gross"]
+
+
+def run(n_notes: int, n_paths: int, n_steps: int, workers: int) -> List[Dict]:
+    book = notes(n_notes)
+    store = ScenarioStore(tempfile.mkdtemp())
+    rows = []
+
+    def timed(name, fn):
+        t0 = time.perf_counter()
+        values = fn()
+        elapsed = time.perf_counter() - t0
+        rows.append({"mode": name, "seconds": elapsed, "notes_per_s": n_notes / elapsed,
+                     "mean_fv": float(np.mean(values))})
+
+    timed("fresh normals", lambda: [mc_value(s, n_paths=n_paths, n_steps=n_steps, correlations=CORR)
+                                    ["fair_value_gross"] for s in book])
+    timed("stored cube (incl. build)", lambda: [
+        mc_value(s, n_paths=n_paths, n_steps=n_steps, correlations=CORR,
+                 scenarios=store.get(42, 2, n_steps, n_paths))["fair_value_gross"] for s in book])
+    with store.share(42, 2, n_steps, n_paths) as shared, \
+            ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared.spec,)) as pool:
+        timed(f"shared memory x{workers}", lambda: list(
+            pool.map(_price_shared, [(s, n_paths, n_steps) for s in book], chunksize=64)))
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--notes", type=int, default=2000)
+    ap.add_argument("--paths", type=int, default=20000)
+    ap.add_argument("--steps", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--json", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    print(f"SCENARIO STORE BENCHMARK - {args.notes:,} notes, {args.paths:,} paths, {args.steps} steps")
+    print(f"{'mode':<28}{'seconds':>10}{'notes/s':>10}{'mean FV':>10}")
+    results = run(args.notes, args.paths, args.steps, args.workers)
+    for r in results:
+        print(f"{r['mode']:<28}{r['seconds']:>10.3f}{r['notes_per_s']:>10.1f}{r['mean_fv']:>10.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
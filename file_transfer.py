@@ -5,15 +5,25 @@ Transfer files from Analysis to UScan workspace
 """
 
 import os
+import re
+import json
 import shutil
 import sys
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import fnmatch
 
+# Content-hash cache, kept under dest_dir's gitignored data/ and never transferred itself
+HASH_CACHE_NAME = "transfer_hashes.json"
+HASH_CACHE_PATH = Path("data") / HASH_CACHE_NAME
+
 class FileTransfer:
-    def __init__(self):
-        self.source_dir = Path(r"C:\Projects\GitHub_Active\Analysis")
-        self.dest_dir = Path(r"C:\Projects\GitHub_Active\Universal\UScan")
+    def __init__(self, source_dir=None, dest_dir=None):
+        self.source_dir = Path(source_dir or r"C:\Projects\GitHub_Active\Analysis")
+        self.dest_dir = Path(dest_dir or r"C:\Projects\GitHub_Active\Universal\UScan")
         
         # File patterns to look for
         self.file_patterns = [
@@ -22,9 +32,20 @@ class FileTransfer:
             "*.csv", "*.html", "*.js", "*.css"
         ]
         
+        # All patterns in one regex, so a single walk can match them (case-insensitive like rglob on Windows)
+        self.pattern_re = re.compile("|".join(fnmatch.translate(p) for p in self.file_patterns),
+                                     re.IGNORECASE if os.name == 'nt' else 0)
+        
         self.transferred_files = []
         self.skipped_files = []
         self.overwritten_files = []
+        self.unchanged_files = []
+        
+        # Persistent content hashes: path -> [size, mtime_ns, blake2b hex]
+        self.hash_cache_path = self.dest_dir / HASH_CACHE_PATH
+        self.hash_cache = {}
+        self._cache_lock = threading.Lock()
+        self._results_lock = threading.Lock()
 
     def clear_screen(self):
         """Clear the terminal screen"""
@@ -39,27 +60,97 @@ class FileTransfer:
         print("=" * 50)
 
     def find_files(self):
-        """Find all matching files in source directory"""
+        """Find all matching files in source directory (one scandir walk, one stat per file)"""
         all_files = []
+        stack = [self.source_dir]
+        cache_path = os.path.abspath(self.hash_cache_path)
         
-        for pattern in self.file_patterns:
-            for file_path in self.source_dir.rglob(pattern):
-                if file_path.is_file():
-                    # Get relative path for better display
-                    try:
-                        rel_path = file_path.relative_to(self.source_dir)
-                    except ValueError:
-                        rel_path = file_path
-                    
-                    all_files.append({
-                        'path': file_path,
-                        'relative_path': rel_path,
-                        'size': file_path.stat().st_size,
-                        'modified': file_path.stat().st_mtime
-                    })
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif (self.pattern_re.match(entry.name) and entry.is_file()
+                          and os.path.abspath(entry.path) != cache_path):
+                        file_path = Path(entry.path)
+                        st = entry.stat()
+                        all_files.append({
+                            'path': file_path,
+                            'relative_path': file_path.relative_to(self.source_dir),
+                            'size': st.st_size,
+                            'modified': st.st_mtime,
+                            'mtime_ns': st.st_mtime_ns,
+                            'stat': st
+                        })
         
         return sorted(all_files, key=lambda x: x['relative_path'])
 
+    # === Change detection ===
+    def load_hash_cache(self):
+        try:
+            with open(self.hash_cache_path, encoding='utf-8') as f:
+                self.hash_cache = json.load(f)
+        except (OSError, ValueError):
+            self.hash_cache = {}
+
+    def prune_hash_cache(self, files):
+        """Drop cached hashes of files that no longer exist (entries for this walk are kept unchecked)"""
+        live = {str(f['path']) for f in files} | {str(self.dest_dir / f['relative_path']) for f in files}
+        with self._cache_lock:
+            stale = [k for k in self.hash_cache if k not in live and not os.path.exists(k)]
+            for key in stale:
+                del self.hash_cache[key]
+        return len(stale)
+
+    def save_hash_cache(self):
+        self.hash_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.hash_cache_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.hash_cache, f)
+        os.replace(tmp, self.hash_cache_path)
+
+    def file_hash(self, path, st):
+        """Content hash, recomputed only when size or mtime changed since it was cached"""
+        key = str(path)
+        with self._cache_lock:
+            cached = self.hash_cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._cache_lock:
+            self.hash_cache[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def is_unchanged(self, file_info, dest_path, fix_mtime=True):
+        """Size/mtime first; equal sizes with different mtimes fall back to content hashes.
+        With fix_mtime=False (dry runs) the destination is never touched."""
+        try:
+            dest_st = dest_path.stat()
+        except FileNotFoundError:
+            return False
+        if dest_st.st_size != file_info['size']:
+            return False
+        if dest_st.st_mtime_ns == file_info['mtime_ns']:
+            return True
+        digest = self.file_hash(file_info['path'], file_info['stat'])
+        if digest != self.file_hash(dest_path, dest_st):
+            return False
+        if not fix_mtime:
+            return True
+        # Same content: align mtimes so the next run takes the fast path
+        os.utime(dest_path, ns=(dest_st.st_atime_ns, file_info['mtime_ns']))
+        with self._cache_lock:
+            self.hash_cache[str(dest_path)] = [dest_st.st_size, file_info['mtime_ns'], digest]
+        return True
+
     def format_file_size(self, size_bytes):
         """Format file size in human-readable format"""
         for unit in ['B', 'KB', 'MB', 'GB']:
@@ -156,6 +247,11 @@ class FileTransfer:
         # Create destination directory if it doesn't exist
         dest_path.parent.mkdir(parents=True, exist_ok=True)
         
+        # Identical destination: nothing to copy or ask about
+        if self.is_unchanged(file_info, dest_path):
+            self.unchanged_files.append(file_info)
+            return 'unchanged'
+        
         # Check if file exists
         if dest_path.exists():
             if overwrite_mode == 'ask':
@@ -182,6 +278,42 @@ class FileTransfer:
             self.transferred_files.append(file_info)
             return 'transferred'
 
+    def _sync_one(self, file_info, overwrite):
+        dest_path = self.dest_dir / file_info['relative_path']
+        if self.is_unchanged(file_info, dest_path):
+            bucket, result = self.unchanged_files, 'unchanged'
+        elif dest_path.exists() and not overwrite:
+            bucket, result = self.skipped_files, 'skipped'
+        else:
+            existed = dest_path.exists()
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(file_info['path'], dest_path)
+            bucket, result = (self.overwritten_files, 'overwritten') if existed else (self.transferred_files, 'transferred')
+        with self._results_lock:
+            bucket.append(file_info)
+        return result
+
+    def sync(self, overwrite=True, workers=None, dry_run=False):
+        """Non-interactive sync: copy new/changed files in parallel, leave identical ones alone"""
+        self.load_hash_cache()
+        files = self.find_files()
+        print(f"🔍 {len(files)} matching files in source")
+        if dry_run:
+            for file_info in files:
+                dest_path = self.dest_dir / file_info['relative_path']
+                if not self.is_unchanged(file_info, dest_path, fix_mtime=False):
+                    print(f"   {'CHANGED' if dest_path.exists() else 'NEW':<8} {file_info['relative_path']}")
+            return
+        with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+            for file_info, result in zip(files, pool.map(lambda f: self._sync_one(f, overwrite), files)):
+                if result == 'overwritten':
+                    print(f"🔄 Overwritten: {file_info['relative_path']}")
+                elif result == 'transferred':
+                    print(f"✅ Transferred: {file_info['relative_path']}")
+        self.prune_hash_cache(files)
+        self.save_hash_cache()
+        self.show_summary()
+
     def show_summary(self):
         """Display transfer summary"""
         print("\n" + "=" * 50)
@@ -203,7 +335,10 @@ class FileTransfer:
             for file in self.skipped_files:
                 print(f"   📄 {file['relative_path']}")
         
-        total = len(self.transferred_files) + len(self.overwritten_files) + len(self.skipped_files)
+        if self.unchanged_files:
+            print(f"🟰 Unchanged: {len(self.unchanged_files)} files")
+        
+        total = len(self.transferred_files) + len(self.overwritten_files) + len(self.skipped_files) + len(self.unchanged_files)
         print(f"\n🎯 Total processed: {total} files")
 
     def run(self):
@@ -213,6 +348,7 @@ class FileTransfer:
             self.display_header()
             
             # Find files
+            self.load_hash_cache()
             files = self.find_files()
             
             if not files:
@@ -247,6 +383,11 @@ class FileTransfer:
                     print(f"✅ Transferred: {file_info['relative_path']}")
                 elif result == 'skipped':
                     print(f"⏭️  Skipped: {file_info['relative_path']}")
+                elif result == 'unchanged':
+                    print(f"🟰 Unchanged: {file_info['relative_path']}")
+            
+            self.prune_hash_cache(files)
+            self.save_hash_cache()
             
             # Show summary
             self.show_summary()
@@ -258,8 +399,21 @@ class FileTransfer:
 
 def main():
     """Main function"""
-    transfer = FileTransfer()
-    transfer.run()
+    parser = argparse.ArgumentParser(description="Transfer files from Analysis to UScan workspace")
+    parser.add_argument("--sync", action="store_true", help="non-interactive: copy all new/changed files")
+    parser.add_argument("--source", help="source directory")
+    parser.add_argument("--dest", help="destination directory")
+    parser.add_argument("--no-overwrite", action="store_true", help="with --sync, leave changed destination files alone")
+    parser.add_argument("--workers", type=int, help="parallel copy threads")
+    parser.add_argument("--dry-run", action="store_true", help="with --sync, only list what would be copied")
+    args = parser.parse_args()
+    
+    transfer = FileTransfer(args.source, args.dest)
+    if args.sync:
+        transfer.display_header()
+        transfer.sync(overwrite=not args.no_overwrite, workers=args.workers, dry_run=args.dry_run)
+    else:
+        transfer.run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
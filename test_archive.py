@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+import U_archive_simple as archive
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    root = tmp_path / "Universal"
+    (root / "app").mkdir(parents=True)
+    (root / "app" / "engine.py").write_text("x = 1\n" * 1000)
+    (root / "big.bin").write_bytes(os.urandom(archive.CHUNK_SIZE + 123))
+    monkeypatch.setattr(archive, "find_workspace_root", lambda: root)
+    return root
+
+
+def stored_chunks(root):
+    return {p.name: p for p in (root.parent / "Archives" / "store" / "chunks").glob("*/*")}
+
+
+def test_snapshot_round_trip_and_dedup(workspace):
+    archive.archive_workspace(workers=2)
+    n_chunks = len(stored_chunks(workspace))
+    (workspace / "app" / "engine.py").write_text("x = 2\n")
+    snapshot = archive.archive_workspace(workers=2)
+    assert len(stored_chunks(workspace)) == n_chunks + 1
+    archive._restore_single_archive(snapshot)
+    restored = workspace.parent / "Archives" / f"TEST_{snapshot.stem}" / "Universal"
+    assert (restored / "app" / "engine.py").read_text() == "x = 2\n"
+    assert (restored / "big.bin").read_bytes() == (workspace / "big.bin").read_bytes()
+
+
+def test_cleanup_keeps_fresh_unreferenced_chunks(workspace):
+    archive.archive_workspace()
+    referenced = set(stored_chunks(workspace))
+    store = workspace.parent / "Archives" / "store"
+    old, fresh = "aa" + "0" * 38, "ab" + "0" * 38  # e.g. written by a snapshot still running
+    for digest in (old, fresh):
+        path = archive._chunk_path(store, digest)
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"")
+    stale = time.time() - archive.CHUNK_GRACE_S - 60
+    os.utime(archive._chunk_path(store, old), (stale, stale))
+    archive.delete_old_archives()
+    assert set(stored_chunks(workspace)) == referenced | {fresh}
+
+
+def test_reused_chunks_are_refreshed(workspace):
+    archive.archive_workspace()
+    store = workspace.parent / "Archives" / "store"
+    stale = time.time() - archive.CHUNK_GRACE_S - 60
+    for path in stored_chunks(workspace).values():
+        os.utime(path, (stale, stale))
+    (workspace / "copy.bin").write_bytes((workspace / "big.bin").read_bytes())  # same content, new file
+    archive.archive_workspace()
+    big = [p for p in stored_chunks(workspace).values() if p.stat().st_mtime > stale + 1]
+    assert len(big) == 2  # both chunks of big.bin, reused by copy.bin
@@ -0,0 +1,65 @@
+import pytest
+
+from app.chat import ChatParser, iter_chat_deals
+
+
+@pytest.fixture(scope="module")
+def orch():
+    from app.orchestrator import UScanOrchestrator
+    return UScanOrchestrator()
+
+
+@pytest.fixture
+def parser(orch):
+    return ChatParser(orchestrator=orch, max_conversations=3, max_idle=60.0)
+
+
+def test_deal_assembles_across_messages(parser):
+    assert parser.feed("desk", "Tencent + Baba", now=0) is None
+    assert parser.feed("desk", "4m", now=1) is None
+    assert parser.pending("desk")["missing"] == ["ko", "coupon"]
+    assert parser.feed("desk", "KO 98", now=2) is None
+    event = parser.feed("desk", "11% pa", now=3)
+    assert event["messages"] == 4 and "mc" not in event
+    assert event["parsed"]["name"] == "Tencent_Baba_KO98"
+    assert (event["parsed"]["maturity_months"], event["parsed"]["coupon"]) == (4, 11.0)
+    assert event["gr21"][0]["barriers"] == [{"type": "KO_DOWN", "level": "98%"}]
+    assert parser.pending("desk") is None and len(parser) == 0
+
+
+def test_later_messages_override_and_conversations_stay_apart(parser):
+    parser.feed("a", "Tencent 6m KO 95", now=0)
+    parser.feed("b", "HSBC 12m 9% pa", now=0)
+    parser.feed("a", "make it KO 97", now=1)
+    event = parser.feed("a", "8% pa", now=2)
+    assert (event["parsed"]["basket"], event["parsed"]["ko"]) == (["Tencent"], 97)
+    assert parser.pending("b")["missing"] == ["ko"]
+
+
+def test_chatter_without_terms_is_not_kept(parser):
+    assert parser.feed("x", "morning, any axes today?", now=0) is None
+    assert parser.pending("x") is None and len(parser) == 0
+
+
+def test_idle_and_excess_conversations_expire(parser):
+    parser.feed("old", "Tencent 6m", now=0)
+    parser.feed("mid", "Baba 3m", now=30)
+    parser.feed("new", "HSBC 12m", now=70)  # "old" idle for 70s > max_idle
+    assert parser.pending("old") is None and len(parser) == 2
+    for i, t in enumerate((71, 72)):
+        parser.feed(f"extra-{i}", "Tencent 4m", now=t)
+    assert len(parser) == 3 and parser.pending("mid") is None  # least recently active dropped
+    assert parser.stats == {"messages": 5, "deals": 0, "expired": 2}
+
+
+def test_reset_drops_a_partial(parser):
+    parser.feed("desk", "Tencent 6m KO 95", now=0)
+    parser.reset("desk")
+    assert parser.feed("desk", "10% pa", now=1) is None
+    assert parser.pending("desk")["missing"] == ["underlyings", "months", "ko"]
+
+
+def test_iter_chat_deals_yields_completed_deals(orch):
+    feed = [("a", "Tencent Baba"), ("b", "HSBC 12m KO 95 9% pa"), ("a", "4m KO 98"), ("a", "11%")]
+    events = list(iter_chat_deals(feed, ChatParser(orchestrator=orch)))
+    assert [(e["conversation"], e["parsed"]["name"]) for e in events] == [("b", "HSBC_KO95"), ("a", "Tencent_Baba_KO98")]
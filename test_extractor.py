@@ -0,0 +1,92 @@
+from app.chat import PartialDeal
+from app.documents import iter_document_deals
+from app.extractor import get_extractor
+from app.scanner import ParseCache, normalize_text, parse_deal_uncached
+
+
+def extract(text):
+    return get_extractor().extract(normalize_text(text))
+
+
+def test_scan_tokens_in_document_order():
+    hits = list(get_extractor().scan(normalize_text("Tencent + Hang Seng 6 months KO 98% 11% p.a. callable")))
+    assert [(f, v) for f, v, _, _ in hits] == [
+        ("underlying", "Tencent"), ("underlying", "Hang Seng"), ("months", 6),
+        ("ko", 98), ("coupon", 11.0), ("callable", True)]
+
+
+def test_tenor_units():
+    assert extract("tencent 4m")["months"] == 4
+    assert extract("tencent 9 mths")["months"] == 9
+    assert extract("tencent 1.5 years")["months"] == 18
+
+
+def test_bare_m_amount_is_not_a_tenor():
+    assert extract("USD 10m notional, 6 months Tencent")["months"] == 6
+    assert extract("USD 10m, 6 months Tencent")["months"] == 6
+    assert extract("Tencent 10m HKD, 3m")["months"] == 3
+
+
+def test_labeled_percentages_are_not_the_coupon():
+    fields = extract("Tencent 6 months strike 85%")
+    assert fields["coupon"] is None
+    fields = extract("Tencent 6 months KO at 95%")
+    assert (fields["ko"], fields["coupon"]) == (95, None)
+    fields = extract("HSBC 12m KI barrier 60% 9%")
+    assert (fields["ko"], fields["coupon"]) == (None, 9.0)
+    assert extract("Baba 3m strike at 90% , coupon: 8%")["coupon"] == 8.0
+
+
+def test_unlabeled_percentage_falls_back_to_coupon():
+    assert extract("Tencent Baba 4m KO 98 11%")["coupon"] == 11.0
+
+
+def test_chat_partial_deal_ignores_labeled_percentages():
+    partial = PartialDeal()
+    for text in ("Tencent 6m", "strike 85%", "KO at 95%"):
+        partial.update(get_extractor().scan(normalize_text(text)))
+    assert (partial.ko, partial.coupon) == (95, None)
+    partial.update(get_extractor().scan(normalize_text("10%")))
+    assert partial.coupon == 10.0
+
+
+def test_document_blocks_ignore_labeled_percentages():
+    doc = "Note 1\nHSBC 12 months\nStrike: 85%\nKO at 95%\n\nNote 2\nTencent 6 months\n7% p.a.\n"
+    deals = [deal for _, _, deal in iter_document_deals(doc, workers=1)]
+    assert [(d["basket"], d["ko"], d["coupon"]) for d in deals] == [(["HSBC"], 95, 0.0), (["Tencent"], 100, 7.0)]
+
+
+def test_parse_cache_hits_on_normalized_text():
+    cache = ParseCache(maxsize=2)
+    first = cache.get_or_parse("Tencent Baba 4 months KO 98% 11% coupon")
+    again = cache.get_or_parse("  TENCENT baba 4 months  ko 98% 11% COUPON ")
+    assert first == again == parse_deal_uncached(normalize_text("Tencent Baba 4 months KO 98% 11% coupon"))
+    assert (cache.hits, cache.misses) == (1, 1)
+    again["basket"].append("HSBC")  # callers get copies
+    assert cache.get_or_parse("tencent baba 4 months ko 98% 11% coupon")["basket"] == ["Tencent", "Baba"]
+
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(maxsize=2)
+    for text in ("tencent 3m", "baba 3m", "tencent 3m", "hsbc 3m"):
+        cache.get_or_parse(text)
+    assert cache.stats()["evictions"] == 1
+    cache.get_or_parse("tencent 3m")
+    assert cache.hits == 2
+    cache.get_or_parse("baba 3m")
+    assert cache.misses == 4
+
+
+def test_in_and_put_only_label_after_a_knock_in_phrase():
+    assert extract("Tencent 6 months KO 98, paid in 10%")["coupon"] == 10.0
+    assert extract("Tencent 6 months, we put 8% on it")["coupon"] == 8.0
+    assert extract("Tencent 6 months knock-in 60% 9%")["coupon"] == 9.0
+    assert extract("Tencent 6 months KI put 70% 9%")["coupon"] == 9.0
+
+
+def test_short_bare_numbers_are_not_tickers():
+    assert extract("AIA 2 years 5 hk")["underlyings"] == ["AIA"]
+    assert extract("AIA 6m, 5 HK lots")["underlyings"] == ["AIA"]
+    assert extract("6m 700 HK + Baba")["underlyings"] == ["Tencent", "Baba"]
+    assert extract("AIA 2 years 5.hk")["underlyings"] == ["AIA", "HSBC"]
+    assert extract("0700.HK 6m KO 98 10%")["underlyings"] == ["Tencent"]
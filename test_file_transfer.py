@@ -0,0 +1,57 @@
+import json
+import os
+
+from file_transfer import HASH_CACHE_PATH, FileTransfer
+
+
+def make_tree(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    (src / "pkg").mkdir(parents=True)
+    dst.mkdir()
+    (src / "pkg" / "a.py").write_text("print('a')\n")
+    (src / "b.json").write_text("{}\n")
+    (src / "skip.bin").write_bytes(b"\0")
+    return src, dst
+
+
+def test_sync_copies_then_leaves_identical_files(tmp_path):
+    src, dst = make_tree(tmp_path)
+    FileTransfer(src, dst).sync(workers=2)
+    assert (dst / "pkg" / "a.py").read_text() == "print('a')\n" and not (dst / "skip.bin").exists()
+    again = FileTransfer(src, dst)
+    again.sync(workers=2)
+    assert len(again.unchanged_files) == 2 and not again.transferred_files
+
+
+def test_dry_run_has_no_side_effects(tmp_path, capsys):
+    src, dst = make_tree(tmp_path)
+    FileTransfer(src, dst).sync()
+    target = dst / "b.json"
+    os.utime(target, ns=(0, 1_000_000_000))  # same content, different mtime
+    cache = (dst / HASH_CACHE_PATH).read_text()
+    FileTransfer(src, dst).sync(dry_run=True)
+    assert target.stat().st_mtime_ns == 1_000_000_000
+    assert (dst / HASH_CACHE_PATH).read_text() == cache
+    assert "b.json" not in capsys.readouterr().out.rsplit("matching files", 1)[1]
+
+
+def test_identical_content_realigns_mtime_and_prunes_cache(tmp_path):
+    src, dst = make_tree(tmp_path)
+    FileTransfer(src, dst).sync()
+    os.utime(dst / "b.json", ns=(0, 1_000_000_000))
+    (src / "pkg" / "a.py").unlink()
+    (dst / "pkg" / "a.py").unlink()
+    ft = FileTransfer(src, dst)
+    ft.sync()
+    assert [str(f["relative_path"]) for f in ft.unchanged_files] == ["b.json"]
+    assert (dst / "b.json").stat().st_mtime_ns == (src / "b.json").stat().st_mtime_ns
+    cached = json.loads((dst / HASH_CACHE_PATH).read_text())
+    assert cached and not any(k.endswith("a.py") for k in cached)
+
+
+def test_hash_cache_stays_out_of_the_transfer(tmp_path):
+    src, dst = make_tree(tmp_path)
+    FileTransfer(src, dst).sync()
+    assert (dst / HASH_CACHE_PATH).exists() and str(HASH_CACHE_PATH).startswith("data")
+    found = [str(f["relative_path"]) for f in FileTransfer(dst, dst).find_files()]
+    assert sorted(found) == ["b.json", os.path.join("pkg", "a.py")]
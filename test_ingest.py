@@ -0,0 +1,50 @@
+import shutil
+
+from app.ingest import body_digest, iter_bodies, strip_reply
+from app.scanner import normalize_text, parse_deal_uncached
+
+MAIL_DIR = "outputs/local_test/mail"
+
+
+def bodies(paths):
+    return {source.rsplit("/", 1)[-1]: body for source, _, body in iter_bodies(paths)}
+
+
+def test_forwarded_content_is_kept():
+    out = bodies([MAIL_DIR])
+    assert out["gmail_forward.eml"] == "FYI\n\nHi Bob,\n\nIndicative FCN on Tencent / Baba, 4 months, KO 98%, 11% p.a."
+    assert out["outlook_forward.eml"] == "HSBC + Hang Seng 6m KO 97 8.5% pa"
+    deal = parse_deal_uncached(normalize_text(out["gmail_forward.eml"]))
+    assert (deal["basket"], deal["maturity_months"], deal["ko"], deal["coupon"]) == (["Tencent", "Baba"], 4, 98, 11.0)
+
+
+def test_reply_history_and_signature_are_dropped():
+    out = bodies([MAIL_DIR])
+    assert out["reply_thanks.eml"] == "Thanks,\ncan you also price HSBC 12 months KO 95 9% pa?"
+    assert out["outlook_reply.eml"] == "Baba 3 months KO 96 12% p.a. works for us."
+
+
+def test_signature_only_cut_near_the_end():
+    body = "Thanks, see terms:\nRegards,\n" + "\n".join(f"line {i}" for i in range(12)) + "\n--\nBob"
+    assert strip_reply(body) == body.rsplit("\n--", 1)[0]
+    assert strip_reply("Thanks,\nTencent 6m 10% pa") == "Thanks,\nTencent 6m 10% pa"
+
+
+def test_nested_forwards_keep_every_segment():
+    body = ("fyi\n---------- Forwarded message ---------\nFrom: A <a@x.com>\nSubject: x\n\n"
+            "see below\n---------- Forwarded message ---------\nFrom: B <b@x.com>\n\nTencent 6m 10% pa\n")
+    assert strip_reply(body) == "fyi\n\nsee below\n\nTencent 6m 10% pa"
+
+
+def test_duplicate_messages_share_a_digest(tmp_path):
+    shutil.copy(f"{MAIL_DIR}/gmail_forward.eml", tmp_path / "a.eml")
+    shutil.copy(f"{MAIL_DIR}/gmail_forward.eml", tmp_path / "b.eml")
+    digests = [digest for _, digest, _ in iter_bodies([str(tmp_path)])]
+    assert len(digests) == 2 and digests[0] == digests[1]
+    assert body_digest("Tencent  6m\n10% PA") == body_digest("tencent 6m 10% pa")
+
+
+def test_reply_header_right_after_a_forward_header_is_dropped():
+    body = ("fyi, Tencent 6m 10% pa\n---------- Forwarded message ---------\nFrom: A <a@x.com>\nSubject: x\n\n"
+            "On Mon, 3 Mar 2025 at 09:12, Bob <bob@x.com> wrote:\n> Baba 3m KO 95\n")
+    assert strip_reply(body) == "fyi, Tencent 6m 10% pa"
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.GR21_MC_Engine import BasketType, Structure, lifecycle_mtm, mc_value
+from app.orchestrator import UScanOrchestrator
+
+CLOSES = [("2025-01-02", 400.0, 80.0), ("2025-01-03", 404.0, 78.0), ("2025-02-03", 380.0, 75.0),
+          ("2025-03-03", 360.0, 70.0), ("2025-05-05", 420.0, 84.0)]
+
+
+def note_json(ids=("0700.HK", "9988.HK"), ko="90%"):
+    return {"name": "Tencent_Baba", "underlyings": ["Tencent", "Baba"], "instrument_ids": list(ids),
+            "initial_prices": [100.0, 100.0], "maturity": 4 / 12, "barriers": [{"type": "KO_DOWN", "level": ko}],
+            "other_props": [{"principal": 100.0}, {"coupon": 12.0}]}
+
+
+@pytest.fixture(scope="module")
+def orch():
+    return UScanOrchestrator()
+
+
+@pytest.fixture
+def prices(tmp_path):
+    path = tmp_path / "prices.csv"
+    rows = ["date,ticker,close"]
+    for date, tencent, baba in CLOSES:
+        rows += [f"{date},0700.HK,{tencent}", f"{date},9988.HK,{baba}"]
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+def test_mark_to_market_marks_every_live_date(orch, prices):
+    np.random.seed(1)
+    marks = orch.mark_to_market(note_json(), "2025-01-02", n_paths=20000, csv_path=prices)
+    assert marks["dates"] == [d for d, _, _ in CLOSES[:4]]  # 2025-05-05 is past maturity
+    assert marks["worst_performance"] == pytest.approx([100.0, 97.5, 93.75, 87.5])
+    assert marks["ko_breached"] == [False, False, False, True]
+    assert marks["coupon_accrued"][0] == 0.0 and marks["coupon_accrued"][-1] > marks["coupon_accrued"][1]
+    assert marks["fair_value_gross"][-1] < marks["fair_value_gross"][0]
+
+
+def test_first_mark_matches_a_fresh_price(orch, prices):
+    np.random.seed(2)
+    marks = orch.mark_to_market(note_json(), "2025-01-02", n_paths=200000, csv_path=prices)
+    note = Structure("fresh", ["Tencent", "Baba"], [400.0, 80.0], [], BasketType.WORST_OF, 4 / 12, 100.0, 12.0,
+                     ko_level=90.0)
+    np.random.seed(3)
+    fresh = mc_value(note, n_paths=200000)
+    assert marks["fair_value_gross"][0] == pytest.approx(fresh["fair_value_gross"], abs=0.15)
+    assert marks["prob_no_ko"][0] == pytest.approx(fresh["prob_no_ko"], abs=0.5)
+
+
+def test_batched_dates_match_one_batch():
+    note = Structure("x", ["Tencent", "Baba"], [100.0, 100.0], [], BasketType.WORST_OF, 0.5, 100.0, 10.0, ko_level=95.0)
+    elapsed = np.linspace(0.0, 0.5, 7)
+    spots = np.column_stack([np.linspace(100, 90, 7), np.linspace(100, 104, 7)])
+    np.random.seed(4)
+    one = lifecycle_mtm(note, elapsed, spots, n_paths=5000)
+    np.random.seed(4)
+    many = lifecycle_mtm(note, elapsed, spots, n_paths=5000, batch_floats=2 * 5000 * 2)
+    assert many["fair_value_gross"] == pytest.approx(one["fair_value_gross"], abs=1e-9)
+    assert one["remaining_maturity"][-1] == 0.0
+
+
+def test_unresolved_underlying_is_a_value_error(orch, prices):
+    with pytest.raises(ValueError, match="Baba"):
+        orch.mark_to_market(note_json(ids=("0700.HK", None)), "2025-01-02", csv_path=prices)
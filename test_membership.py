@@ -0,0 +1,52 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from app.membership import FREE_MONTHLY_RUNS, MembershipTier, UScanMembership
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "usage.db"), str(tmp_path / "usage.json")
+
+
+def hammer(check, user_id, n=40, workers=8):
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(lambda _: check(user_id), range(n)))
+
+
+def test_concurrent_free_checks_never_exceed_the_quota(db):
+    membership = UScanMembership(*db)
+    results = hammer(membership.can_run_analysis, "alice")
+    allowed = [r for r in results if r["allowed"]]
+    assert len(allowed) == FREE_MONTHLY_RUNS
+    assert sorted(r["message"] for r in allowed) == [f"Run #{i}" for i in range(1, FREE_MONTHLY_RUNS + 1)]
+
+
+def test_separate_instances_share_one_quota(db):
+    instances = [UScanMembership(*db) for _ in range(4)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda i: instances[i % 4].can_run_analysis("bob"), range(40)))
+    assert sum(r["allowed"] for r in results) == FREE_MONTHLY_RUNS
+    assert UScanMembership(*db).can_run_analysis("bob")["allowed"] is False
+
+
+def test_premium_is_unlimited_and_users_are_independent(db):
+    membership = UScanMembership(*db)
+    membership.set_tier("carol", MembershipTier.PREMIUM)
+    assert all(r["allowed"] and r["remaining"] == "Unlimited" for r in hammer(membership.can_run_analysis, "carol"))
+    assert membership.get_tier("carol") is MembershipTier.PREMIUM
+    assert membership.can_run_analysis("dave") == {"allowed": True, "remaining": FREE_MONTHLY_RUNS - 1,
+                                                   "message": "Run #1"}
+
+
+def test_legacy_json_is_migrated_once(db):
+    db_path, legacy = db
+    month = datetime.now().strftime("%Y-%m")
+    with open(legacy, "w") as f:
+        json.dump({"erin": {"tier": "free", "runs": {month: FREE_MONTHLY_RUNS - 1}}}, f)
+    assert UScanMembership(db_path, legacy).can_run_analysis("erin")["remaining"] == 0
+    UScanMembership(db_path, legacy)  # second start must not re-import the old counts
+    assert UScanMembership(db_path, legacy).can_run_analysis("erin")["allowed"] is False
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from app.GR21_MC_Engine import (TRADING_DAYS, BasketType, Structure, _bootstrap_cum, _iter_bootstrap_steps,
+                                _iter_heston_steps, mc_value)
+from app.history import ReturnHistory
+
+
+def note(T=60 / TRADING_DAYS, ids=None, spots=(100.0, 250.0)):
+    return Structure("Tencent_Baba", ["Tencent", "Baba"], list(spots), [], BasketType.WORST_OF, T, 100.0, 10.0,
+                     instrument_ids=ids, ko_level=90.0)
+
+
+@pytest.fixture(scope="module")
+def history():
+    rng = np.random.default_rng(4)
+    returns = rng.multivariate_normal([0.0008, -0.0004], [[2e-4, 1e-4], [1e-4, 3e-4]], size=500)
+    return ReturnHistory(returns.astype(np.float32), ["0700.HK", "9988.HK"], [str(i) for i in range(500)])
+
+
+def test_bootstrap_windows_are_risk_neutral(history):
+    block, r = 10, 0.05
+    cum = _bootstrap_cum(note(ids=["0700.HK", "9988.HK"]), history, block, r)
+    windows = cum[block:] - cum[:-block]
+    assert np.mean(np.exp(windows), axis=0) == pytest.approx([np.exp(r * block / TRADING_DAYS)] * 2, rel=1e-12)
+
+
+def test_bootstrap_terminal_mean_grows_at_r(history):
+    structure = note(ids=["0700.HK", "9988.HK"])
+    rng = np.random.default_rng(8)
+    *_, (_, prices) = _iter_bootstrap_steps(structure, history, 200_000, 3, block=10, r=0.05,
+                                            randint=rng.integers)
+    growth = prices.mean(axis=1) / structure.initial_prices
+    se = prices.std(axis=1) / structure.initial_prices / np.sqrt(200_000)
+    assert np.all(np.abs(growth - np.exp(0.05 * 60 / TRADING_DAYS)) < 4 * se)
+
+
+def test_bootstrap_needs_more_history_than_one_block(history):
+    short = ReturnHistory(history.returns[:10], history.ids, history.dates[:10])
+    with pytest.raises(ValueError, match="more than 10 days"):
+        mc_value(note(ids=["0700.HK", "9988.HK"]), model="bootstrap", history=short, n_paths=100)
+
+
+def test_bootstrap_rejects_unresolved_underlyings(history):
+    with pytest.raises(ValueError, match="underlying\\(s\\) Baba"):
+        mc_value(note(ids=["0700.HK", None]), model="bootstrap", history=history, n_paths=100)
+    with pytest.raises(KeyError, match="No return history for Tencent, Baba"):
+        mc_value(note(), model="bootstrap", history=history, n_paths=100)
+    with pytest.raises(KeyError, match="No return history for None"):
+        history.select(["0700.HK", None])
+
+
+def heston_terminal(structure, params, n_paths=200_000, n_steps=12, seed=6):
+    rng = np.random.default_rng(seed)
+    *_, (_, prices) = _iter_heston_steps(structure, 0.05, 0.25, n_paths, n_steps, np.array([[1.0, 0.6], [0.6, 1.0]]),
+                                         params, rng.standard_normal, rng.random)
+    return prices / structure.initial_prices[:, np.newaxis]
+
+
+@pytest.mark.parametrize("params", [None, {"xi": 1.0, "rho": -0.9, "kappa": 0.5, "v0": 0.04}])
+def test_heston_forward_is_exp_rt(params):
+    growth = heston_terminal(note(T=1.0), params)
+    se = growth.std(axis=1) / np.sqrt(growth.shape[1])
+    assert np.all(np.abs(growth.mean(axis=1) - np.exp(0.05)) < 4 * se)
+
+
+def test_heston_without_vol_of_vol_is_gbm():
+    log_ret = np.log(heston_terminal(note(T=1.0), {"xi": 0.0}))
+    assert np.all(np.isfinite(log_ret))
+    assert log_ret.mean(axis=1) == pytest.approx([0.05 - 0.5 * 0.25**2] * 2, abs=4 * 0.25 / np.sqrt(200_000))
+    assert log_ret.std(axis=1) == pytest.approx([0.25, 0.25], rel=0.01)
+    assert np.corrcoef(log_ret)[0, 1] == pytest.approx(0.6, abs=0.01)
+
+
+def test_heston_without_vol_of_vol_prices_like_gbm():
+    structure, n = note(T=0.5), 200_000
+    np.random.seed(12)
+    gbm = mc_value(structure, n_paths=n, n_steps=6)
+    np.random.seed(13)
+    heston = mc_value(structure, n_paths=n, n_steps=6, model="heston", heston={"xi": 0.0})
+    se = np.hypot(gbm["payoff_std"], heston["payoff_std"]) * np.exp(-0.05 * 0.5) / np.sqrt(n)
+    assert abs(gbm["fair_value_gross"] - heston["fair_value_gross"]) < 4 * se
@@ -12,7 +12,7 @@ deal = {
 print("USCAN STRUCTURED NOTE - REAL MARKET PRICING")
 orch = UScanOrchestrator()
 inp = orch._to_gr21_input(deal)
-mc = orch._run_mc(inp)["results"][0]
+mc = orch._run_mc(inp, method="mc")["results"][0]
 
 fv = mc["fair_value_gross"]
 overpriced = 100 - fv
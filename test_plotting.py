@@ -0,0 +1,28 @@
+import os
+
+import numpy as np
+
+from app.GR21_MC_Engine import BasketType, Structure, mc_value
+from app.GR32_Plotting_Engine import PLOT_SPECS, render_plot_packs
+
+INPUT = [{"name": "Tencent_Baba_KO95", "underlyings": ["Tencent", "Baba"], "maturity": 0.5,
+          "barriers": [{"type": "KO_DOWN", "level": "95%"}], "other_props": [{"principal": 100.0}]}]
+
+
+def pack(name, seed):
+    note = Structure("Tencent_Baba_KO95", ["Tencent", "Baba"], [100.0, 100.0], [], BasketType.WORST_OF, 0.5,
+                     100.0, 10.0, ko_level=95.0)
+    np.random.seed(seed)
+    result = {**mc_value(note, n_paths=2000, n_steps=20, fan=True), "structure_name": note.name}
+    return name, {"results": [result]}, INPUT
+
+
+def test_packs_render_headless_through_the_process_pool(tmp_path):
+    out = render_plot_packs([pack("desk_a", 1), pack("desk_b", 2)], str(tmp_path), html=False, workers=2)
+    assert sorted(out) == ["desk_a", "desk_b"]
+    for name, paths in out.items():
+        assert sorted(paths) == sorted(str(tmp_path / name / f"{key}.png") for key, *_ in PLOT_SPECS)
+        for path in paths:
+            with open(path, "rb") as f:
+                assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+            assert os.path.getsize(path) > 1000
@@ -0,0 +1,142 @@
+from math import erf, exp, log, sqrt
+
+import numpy as np
+import pytest
+
+from app.GR21_MC_Engine import Barrier, BarrierType, BasketType, Structure, mc_value
+from app.GR22_PDE_Engine import pde_value
+
+
+def ncdf(x):
+    return 0.5 * (1 + erf(x / sqrt(2)))
+
+
+def closed_form(ko, coupon, T, r=0.05, sigma=0.25, principal=100.0):
+    """Single-underlying note: coupon digital above the KO, asset-or-nothing below it"""
+    d2 = (log(100.0 / ko) + (r - 0.5 * sigma**2) * T) / (sigma * sqrt(T))
+    d1 = d2 + sigma * sqrt(T)
+    c = coupon / 100 * T * principal
+    return principal + exp(-r * T) * (c * ncdf(d2) - principal * ncdf(-d2)) + principal * ncdf(-d1)
+
+
+def single(ko, coupon=10.0, T=0.5, spot=100.0):
+    return Structure("Tencent", ["Tencent"], [spot], [], BasketType.WORST_OF, T, 100.0, coupon, ko_level=ko)
+
+
+@pytest.mark.parametrize("ko", [98.0, 90.0, 85.0])
+def test_pde_matches_closed_form(ko):
+    exact = closed_form(ko, 10.0, 0.5)
+    assert pde_value(single(ko))["fair_value_gross"] == pytest.approx(exact, abs=2e-3)
+    assert pde_value(single(ko, spot=412.6))["fair_value_gross"] == pytest.approx(exact, abs=2e-3)
+
+
+def test_pde_aligns_grid_to_the_payoff_ko_not_the_barrier_list():
+    note = single(98.0)
+    note.barriers = [Barrier(BarrierType.KO_DOWN, 90.0)]
+    assert pde_value(note, n_space=200)["fair_value_gross"] == pytest.approx(closed_form(98.0, 10.0, 0.5), abs=1e-3)
+
+
+def test_pde_matches_mc_within_tolerance():
+    note = single(95.0, coupon=8.0, T=1.0)
+    pde = pde_value(note)
+    np.random.seed(3)
+    mc = mc_value(note, n_paths=200000)
+    se = mc["payoff_std"] * exp(-0.05) / sqrt(200000)
+    assert abs(pde["fair_value_gross"] - mc["fair_value_gross"]) < 4 * se
+    assert pde["prob_no_ko"] == pytest.approx(mc["prob_no_ko"], abs=0.5)
+    assert pde["prob_loss"] == pytest.approx(mc["prob_loss"], abs=0.5)
+
+
+@pytest.fixture(scope="module")
+def table():
+    from app.GR23_Table_Engine import PricingTable
+    axes = {"ko": np.arange(85.0, 100.01, 0.5).tolist(), "months": [3, 4, 5, 6], "vol": [0.2, 0.25, 0.3]}
+    return PricingTable.build(["Tencent", "Baba"], axes, n_paths=100000)
+
+
+def basket(ko, coupon=11.0, months=4):
+    return Structure("Tencent_Baba", ["Tencent", "Baba"], [100.0, 100.0], [], BasketType.WORST_OF, months / 12,
+                     100.0, coupon, ko_level=ko)
+
+
+@pytest.mark.parametrize("ko,months,sigma", [(98.0, 4, 0.25), (91.3, 5, 0.22)])
+def test_table_matches_mc_within_tolerance(table, ko, months, sigma):
+    note = basket(ko, months=months)
+    quote = table.value(note, sigma)
+    np.random.seed(5)
+    mc = mc_value(note, sigma=sigma, n_paths=200000)
+    se = mc["payoff_std"] * exp(-0.05 * note.maturity) / sqrt(200000)
+    assert abs(quote["fair_value_gross"] - mc["fair_value_gross"]) < quote["table_error"] + 4 * se
+    assert quote["prob_no_ko"] == pytest.approx(mc["prob_no_ko"], abs=1.0)
+    assert quote["prob_positive"] == pytest.approx(mc["prob_positive"], abs=1.0)
+    assert quote["expected_loss_given_loss"] == pytest.approx(mc["expected_loss_given_loss"], abs=0.5)
+
+
+def test_table_build_leaves_the_global_rng_alone():
+    from app.GR23_Table_Engine import PricingTable
+    axes = {"ko": [90.0, 95.0], "months": [3, 6], "vol": [0.2, 0.3]}
+    np.random.seed(1)
+    expected = np.random.standard_normal(3)
+    np.random.seed(1)
+    first = PricingTable.build(["Tencent", "Baba"], axes, n_paths=2000, seed=8)
+    assert np.array_equal(np.random.standard_normal(3), expected)
+    again = PricingTable.build(["Tencent", "Baba"], axes, n_paths=2000, seed=8)
+    assert np.array_equal(first.m1, again.m1) and np.array_equal(first.survive, again.survive)
+
+
+def test_table_declines_notes_outside_the_grid(table):
+    assert table.value(basket(80.0), 0.25) is None
+    assert table.value(basket(95.0), 0.45) is None
+
+
+def test_payoff_plot_shows_table_quotes(table):
+    from app.GR32_Plotting_Engine import UniversalPlottingEngine
+    from matplotlib.figure import Figure
+    quote = {**table.value(basket(95.0), 0.25), "structure_name": "table"}
+    bare = {"structure_name": "bare", "fair_value_gross": 97.0}
+    fig = Figure()
+    ax = fig.add_subplot()
+    UniversalPlottingEngine(headless=True)._draw_payoff(fig, ax, {"results": [quote, bare]}, [])
+    heights = [p.get_height() for p in ax.patches]
+    assert heights[0] == pytest.approx(quote["prob_loss"]) and heights[0] < 100
+    assert heights[1] == 0 and any(t.get_text() == "n/a" for t in ax.texts)
+
+
+def test_loss_metrics_share_one_sign_convention(table):
+    note = basket(95.0)
+    np.random.seed(9)
+    mc = mc_value(note, n_paths=50000)
+    quote = table.value(note, 0.25)
+    pde = pde_value(single(95.0))
+    assert 0 < mc["expected_loss_given_loss"] <= mc["es_99"]
+    assert 0 < mc["var_95"] <= mc["var_99"] <= mc["es_99"]
+    assert quote["expected_loss_given_loss"] > 0 and pde["expected_loss_given_loss"] > 0
+
+
+def test_fan_aggregates_shape_and_quantile_order():
+    note = basket(95.0)
+    np.random.seed(2)
+    fan = mc_value(note, n_paths=5000, n_steps=120, fan=True, fan_samples=7, fan_points=60)["fan"]
+    assert fan["quantiles"] == [5, 25, 50, 75, 95] and len(fan["times"]) == 61
+    assert fan["times"][0] == 0 and np.all(np.diff(fan["times"]) > 0) and fan["times"][-1] == pytest.approx(note.maturity)
+    assert set(fan["bands"]) == set(fan["samples"]) == {"Tencent", "Baba", "worst_of"}
+    for name, bands in fan["bands"].items():
+        bands, samples = np.asarray(bands), np.asarray(fan["samples"][name])
+        assert bands.shape == (61, 5) and samples.shape == (7, 61)
+        assert np.all(np.diff(bands, axis=1) >= 0)
+    assert np.all(np.asarray(fan["bands"]["worst_of"]) <= np.asarray(fan["bands"]["Baba"]) + 1e-9)
+
+
+def test_price_paths_draw_barriers_of_the_fanned_note():
+    from app.GR32_Plotting_Engine import UniversalPlottingEngine
+    from matplotlib.figure import Figure
+    np.random.seed(4)
+    fanned = {**mc_value(basket(95.0), n_paths=2000, n_steps=20, fan=True), "structure_name": "fanned"}
+    inputs = [{"barriers": [{"type": "KO_DOWN", "level": "80%"}]},
+              {"barriers": [{"type": "KO_DOWN", "level": "95%"}]}]
+    fig = Figure()
+    ax = fig.add_subplot()
+    UniversalPlottingEngine(headless=True)._draw_price_paths(fig, ax, {"results": [{"fair_value": 99.0}, fanned]},
+                                                              inputs)
+    levels = [line.get_ydata()[0] for line in ax.lines if line.get_linestyle() == ":"]
+    assert levels == [95.0]
@@ -0,0 +1,75 @@
+import csv
+import re
+
+import pytest
+
+from app.GR31_Report_Engine import CSV_COLUMNS, ReportEngine
+
+INPUTS = [
+    {"name": "Tencent_Baba_KO98", "underlyings": ["Tencent", "Baba"], "maturity": 4 / 12,
+     "barriers": [{"type": "KO_DOWN", "level": "98%"}]},
+    {"name": "HSBC <&> \"AIA\"", "underlyings": ["HSBC", "AIA"], "maturity": 1.0, "barriers": []},
+    {"name": "Baba_KO90", "underlyings": ["Baba"], "maturity": 0.5,
+     "barriers": [{"type": "KI_DOWN", "level": "60%"}, {"type": "KO_DOWN", "level": "90%"}]},
+]
+RESULTS = [{"fair_value_gross": 97.4312, "prob_no_ko": 82.5},
+           {"fair_value_gross": 101.2, "prob_no_ko": 61.25},
+           {"fair_value_gross": 92.875, "prob_no_ko": 33.0}]
+
+
+def legacy_markdown(results, gr21_input):
+    """generate_report before the streaming renderer, minus its timestamp"""
+    lines = ["# USCAN Structured Product Report\n", "**Generated:** <ts>",
+             f"**Structures Analyzed:** {len(results)}",
+             f"**Average Fair Value:** ${sum(r['fair_value_gross'] for r in results) / len(results):.2f}\n",
+             "This report provides a comprehensive analysis of the structured product(s) based on Monte Carlo "
+             "simulations and AI-parsed inputs.\n", "## Assumptions\n"]
+    for s in gr21_input:
+        ko = next((b["level"] for b in s["barriers"] if b["type"] == "KO_DOWN"), "100%")
+        lines.append(f"- **{s['name']}**: {', '.join(s['underlyings'])}, {s['maturity']:.2f} years, WORST_OF, "
+                     f"Barriers: KO_DOWN at {ko}")
+    lines.append("\n## Results\n")
+    for s, r in zip(gr21_input, results):
+        lines.append(f"- **{s['name']}**: Fair Value = ${r['fair_value_gross']:.2f}, "
+                     f"Survival Probability = {r['prob_no_ko']:.2f}%")
+    lines.append("\n## Recommendations\n")
+    for s, r in zip(gr21_input, results):
+        prob = r["prob_no_ko"]
+        if prob > 70:
+            rec = f"High survival ({prob:.1f}%). Attractive if priced near fair value."
+        elif prob > 50:
+            rec = f"Moderate risk ({100-prob:.1f}% KO). Consider if coupon justifies."
+        else:
+            rec = f"High KO risk ({100-prob:.1f}%). Only for risk-tolerant investors."
+        lines.append(f"- **{s['name']}**: {rec}")
+    return "\n".join(lines)
+
+
+def mask(text):
+    return re.sub(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d", "<ts>", text)
+
+
+def test_markdown_matches_the_pre_streaming_report():
+    markdown = ReportEngine().generate_report({"results": RESULTS}, INPUTS)["markdown"]
+    assert mask(markdown) == legacy_markdown(RESULTS, INPUTS)
+
+
+def test_render_files_writes_every_format(tmp_path):
+    paths = [str(tmp_path / name) for name in ("report.md", "report.html", "report.csv")]
+    summary = ReportEngine().render_files(iter(RESULTS), iter(INPUTS), paths)
+    assert summary["count"] == 3 and summary["avg_fv"] == pytest.approx(97.1687, abs=1e-4)
+
+    markdown = (tmp_path / "report.md").read_text(encoding="utf-8")
+    assert mask(markdown) == legacy_markdown(RESULTS, INPUTS)
+
+    page = (tmp_path / "report.html").read_text(encoding="utf-8")
+    assert page.startswith("<!DOCTYPE html>") and page.endswith("</body></html>\n")
+    assert "<b>HSBC &lt;&amp;&gt; &quot;AIA&quot;</b>" in page and "<&>" not in page
+    assert page.count("<ul>") == page.count("</ul>") == 3 and page.count("<li>") == 9
+
+    with open(tmp_path / "report.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == CSV_COLUMNS and len(rows) == 4
+    assert rows[1][:6] == ["Tencent_Baba_KO98", "Tencent, Baba", "0.3333", "98%", "97.4312", "82.50"]
+    assert rows[2][0] == 'HSBC <&> "AIA"' and rows[2][3] == "100%"
+    assert rows[3][3] == "90%" and rows[3][6].startswith("High KO risk (67.0%)")
@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pytest
+
+from app import scenarios as scen
+from app.GR21_MC_Engine import BasketType, Structure, mc_value
+from app.scenarios import ScenarioStore, attach_scenarios
+
+NOTE = Structure("Tencent_Baba", ["Tencent", "Baba"], [100.0, 100.0], [], BasketType.WORST_OF, 0.5, 100.0, 10.0,
+                 ko_level=95.0)
+CORR = np.array([[1.0, 0.5], [0.5, 1.0]])
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScenarioStore(str(tmp_path / "scenarios"))
+
+
+def test_same_key_reuses_the_cube(store, monkeypatch):
+    first = store.get(1, 2, 3, 1000)
+    assert store.get(1, 2, 3, 1000) is first
+    assert first.cube.shape == (3, 2, 1000) and first.cube.dtype == np.float32
+
+    def regenerate(*args):
+        raise AssertionError("cube regenerated")
+
+    reopened = ScenarioStore(store.root)
+    monkeypatch.setattr(reopened, "_generate", regenerate)
+    assert np.array_equal(reopened.get(1, 2, 3, 1000).cube, first.cube)
+    assert not np.array_equal(store.get(2, 2, 3, 1000).cube, first.cube)
+
+
+def test_generation_never_exposes_a_partial_cube(store, monkeypatch):
+    seen = []
+    real_rng = np.random.default_rng
+
+    class Spy:
+        def __init__(self, seed):
+            self.rng = real_rng(seed)
+
+        def standard_normal(self, **kwargs):
+            seen.append(sorted(n for n in os.listdir(store.root) if n.endswith(".npy")))
+            return self.rng.standard_normal(**kwargs)
+
+    monkeypatch.setattr(scen, "GEN_CHUNK", 1000)
+    monkeypatch.setattr(scen.np.random, "default_rng", Spy)
+    cube = store.get(7, 2, 4, 1000).cube
+    assert len(seen) == 8 and all(names == [] for names in seen)
+    assert os.listdir(store.root) == [os.path.basename(store.path((7, 2, 4, 1000)))]
+    assert np.array_equal(cube, real_rng(7).standard_normal((4, 2, 1000), dtype=np.float32))
+
+
+def test_least_recently_used_cubes_are_evicted(store):
+    keys = [(seed, 1, 1, 1000) for seed in range(4)]
+    for key in keys[:3]:
+        store.get(*key)
+    store.max_bytes = 3 * os.path.getsize(store.path(keys[0]))
+    for t, key in enumerate(keys[:3]):
+        os.utime(store.path(key), (t + 1, t + 1))
+    store.get(*keys[0])  # a hit makes seed 0 the most recent
+    store.get(*keys[3])
+    assert [os.path.exists(store.path(k)) for k in keys] == [True, False, True, True]
+    assert keys[1] not in store._open and store.usage() <= store.max_bytes
+
+
+def price_attached(spec):
+    scenarios = attach_scenarios(spec)
+    return mc_value(NOTE, n_paths=2000, n_steps=4, correlations=CORR, scenarios=scenarios)["fair_value_gross"]
+
+
+def test_shared_memory_round_trip_prices_like_the_local_cube(store):
+    local = mc_value(NOTE, n_paths=2000, n_steps=4, correlations=CORR, scenarios=store.get(3, 2, 4, 2000))
+    with store.share(3, 2, 4, 2000) as shared:
+        assert price_attached(shared.spec) == local["fair_value_gross"]
+        with ProcessPoolExecutor(1, mp_context=get_context("fork")) as pool:
+            assert pool.submit(price_attached, shared.spec).result(30) == local["fair_value_gross"]
@@ -0,0 +1,177 @@
+import threading
+
+import pytest
+
+from app.live_pricing import LiveRun
+from app.membership import MembershipTier
+from app.scheduler import DEFAULT_POLICY, AnalysisScheduler
+
+FREE, PREMIUM = MembershipTier.FREE, MembershipTier.PREMIUM
+
+
+class Recorder:
+    """run callable that logs (text, n_paths) and holds jobs whose text starts with 'block'"""
+
+    def __init__(self):
+        self.order = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __call__(self, text, user_id, n_paths):
+        with self.lock:
+            self.order.append(text)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.started.set()
+        if text.startswith("block"):
+            assert self.release.wait(5)
+        with self.lock:
+            self.running -= 1
+        return {"status": "success", "text": text, "n_paths": n_paths}
+
+
+class Tiers:
+    def __init__(self, tiers):
+        self.tiers = tiers
+
+    def get_tier(self, user_id):
+        return self.tiers.get(user_id, FREE)
+
+
+@pytest.fixture
+def rec():
+    return Recorder()
+
+
+def start_blocked(rec, workers=1, policy=None, membership=None):
+    """Scheduler whose only worker is busy, so later submissions queue up"""
+    sched = AnalysisScheduler(workers=workers, policy=policy, membership=membership, run=rec)
+    first = sched.submit("block", "blocker", PREMIUM)
+    assert rec.started.wait(5)
+    return sched, first
+
+
+def finish(sched, rec, futures):
+    rec.release.set()
+    results = [f.result(5) for f in futures]
+    sched.shutdown()
+    return results
+
+
+def test_premium_jobs_dispatch_before_queued_free_jobs(rec):
+    sched, first = start_blocked(rec)
+    jobs = [sched.submit("free-a", "u1", FREE), sched.submit("free-b", "u2", FREE),
+            sched.submit("premium", "u3", PREMIUM)]
+    finish(sched, rec, [first] + jobs)
+    assert rec.order == ["block", "premium", "free-a", "free-b"]
+
+
+def test_users_in_a_tier_are_served_round_robin(rec):
+    sched, first = start_blocked(rec)
+    jobs = [sched.submit(f"heavy-{i}", "heavy", FREE) for i in range(3)] + [sched.submit("light", "light", FREE)]
+    finish(sched, rec, [first] + jobs)
+    assert rec.order == ["block", "heavy-0", "light", "heavy-1", "heavy-2"]
+
+
+def test_per_user_concurrency_cap(rec):
+    sched = AnalysisScheduler(workers=3, run=rec)
+    jobs = [sched.submit(f"block-{i}", "u1", FREE) for i in range(3)]
+    assert rec.started.wait(5)
+    assert sched.stats()["running_users"] == {"u1": 1}
+    finish(sched, rec, jobs)
+    assert rec.peak == 1
+
+
+def test_tier_path_cap_and_membership_lookup(rec):
+    sched = AnalysisScheduler(workers=1, membership=Tiers({"vip": PREMIUM}), run=rec)
+    free = sched.submit("free", "someone", n_paths=1_000_000).result(5)
+    vip = sched.submit("vip", "vip", n_paths=1_000_000).result(5)
+    sched.shutdown()
+    assert free["n_paths"] == DEFAULT_POLICY[FREE]["max_paths"] == sched.max_paths("someone")
+    assert vip["n_paths"] == 1_000_000 == sched.max_paths("vip")
+    assert (free["schedule"]["tier"], vip["schedule"]["tier"]) == ("free", "premium")
+
+
+def test_overload_degrades_then_sheds(rec):
+    policy = {PREMIUM: DEFAULT_POLICY[PREMIUM], FREE: {**DEFAULT_POLICY[FREE], "degrade_depth": 2, "shed_depth": 4}}
+    sched, first = start_blocked(rec, policy=policy)
+    jobs = [sched.submit(f"job-{i}", f"user-{i}", FREE, n_paths=40_000) for i in range(6)]
+    shed = [f.result(1) for f in jobs[4:]]
+    assert all(r["status"] == "error" and "busy" in r["error"] for r in shed)
+    results = finish(sched, rec, [first] + jobs[:4])
+    assert [r["n_paths"] for r in results[1:]] == [40_000, 40_000, 2_000, 2_000]
+    assert [r["schedule"]["degraded"] for r in results[1:]] == [False, False, True, True]
+    stats = sched.stats()["free"]
+    assert (stats["shed"], stats["degraded"], stats["completed"]) == (2, 2, 4)
+
+
+def test_user_queue_cap_sheds_only_that_user(rec):
+    policy = {PREMIUM: DEFAULT_POLICY[PREMIUM], FREE: {**DEFAULT_POLICY[FREE], "user_queue": 2}}
+    sched, first = start_blocked(rec, policy=policy)
+    mine = [sched.submit(f"mine-{i}", "greedy", FREE) for i in range(3)]
+    other = sched.submit("other", "polite", FREE)
+    assert mine[2].result(1)["status"] == "error"
+    results = finish(sched, rec, [first] + mine[:2] + [other])
+    assert all(r["status"] == "success" for r in results)
+
+
+def test_cancelled_jobs_are_not_counted_as_completed(rec):
+    sched, first = start_blocked(rec)
+    keep, drop = sched.submit("keep", "u1", FREE), sched.submit("drop", "u2", FREE)
+    assert drop.cancel()
+    finish(sched, rec, [first, keep])
+    stats = sched.stats()["free"]
+    assert rec.order == ["block", "keep"]
+    assert (stats["submitted"], stats["completed"], stats["cancelled"]) == (2, 1, 1)
+
+
+NOTE = {"name": "Tencent_Baba", "underlyings": ["Tencent", "Baba"], "initial_prices": [100.0, 100.0],
+        "maturity": 0.25, "barriers": [{"type": "KO_DOWN", "level": "95%"}],
+        "other_props": [{"principal": 100.0}, {"coupon": 10.0}]}
+
+
+def test_live_run_goes_through_the_scheduler():
+    sched = AnalysisScheduler(workers=1, policy={PREMIUM: DEFAULT_POLICY[PREMIUM],
+                                                 FREE: {**DEFAULT_POLICY[FREE], "max_paths": 3_000}})
+    live = LiveRun(NOTE, n_paths=1_000_000, seed=1).submit(sched, "guest")
+    live.future.result(10)
+    sched.shutdown()
+    assert live.status == "done" and live.n_paths == 3_000
+    assert live.snapshot()["paths_done"] == 3_000
+
+
+def test_shed_live_run_reports_the_error(rec):
+    policy = {PREMIUM: DEFAULT_POLICY[PREMIUM], FREE: {**DEFAULT_POLICY[FREE], "shed_depth": 0}}
+    sched = AnalysisScheduler(workers=1, policy=policy, run=rec)
+    live = LiveRun(NOTE, n_paths=10_000).submit(sched, "guest")
+    sched.shutdown()
+    assert live.finished and live.status == "error" and "busy" in live.error
+
+
+def test_live_run_follows_price_structure_dispatch():
+    single = {**NOTE, "name": "Tencent", "underlyings": ["Tencent"], "initial_prices": [100.0]}
+    live = LiveRun(single, n_paths=50_000)
+    live._run()
+    est = live.snapshot()
+    assert live.status == "done" and est["pricer"] == "pde" and est["paths_done"] == 50_000
+
+
+def test_live_run_publishes_batches_and_stops_on_cancel():
+    basket = {**NOTE, "name": "HSBC_Tencent", "underlyings": ["HSBC", "Tencent"]}  # no pricing table
+    live = LiveRun(basket, n_paths=1_000_000, seed=2)
+    seen = []
+    publish = live._publish
+
+    def spy(est):
+        seen.append(est["paths_done"])
+        if len(seen) == 3:
+            live.cancel()
+        return publish(est)
+
+    live._publish = spy
+    live._run()
+    assert seen[:3] == [1_000, 3_000, 7_000]
+    assert live.status == "cancelled" and live.snapshot()["paths_done"] == 7_000
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from app.GR21_MC_Engine import NoteSolver, Structure, mc_value, price_structure
+
+
+def note_json(ko="98%", coupon=11.0, initial_prices=(100.0, 100.0)):
+    return {
+        "name": "Tencent_Baba", "underlyings": ["Tencent", "Baba"], "initial_prices": list(initial_prices),
+        "barriers": [{"type": "KO_DOWN", "level": ko}], "maturity": 4 / 12,
+        "other_props": [{"principal": 100.0}, {"coupon": coupon}],
+    }
+
+
+def test_ko_level_comes_from_the_ko_barrier():
+    assert Structure.from_json(note_json("90%")).ko_level == 90.0
+    assert Structure.from_json(note_json("85%", initial_prices=(420.0, 80.0))).ko_level == 85.0
+    assert Structure.from_json(note_json(225.0, initial_prices=(250.0, 250.0))).ko_level == 90.0
+
+
+def test_ko_90_and_ko_98_notes_price_differently():
+    np.random.seed(7)
+    ko90 = price_structure(note_json("90%"), n_paths=20000, method="mc")
+    np.random.seed(7)
+    ko98 = price_structure(note_json("98%"), n_paths=20000, method="mc")
+    assert ko90["prob_no_ko"] > ko98["prob_no_ko"] + 10
+    assert ko90["fair_value_gross"] > ko98["fair_value_gross"]
+
+
+@pytest.fixture(scope="module")
+def solver():
+    np.random.seed(11)
+    return NoteSolver(Structure.from_json(note_json("95%")), n_paths=50000)
+
+
+def test_solver_value_matches_mc_on_the_same_paths(solver):
+    np.random.seed(11)
+    mc = mc_value(solver.structure, n_paths=50000)
+    assert solver.value() == pytest.approx(mc["fair_value_gross"], abs=1e-9)
+
+
+def test_par_coupon_round_trip(solver):
+    coupon = solver.par_coupon()
+    assert solver.value(coupon=coupon) == pytest.approx(100.0, abs=1e-9)
+    assert solver.value(coupon=solver.par_coupon(target=98.0)) == pytest.approx(98.0, abs=1e-9)
+
+
+def test_ko_solvers_round_trip(solver):
+    level = solver.ko_for_value(target=99.0)
+    assert solver.value(ko_level=level) == pytest.approx(99.0, abs=0.05)
+    ko = solver.ko_for_survival(80.0)
+    assert solver.survival(ko) >= 80.0
+    assert solver.survival(ko + 1e-6) < 80.0
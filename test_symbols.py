@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app import symbols
+from app.symbols import SymbolIndex
+
+CSV = """name,ticker,exchange,aliases
+Tencent,0700.HK,HKEX,tencent holdings|700 hk
+Baba,9988.HK,HKEX,alibaba|alibaba group
+HSBC,0005.HK,HKEX,hsbc holdings
+AIA,1299.HK,HKEX,aia group
+"""
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "underlyings.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return str(path)
+
+
+def ids(index, *aliases, fuzzy=True):
+    return [getattr(index.resolve(a, fuzzy=fuzzy), "id", None) for a in aliases]
+
+
+def test_exact_lookups(csv_path):
+    index = SymbolIndex.build(csv_path)
+    assert ids(index, "Tencent", "0700.HK", "700 HK", "  ALIBABA  Group ", "aia") == \
+        ["0700.HK", "0700.HK", "0700.HK", "9988.HK", "1299.HK"]
+    assert index.row("alibaba grp") is None and index.row("") is None
+
+
+def test_fuzzy_lookups_within_one_edit(csv_path):
+    index = SymbolIndex.build(csv_path)
+    assert ids(index, "tencnet", "tencet", "tenncent", "alibabba", "hsbc holdngs") == \
+        ["0700.HK", "0700.HK", "0700.HK", "9988.HK", "0005.HK"]
+    assert ids(index, "tnecnet", "tencent", fuzzy=False) == [None, "0700.HK"]
+    assert ids(index, "ai", "aix", "hsb") == [None, None, None]  # too short to fuzz
+
+
+def test_hash_collisions_never_resolve_the_wrong_alias(csv_path, monkeypatch):
+    monkeypatch.setattr(symbols, "_hash", lambda key: 1 + len(key) % 3)
+    index = SymbolIndex.build(csv_path)
+    assert ids(index, "tencent", "baba", "hsbc", "aia", "alibaba group", fuzzy=False) == \
+        ["0700.HK", "9988.HK", "0005.HK", "1299.HK", "9988.HK"]
+    assert index.row("nvda") is None and index.row("zzzz zz") is None
+
+
+def test_reload_memory_maps_the_cached_index(csv_path, tmp_path, monkeypatch):
+    index_dir = str(tmp_path / "index")
+    built = SymbolIndex.load(csv_path, index_dir, spot_path=None)
+    monkeypatch.setattr(SymbolIndex, "build", classmethod(lambda cls, path: pytest.fail("index rebuilt")))
+    spots = tmp_path / "spots.csv"
+    spots.write_text("ticker,spot\n0700.HK,412.6\nNVDA,1.0\n")
+    loaded = SymbolIndex.load(csv_path, index_dir, spot_path=str(spots))
+    assert isinstance(loaded.table_keys, np.memmap) and len(loaded) == len(built) == 4
+    assert loaded.resolve("tencnet").spot == 412.6 and loaded.resolve("baba").spot is None
+    assert ids(loaded, "700 hk", "alibaba") == ids(built, "700 hk", "alibaba")